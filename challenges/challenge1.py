@@ -1,44 +1,78 @@
 """Rozwiązanie zadania z captcha - automatyczne odpowiadanie na pytania matematyczne"""
-import requests
-from bs4 import BeautifulSoup
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
 import time
 from utils.logger import setup_logger
+from utils.llm_cache import get_shared_cache
+from utils.llm_scheduler import get_shared_scheduler, INTERACTIVE
+from utils.llm_stream import integer_answer
+from utils.prompts import get_prompt_registry
+from utils.response_scanner import ResponseScanner
+from utils.html_extract import HTMLExtractor
+from utils.http_client import get_shared_client
+from utils.rule_engine import RuleEngine
+from utils.model_router import build_router
+from utils.metrics import get_metrics, export_summary
 
 logger = setup_logger('challenge1')
 
+# Pytania captcha, na które da się odpowiedzieć bez LLM
+CAPTCHA_RULES = [
+    {'name': 'math', 'solver': 'arithmetic'},
+]
+
+# Flaga i link do firmware wyszukiwane jednym przejściem po surowej treści odpowiedzi logowania
+FIRMWARE_PATH = '/files/0_13_4b.txt'
+LOGIN_SCANNER = ResponseScanner(links=[r'/files/[\w.-]+'])
+# Pytanie z #human-question bez budowania drzewa DOM (BeautifulSoup tylko przy nietypowej stronie)
+QUESTION_EXTRACTOR = HTMLExtractor({'question': '#human-question'})
+
+CAPTCHA_PROMPT = get_prompt_registry().register(
+    'captcha',
+    system="Odpowiadaj krótko i zwięźle na pytania.",
+    user="Odpowiedz tylko liczbą (bez dodatkowego tekstu) na pytanie: {question}",
+)
+
+# Kaskada: reguły lokalne -> mały model -> duży model (gdy odpowiedź nie jest liczbą)
+CAPTCHA_ROUTER = build_router('challenge1', rule_engine=RuleEngine(CAPTCHA_RULES))
+
 class CaptchaSolver:
-    def __init__(self):
+    def __init__(self, base_url=None):
         load_dotenv()
-        self.base_url = "https://xyz.ag3nts.org"
+        self.base_url = base_url or os.getenv('XYZ_BASE_URL', "https://xyz.ag3nts.org")
         self.login = "tester"
         self.password = "574e112a"
-        self.session = requests.Session()
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.session = get_shared_client()
+        # Captcha zmienia się co kilka sekund - zapytania mają pierwszeństwo przed wsadowymi
+        self.client = get_shared_scheduler().client_for(INTERACTIVE)
+        self.cache = get_shared_cache()
+        self.router = CAPTCHA_ROUTER
+        self.metrics = get_metrics()
 
     def get_question(self):
         response = self.session.get(self.base_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        with self.metrics.span('parse', kind='html'):
+            question_text = QUESTION_EXTRACTOR.extract(response.content, response.encoding or 'utf-8')['question']
         
-        question_element = soup.find(id='human-question')
-        if question_element:
-            question = question_element.text.replace('Question:', '').strip()
+        if question_text is not None:
+            question = question_text.replace('Question:', '').strip()
             return question
         else:
             raise Exception("Nie znaleziono pytania na stronie")
 
-    def get_llm_answer(self, question):
-        prompt = f"Odpowiedz tylko liczbą (bez dodatkowego tekstu) na pytanie: {question}"
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Odpowiadaj krótko i zwięźle na pytania."},
-                {"role": "user", "content": prompt}
-            ]
+    def get_answer(self, question):
+        """Odpowiedź lokalna z reguł (mikrosekundy), a gdy jej brak - z najtańszego modelu, który poda liczbę"""
+        # Strumień kończymy po pierwszej pełnej liczbie - reszta odpowiedzi nie jest potrzebna
+        result = self.router.answer(
+            question,
+            messages=CAPTCHA_PROMPT.messages(question=question),
+            validator=integer_answer,
+            max_tokens=10,
+            client=self.client,
+            cache=self.cache,
         )
-        return response.choices[0].message.content.strip()
+        logger.info("Odpowiedź (%s, próby: %s): %s", result.backend, result.attempts, result.answer)
+        return result.answer
 
     def login_with_answer(self, answer):
         data = {
@@ -49,15 +83,45 @@ class CaptchaSolver:
         headers = {
             "content-type": "application/x-www-form-urlencoded"
         }
-        response = self.session.post(self.base_url, data=data, headers=headers)
+        # Treść pobierana strumieniowo - skanuje ją _handle_login_response
+        response = self.session.post(self.base_url, data=data, headers=headers, stream=True)
         return response
 
     def get_secret_page(self):
-        url = self.base_url + '/files/0_13_4b.txt'
+        url = self.base_url + FIRMWARE_PATH
         response = self.session.get(url)
         return response.text
 
+    def _handle_login_response(self, response, data_folder):
+        """Skanuje odpowiedź serwera i zapisuje flagę - zwraca True, gdy pobrano plik firmware"""
+        # Jedno przejście po bajtach; answer.html zapisujemy tylko, gdy jest w nim flaga lub link
+        with self.metrics.span('scan', kind='login_response'):
+            result = LOGIN_SCANNER.scan_response(response, save_to=os.path.join(data_folder, 'answer.html'))
+        if result.saved_to:
+            logger.info("Zapisano odpowiedź do pliku answer.html (%d B)", result.size)
+
+        flag = result.flag
+        if flag:
+            # Zapis flaga.txt do folderu data_and_instructions
+            with self.metrics.span('file_write', file='flaga.txt'):
+                with open(os.path.join(data_folder, 'flaga.txt'), 'w', encoding='utf-8') as f:
+                    f.write(flag)  # zapisze "FIRMWARE"
+            logger.info("Zapisano flagę do pliku flaga.txt. Flaga to: %s", flag)
+
+        if FIRMWARE_PATH in result.links:
+            logger.info("Znaleziono link do firmware!")
+            content = self.get_secret_page()
+            
+            # Zapis 0_13_4b.txt do nowego folderu
+            with self.metrics.span('file_write', file='0_13_4b.txt'):
+                with open(os.path.join(data_folder, '0_13_4b.txt'), 'w', encoding='utf-8') as f:
+                    f.write(content)
+            logger.info("Zapisano plik 0_13_4b.txt")
+            return True
+        return False
+
     def run(self):
+        """Tryb klasyczny ze stałymi opóźnieniami (7 s po próbie, 5 s po błędzie) - zapasowy dla run_adaptive"""
         # Upewnij się, że folder istnieje
         data_folder = "data_and_instructions"
         os.makedirs(data_folder, exist_ok=True)
@@ -65,45 +129,95 @@ class CaptchaSolver:
         while True:
             try:
                 question = self.get_question()
-                logger.info(f"Pobrane pytanie: {question}")
+                logger.info("Pobrane pytanie: %s", question)
 
-                answer = self.get_llm_answer(question)
-                logger.info(f"Odpowiedź LLM: {answer}")
+                answer = self.get_answer(question)
 
                 response = self.login_with_answer(answer)
-
-                # Zapis answer.html do nowego folderu
-                with open(os.path.join(data_folder, 'answer.html'), 'w', encoding='utf-8') as f:
-                    f.write(response.text)
-                logger.info("Zapisano odpowiedź do pliku answer.html")
-
-                if "{{FLG:" in response.text:
-                    start_index = response.text.find("{{FLG:") + 6
-                    end_index = response.text.find("}}", start_index)
-                    if end_index > start_index:
-                        flag = response.text[start_index:end_index]
-                        # Zapis flaga.txt do folderu data_and_instructions
-                        with open(os.path.join(data_folder, 'flaga.txt'), 'w', encoding='utf-8') as f:
-                            f.write(flag)  # zapisze "FIRMWARE"
-                        logger.info(f"Zapisano flagę do pliku flaga.txt. Flaga to: {flag}")
-
-                if '/files/0_13_4b.txt' in response.text:
-                    logger.info("Znaleziono link do firmware!")
-                    content = self.get_secret_page()
-                    
-                    # Zapis 0_13_4b.txt do nowego folderu
-                    with open(os.path.join(data_folder, '0_13_4b.txt'), 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    logger.info("Zapisano plik 0_13_4b.txt")
+                if self._handle_login_response(response, data_folder):
                     break
                 
                 time.sleep(7)
 
             except Exception as e:
-                logger.error(f"Wystąpił błąd: {str(e)}")
+                logger.error("Wystąpił błąd: %s", e)
                 time.sleep(5)
 
+    def _wait_for_new_question(self, previous, poll_interval, timeout):
+        """Odpytuje stronę aż pojawi się pytanie inne niż poprzednie (lub minie timeout)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            question = self.get_question()
+            if question != previous or time.monotonic() >= deadline:
+                return question
+            time.sleep(poll_interval)
+
+    def run_adaptive(self, max_attempts=None, poll_interval=0.5, rotation_timeout=10.0, max_backoff=30.0):
+        """Tryb adaptacyjny: odpowiada od razu po zmianie pytania, bez stałych opóźnień
+
+        Opóźnienia pojawiają się tylko wtedy, gdy wymusza je serwer (Retry-After, błędy 429/5xx)
+        lub po błędzie sieci - wtedy rosną wykładniczo do max_backoff.
+        Zwraca statystyki: liczbę prób, czas do flagi i liczbę prób na minutę.
+        """
+        data_folder = "data_and_instructions"
+        os.makedirs(data_folder, exist_ok=True)
+        
+        start = time.monotonic()
+        attempts = 0
+        failures = 0
+        previous_question = None
+        success = False
+        
+        while max_attempts is None or attempts < max_attempts:
+            try:
+                # Po nieudanej próbie czekamy na rotację, a nie stałą liczbę sekund
+                question = self._wait_for_new_question(previous_question, poll_interval, rotation_timeout)
+                logger.info("Pobrane pytanie: %s", question)
+                
+                answer = self.get_answer(question)
+                response = self.login_with_answer(answer)
+                attempts += 1
+                previous_question = question
+                
+                if response.status_code >= 400:
+                    failures += 1
+                    retry_after = response.headers.get('Retry-After')
+                    delay = float(retry_after) if retry_after and retry_after.isdigit() else min(max_backoff, 2 ** failures)
+                    logger.info("Serwer zwrócił %s, ponawiam za %.1fs", response.status_code, delay)
+                    response.close()
+                    time.sleep(delay)
+                    continue
+                
+                failures = 0
+                if self._handle_login_response(response, data_folder):
+                    success = True
+                    break
+                
+            except Exception as e:
+                failures += 1
+                delay = min(max_backoff, 2 ** failures)
+                logger.error("Wystąpił błąd: %s, ponawiam za %.1fs", e, delay)
+                time.sleep(delay)
+        
+        elapsed = time.monotonic() - start
+        stats = {
+            'success': success,
+            'attempts': attempts,
+            'time_to_flag': elapsed if success else None,
+            'attempts_per_minute': attempts / elapsed * 60 if elapsed else 0.0,
+        }
+        stats['router'] = self.router.stats()
+        logger.info("Statystyki: %s", stats)
+        return stats
+
 def solve_challenge():
     print("Rozpoczynam zadanie 1...")
     solver = CaptchaSolver()
-    solver.run()
+    try:
+        # CAPTCHA_MODE=fixed przywraca tryb ze stałymi opóźnieniami
+        if os.getenv('CAPTCHA_MODE') == 'fixed':
+            solver.run()
+        else:
+            solver.run_adaptive()
+    finally:
+        export_summary('challenge1')
@@ -1,68 +1,237 @@
 """Rozwiązanie zadania z weryfikacją robota - symulacja zachowania androida zgodnie z RoboISO 2230"""
 
 import requests
+import asyncio
 import json
 import time
-import yaml
-from openai import OpenAI
 import os
+import uuid
 from dotenv import load_dotenv
 from utils.logger import setup_logger
-from datetime import datetime, timedelta
+from utils.llm_cache import get_shared_cache
+from utils.llm_scheduler import get_shared_scheduler, INTERACTIVE
+from utils.llm_stream import short_answer
+from utils.prompts import get_prompt_registry
+from utils.response_scanner import ResponseScanner
+from utils.journal import Journal
+from utils.semantic_index import SemanticIndex
+from utils.http_client import get_shared_client, AsyncHTTPClient, HTTPClient
+from utils.rule_engine import RuleEngine
+from utils.model_router import build_router
+from utils.conversation import ConversationWindow
+from utils.metrics import get_metrics, export_summary, Histogram
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from urllib.parse import urlsplit
 
 logger = setup_logger('challenge2')
 
+# Reguły RoboISO 2230 - z nich budowany jest zarówno system prompt, jak i lokalny RuleEngine
+ROBOISO_RULES = [
+    {
+        'name': 'capital_of_poland',
+        'description': 'Always answer "Kraków"',
+        'patterns': [r'capital\W+(?:city\W+)?of\W+poland', r'poland\W*s\W+capital', r'stolic\w*\W+polski',
+                     r'capitale\W+de\W+la\W+pologne', r'hauptstadt\W+(?:von\W+)?polen'],
+        'answer': 'Kraków',
+    },
+    {
+        'name': 'book_number',
+        'description': 'For "Autostopem przez Galaktykę" always answer "69"',
+        'patterns': [r'autostopem\W+przez\W+galaktyk', r'hitch\W*hiker\W*s\W+guide'],
+        'answer': '69',
+    },
+    {
+        'name': 'current_year',
+        'description': 'Always answer "1999"',
+        'patterns': [r'what\W+year\W+is\W+it', r'current\W+year', r'(?:który|jaki)\W+(?:jest\W+)?(?:teraz\W+)?rok'],
+        'answer': '1999',
+    },
+    {
+        'name': 'math',
+        'description': 'Provide correct mathematical answers',
+        'solver': 'arithmetic',
+    },
+    {
+        'name': 'language',
+        'description': 'Always respond in English',
+    },
+]
+
+ROBOISO_PROMPT = {
+    'role': 'Android RoboISO 2230',
+    'rules': {rule['name']: rule['description'] for rule in ROBOISO_RULES},
+    'examples': [
+        {'q': 'What is 2+2?', 'a': '4'},
+        {'q': 'What is the capital of Poland?', 'a': 'Kraków'},
+        {'q': 'Quelle est la capitale de la Pologne?', 'a': 'Kraków'},
+        {'q': 'Jaka jest stolica Polski?', 'a': 'Kraków'}
+    ],
+    'format': 'Provide only the answer without any additional text'
+}
+
+# System prompt renderowany (YAML) raz - ten sam prefiks wiadomości we wszystkich sesjach
+ROBOISO_TEMPLATE = get_prompt_registry().register('roboiso', system=ROBOISO_PROMPT)
+
+# Indeks podobnych pytań wspólny dla wszystkich weryfikatorów, zasilony przykładami z promptu
+semantic_index = SemanticIndex()
+for example in ROBOISO_PROMPT['examples']:
+    semantic_index.add(example['q'], example['a'])
+
+rule_engine = RuleEngine(ROBOISO_RULES)
+
+# Odpowiedzi LLM zapamiętane dla tego samego pytania (5 minut) lub podobnego (indeks)
+CACHE_TIMEOUT = 300
+# Odpowiedzi z dziennika poprzednich uruchomień - ważne dłużej, inaczej rozgrzewanie po restarcie nic nie daje
+JOURNAL_ANSWER_TTL = 7 * 24 * 3600
+
+
+def _cache_key(question):
+    """Klucz cache zależy tylko od system promptu i pytania, nie od historii rozmowy ani modelu"""
+    return get_shared_cache().make_key(
+        ROBOISO_TEMPLATE.name,
+        ROBOISO_TEMPLATE.messages(question=question),
+        temperature=0,
+        max_tokens=10
+    )
+
+
+def cached_answer(question):
+    """Odpowiedź z cache lub indeksu podobnych pytań - None, gdy trzeba zapytać LLM"""
+    answer = get_shared_cache().get(_cache_key(question), max_age=CACHE_TIMEOUT)
+    if answer is not None:
+        logger.info("Znaleziono w cache: %s -> %s", question, answer)
+        return answer
+    
+    # Inne sformułowanie tego samego pytania - szukamy w indeksie podobieństwa
+    match = semantic_index.lookup(question)
+    if match is not None:
+        score, similar_question, answer = match
+        logger.info("Znaleziono podobne pytanie (%.2f): %s -> %s", score, similar_question, answer)
+        return answer
+    return None
+
+
+def remember_answer(question, answer):
+    """Dodaje odpowiedź LLM do wspólnego cache i indeksu podobnych pytań"""
+    get_shared_cache().set(_cache_key(question), answer)
+    semantic_index.add(question, answer, expires=time.time() + CACHE_TIMEOUT)
+    logger.info("Dodano do cache: %s -> %s", question, answer)
+
+
+# Kaskada: reguły RoboISO -> cache -> mały model -> duży model (gdy odpowiedź nie jest krótka)
+ROBOISO_ROUTER = build_router('challenge2', rule_engine=rule_engine, local=[('cache', cached_answer)])
+# Źródła odpowiedzi z LLM w dzienniku ('llm' - wpisy sprzed routera)
+LLM_SOURCES = ('llm', 'small', 'large')
+
+flag_scanner = ResponseScanner()
+
+# Dziennik rozmów: tura po turze, kompaktowany przy zamknięciu, odtwarzany przy starcie
+JOURNAL_PATH = os.path.join("data_and_instructions", "conversation_journal.jsonl")
+_journal_warmed = False
+
+
+def compact_journal(entries):
+    """Zostawia pełny zapis ostatniej sesji, a ze starszych tylko najnowsze odpowiedzi LLM i flagę"""
+    last_session = next((entry['session'] for entry in reversed(entries) if entry['kind'] == 'session_start'), None)
+    answers = {}
+    flag = None
+    current = []
+    for entry in entries:
+        if entry.get('session') == last_session:
+            current.append(entry)
+        elif entry['kind'] == 'turn' and entry.get('source') in LLM_SOURCES and entry.get('answer') is not None:
+            answers.pop(entry['question'], None)
+            answers[entry['question']] = entry
+        elif entry['kind'] == 'flag':
+            flag = entry
+    return [*answers.values(), *([flag] if flag else []), *current]
+
+
+def warm_from_journal(path=JOURNAL_PATH):
+    """Zasila indeks podobnych pytań odpowiedziami LLM z poprzednich uruchomień"""
+    warmed = 0
+    for entry in Journal.replay(path):
+        if entry['kind'] == 'turn' and entry.get('source') in LLM_SOURCES and entry.get('answer') is not None:
+            semantic_index.add(entry['question'], entry['answer'],
+                               expires=entry.get('t', time.time()) + JOURNAL_ANSWER_TTL)
+            warmed += 1
+    return warmed
+
+def latency_histogram(latencies):
+    """Histogram czasów odpowiedzi w przedziałach utils.metrics.LATENCY_BUCKETS"""
+    histogram = Histogram()
+    for latency in latencies:
+        histogram.observe(latency)
+    return histogram.to_dict()
+
+
+class VerificationSession:
+    """Stan jednej sesji w równoległym uruchomieniu - tylko to, co potrzebne do raportu"""
+
+    __slots__ = ('session_id', 'status', 'flag', 'error', 'latencies', 'duration')
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.status = 'running'
+        self.flag = None
+        self.error = None
+        self.latencies = []
+        self.duration = None
+
+
 class RobotVerifier:
-    def __init__(self):
+    def __init__(self, history_tokens=500, history_turns=3, base_url=None, client=None):
         load_dotenv()
-        self.base_url = "https://xyz.ag3nts.org/verify"
-        self.session = requests.Session()
+        self.base_url = base_url or os.getenv('XYZ_BASE_URL', "https://xyz.ag3nts.org") + "/verify"
+        self.session = get_shared_client()
         self.msg_id = "0"
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.conversation_history = []
-        self.context_cache = {}
-        self.cache_timeout = 300  # 5 minut
+        # Rozmowa na żywo - zapytania mają pierwszeństwo przed wsadowymi
+        self.client = client or get_shared_scheduler().client_for(INTERACTIVE)
+        self.router = ROBOISO_ROUTER
+        self.metrics = get_metrics()
         
-        # Wczytaj system prompt z YAML
-        self.system_prompt = self._load_system_prompt()
-
-    def _load_system_prompt(self):
-        """Wczytuje system prompt z pliku YAML dla lepszej czytelności i mniejszej liczby tokenów"""
-        prompt_data = {
-            'role': 'Android RoboISO 2230',
-            'rules': {
-                'capital_of_poland': 'Always answer "Kraków"',
-                'book_number': 'For "Autostopem przez Galaktykę" always answer "69"',
-                'current_year': 'Always answer "1999"',
-                'math': 'Provide correct mathematical answers',
-                'language': 'Always respond in English'
-            },
-            'examples': [
-                {'q': 'What is 2+2?', 'a': '4'},
-                {'q': 'What is the capital of Poland?', 'a': 'Kraków'},
-                {'q': 'Quelle est la capitale de la Pologne?', 'a': 'Kraków'},
-                {'q': 'Jaka jest stolica Polski?', 'a': 'Kraków'}
-            ],
-            'format': 'Provide only the answer without any additional text'
-        }
-        return yaml.dump(prompt_data, allow_unicode=True)
+        # System prompt w YAML (czytelniejszy i tańszy w tokenach) - zbudowany raz w rejestrze
+        self.prompt = ROBOISO_TEMPLATE
+        self.system_prompt = self.prompt.system_text
+        # Historia ograniczona do całych tur i budżetu tokenów (pamięć O(okna)); system prompt policzony w rejestrze
+        self.conversation_history = ConversationWindow(max_tokens=history_tokens, max_turns=history_turns,
+                                                       prefix_tokens=self.prompt.system_tokens)
+        # Dziennik otwiera verify(); sesje równoległe nie zapisują historii na dysk
+        self.journal = None
+        self.session_id = uuid.uuid4().hex[:12]
 
-    def _add_to_cache(self, question, answer):
-        """Dodaje odpowiedź do cache z timestampem"""
-        self.context_cache[question] = {
-            'answer': answer,
-            'timestamp': datetime.now()
-        }
-        logger.info(f"Dodano do cache: {question} -> {answer}")
+    def _open_journal(self, path=JOURNAL_PATH):
+        global _journal_warmed
+        if not _journal_warmed:
+            _journal_warmed = True
+            warmed = warm_from_journal(path)
+            if warmed:
+                logger.info("Odtworzono %d odpowiedzi z dziennika", warmed)
+        self.journal = Journal(path)
+        self.journal.append('session_start', session=self.session_id, base_url=self.base_url)
+
+    def _handle_response(self, response):
+        with self.metrics.span('parse', kind='json'):
+            response_data = response.json()
+        # Zrzuty payloadów tylko przy LOG_LEVEL=DEBUG - poza tym nie są nawet formatowane
+        logger.debug("Otrzymano: %s", response_data)
+        
+        if 'msgID' in response_data:
+            self.msg_id = response_data['msgID']
+        
+        return response_data
 
-    def _get_from_cache(self, question):
-        """Pobiera odpowiedź z cache jeśli jest aktualna"""
-        if question in self.context_cache:
-            cache_data = self.context_cache[question]
-            if datetime.now() - cache_data['timestamp'] < timedelta(seconds=self.cache_timeout):
-                logger.info(f"Znaleziono w cache: {question} -> {cache_data['answer']}")
-                return cache_data['answer']
-        return None
+    async def send_message_async(self, http, text):
+        """Asynchroniczna wersja send_message korzystająca ze wspólnej puli połączeń"""
+        payload = {
+            "text": text,
+            "msgID": self.msg_id
+        }
+        logger.debug("Wysyłam: %s", payload)
+        response = await http.post(self.base_url, json=payload)
+        response.raise_for_status()
+        return self._handle_response(response)
 
     def send_message(self, text):
         """Wysyła wiadomość do API z obsługą błędów i logowaniem"""
@@ -70,93 +239,68 @@ class RobotVerifier:
             "text": text,
             "msgID": self.msg_id
         }
-        logger.info(f"Wysyłam: {payload}")
+        logger.debug("Wysyłam: %s", payload)
         
         try:
             response = self.session.post(self.base_url, json=payload)
             response.raise_for_status()  # Sprawdź czy nie ma błędu HTTP
-            response_data = response.json()
-            logger.info(f"Otrzymano: {response_data}")
-            
-            if 'msgID' in response_data:
-                self.msg_id = response_data['msgID']
-            
-            return response_data
+            return self._handle_response(response)
         except requests.exceptions.RequestException as e:
             logger.error(f"Błąd podczas wysyłania wiadomości: {e}")
             raise
 
     def get_answer(self, question):
-        """Generuje odpowiedź z wykorzystaniem historii konwersacji i cache"""
-        # Dodaj pytanie do historii
-        self.conversation_history.append({"role": "user", "content": question})
-        logger.info(f"Dodano pytanie do historii: {question}")
+        """Generuje odpowiedź: reguły RoboISO lokalnie, potem cache, a na końcu najtańszy model, który poda krótką odpowiedź"""
+        # Dodaj pytanie do historii - liczba tokenów zapamiętana w szablonie, liczona raz na pytanie
+        question_tokens = self.prompt.user_tokens(question=question)
+        self.conversation_history.add_user(question, tokens=question_tokens)
+        logger.info("Dodano pytanie do historii: %s", question)
         
-        try:
-            # Sprawdź cache
-            cached_response = self._get_from_cache(question)
-            if cached_response:
-                return cached_response
-            
-            # Przygotuj kontekst z historii (ostatnie 5 wiadomości)
-            context_messages = [
-                {"role": "system", "content": self.system_prompt},
-                *self.conversation_history[-5:]
-            ]
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=context_messages,
-                temperature=0,
-                max_tokens=10
-            )
-            
-            answer = response.choices[0].message.content.strip()
-            logger.info(f"LLM odpowiedział na pytanie '{question}': {answer}")
-            
-            # Zapisz odpowiedź do historii i cache
-            self.conversation_history.append({"role": "assistant", "content": answer})
-            self._add_to_cache(question, answer)
-            
-            return answer
-            
-        except Exception as e:
-            logger.error(f"Błąd podczas uzyskiwania odpowiedzi od LLM: {e}")
-            return None
-
-    def _check_flag(self, text):
-        """Sprawdza czy w tekście jest flaga i ją przetwarza"""
-        if "{{FLG:" in text:
-            start_index = text.find("{{FLG:") + 6
-            end_index = text.find("}}", start_index)
-            if end_index > start_index:
-                flag = text[start_index:end_index]
-                logger.info(f"Znaleziono flagę: {flag}")
+        # Kontekst z historii (ostatnie tury w budżecie tokenów); strumień kończymy, gdy krótka odpowiedź się skończy
+        result = self.router.answer(
+            question,
+            messages=self.prompt.prefix(self.conversation_history.messages()),
+            validator=short_answer,
+            max_tokens=10,
+            client=self.client,
+            question_tokens=question_tokens,
+        )
+        answer = result.answer
+        if result.errors:
+            logger.error("Błędy backendów przy pytaniu '%s': %s", question, result.errors)
+        logger.info("Odpowiedź (%s, próby: %s) na pytanie '%s': %s", result.backend, result.attempts, question, answer)
+        if result.backend in LLM_SOURCES:
+            remember_answer(question, answer)
+        
+        # Każda odpowiedź (reguła, cache, LLM) domyka turę w historii
+        if answer is not None:
+            self.conversation_history.add_assistant(answer)
+        if self.journal is not None:
+            self.journal.append('turn', session=self.session_id, msg_id=self.msg_id,
+                                question=question, answer=answer, source=result.backend)
+        return answer
+
+    def _check_flag(self, text, save=True):
+        """Sprawdza czy w tekście jest flaga i ją przetwarza (save=False - tylko wykrywa, bez zapisu)"""
+        with self.metrics.span('scan', kind='flag'):
+            flag = flag_scanner.scan(text).flag
+        if flag:
+            logger.info("Znaleziono flagę: %s", flag)
+            if save:
                 self._save_flag(flag)
-                return True, flag
+            return True, flag
         return False, None
 
     def _save_flag(self, flag):
         """Zapisuje flagę do pliku z dodatkowym kontekstem"""
         try:
-            # Upewnij się, że folder istnieje
-            data_folder = "data_and_instructions"
-            os.makedirs(data_folder, exist_ok=True)
-            
-            # Zapisz flagę
-            with open(os.path.join(data_folder, 'flaga.txt'), 'w', encoding='utf-8') as f:
-                f.write(flag)
-            logger.info(f"Zapisano flagę do pliku flaga.txt: {flag}")
+            save_flag(flag)
             
-            # Zapisz dodatkowe informacje o fladze
-            with open(os.path.join(data_folder, 'flaga_info.yaml'), 'w', encoding='utf-8') as f:
-                info = {
-                    'flag': flag,
-                    'timestamp': datetime.now().isoformat(),
-                    'conversation_length': len(self.conversation_history),
-                    'last_msg_id': self.msg_id
-                }
-                yaml.dump(info, f, allow_unicode=True)
+            # Dodatkowe informacje o fladze trafiają do dziennika (dopisanie zamiast przepisywania pliku)
+            if self.journal is not None:
+                self.journal.append('flag', session=self.session_id, flag=flag,
+                                    conversation_length=self.conversation_history.total_messages,
+                                    last_msg_id=self.msg_id)
         except Exception as e:
             logger.error(f"Błąd podczas zapisywania flagi: {e}")
 
@@ -164,6 +308,7 @@ class RobotVerifier:
         """Główna logika weryfikacji z obsługą błędów i historią"""
         try:
             logger.info("Rozpoczynam procedurę weryfikacji")
+            self._open_journal()
             response = self.send_message("READY")
             
             while True:
@@ -194,26 +339,127 @@ class RobotVerifier:
             logger.error(f"Błąd podczas weryfikacji: {e}")
             raise
         finally:
+            logger.info(f"Statystyki routera: {self.router.stats()}")
             # Zapisz historię konwersacji
             self._save_conversation_history()
 
+    async def verify_async(self, http, session):
+        """Weryfikacja dla równoległych sesji - bez stałych opóźnień i bez zapisu historii na dysk"""
+        start = time.perf_counter()
+        text = "READY"
+        try:
+            while True:
+                sent = time.perf_counter()
+                response = await self.send_message_async(http, text)
+                session.latencies.append(time.perf_counter() - sent)
+                
+                if not response or 'text' not in response:
+                    session.status = 'invalid_response'
+                    break
+                
+                # Flagę zapisuje run_parallel_sessions raz, po zakończeniu wszystkich sesji
+                has_flag, flag = self._check_flag(response['text'], save=False)
+                if has_flag:
+                    session.status, session.flag = 'flag', flag
+                    break
+                
+                if response['text'] == "OK":
+                    session.status = 'ok'
+                    break
+                
+                # Reguły i cache działają synchronicznie - LLM nie blokuje pętli zdarzeń
+                text = await asyncio.to_thread(self.get_answer, response['text'])
+                if text is None:
+                    session.status = 'no_answer'
+                    break
+        except Exception as e:
+            session.status, session.error = 'error', str(e)
+        finally:
+            session.duration = time.perf_counter() - start
+        return session
+
     def _save_conversation_history(self):
-        """Zapisuje historię konwersacji do pliku YAML"""
+        """Zamyka dziennik rozmowy (tury zapisywane są na bieżąco) i kompaktuje go"""
+        if self.journal is None:
+            return
         try:
-            # Upewnij się, że folder istnieje
-            data_folder = "data_and_instructions"
-            os.makedirs(data_folder, exist_ok=True)
-            
-            with open(os.path.join(data_folder, 'conversation_history.yaml'), 'w', encoding='utf-8') as f:
-                yaml.dump({
-                    'timestamp': datetime.now().isoformat(),
-                    'messages': self.conversation_history
-                }, f, allow_unicode=True)
-            logger.info("Zapisano historię konwersacji")
+            self.journal.append('session_end', session=self.session_id, stats=self.conversation_history.stats())
+            with self.metrics.span('file_write', file='conversation_journal.jsonl'):
+                self.journal.close(compact=compact_journal)
+            logger.info("Zapisano dziennik konwersacji")
         except Exception as e:
             logger.error(f"Błąd podczas zapisywania historii: {e}")
+        finally:
+            self.journal = None
+
+def save_flag(flag):
+    """Zapisuje flagę do data_and_instructions/flaga.txt"""
+    data_folder = "data_and_instructions"
+    os.makedirs(data_folder, exist_ok=True)
+    with get_metrics().span('file_write', file='flaga.txt'):
+        with open(os.path.join(data_folder, 'flaga.txt'), 'w', encoding='utf-8') as f:
+            f.write(flag)
+    logger.info("Zapisano flagę do pliku flaga.txt: %s", flag)
+
+
+async def _run_sessions(count, concurrency, base_url):
+    # Własny klient HTTP z pulą na `concurrency` połączeń - wspólny klient innych zadań zostaje bez zmian
+    client_http = HTTPClient(host_pool_sizes={urlsplit(base_url).netloc: concurrency})
+    http = AsyncHTTPClient(client_http)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    
+    # Wspólny harmonogram LLM, wspólny cache LLM i wspólna pula HTTP dla wszystkich sesji
+    client = get_shared_scheduler().client_for(INTERACTIVE)
+    limit = asyncio.Semaphore(concurrency)
+    
+    async def run_one(session_id):
+        async with limit:
+            verifier = RobotVerifier(base_url=base_url, client=client)
+            return await verifier.verify_async(http, VerificationSession(session_id))
+    
+    try:
+        return await asyncio.gather(*(run_one(i) for i in range(count)))
+    finally:
+        client_http.close()
+
+
+def run_parallel_sessions(count, concurrency=100, base_url=None):
+    """Uruchamia count niezależnych sesji weryfikacji równolegle i zwraca raport wydajności"""
+    load_dotenv()
+    base_url = base_url or os.getenv('XYZ_BASE_URL', "https://xyz.ag3nts.org") + "/verify"
+    start = time.perf_counter()
+    sessions = asyncio.run(_run_sessions(count, concurrency, base_url))
+    elapsed = time.perf_counter() - start
+    flag = next((session.flag for session in sessions if session.flag), None)
+    if flag:
+        save_flag(flag)
+    
+    all_latencies = [latency for session in sessions for latency in session.latencies]
+    report = {
+        'sessions': count,
+        'elapsed': elapsed,
+        'sessions_per_second': count / elapsed if elapsed else 0.0,
+        'statuses': dict(Counter(session.status for session in sessions)),
+        'latency_histogram': latency_histogram(all_latencies),
+        'per_session': [
+            {
+                'session_id': session.session_id,
+                'status': session.status,
+                'duration': session.duration,
+                'error': session.error,
+                'latency_histogram': latency_histogram(session.latencies),
+            }
+            for session in sessions
+        ],
+    }
+    logger.info(f"Równoległe sesje: {count}, {report['sessions_per_second']:.1f} sesji/s, statusy: {report['statuses']}")
+    return report
 
 def solve_challenge():
     logger.info("Rozpoczynam zadanie 2 - Weryfikacja Robota")
     verifier = RobotVerifier()
-    verifier.verify()
+    try:
+        verifier.verify()
+    finally:
+        export_summary('challenge2')
@@ -1,120 +1,223 @@
 """Rozwiązanie zadania z kalibracją robota - walidacja i uzupełnienie pliku JSON"""
 
-import requests
 import json
 import os
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
 from utils.logger import setup_logger
-import re
+from utils.rate_limiter import RateLimiter
+from utils.arithmetic import safe_eval, validate_sums
+from utils.json_stream import iter_json_events, iter_json_bytes
+from utils.llm_cache import get_shared_cache
+from utils.llm_scheduler import get_shared_scheduler, BULK
+from utils.http_client import get_shared_client
+from utils.metrics import get_metrics, export_summary
+from utils.prompts import get_prompt_registry
+from utils.pipeline import Pipeline, Stage
+from utils.llm_stream import text_answer
+from utils.model_router import build_router, SMALL_MODEL
+from utils.rule_engine import RuleEngine
+from concurrent.futures import Future, ThreadPoolExecutor
 
 logger = setup_logger('challenge3')
 
+QUESTION_PROMPT = get_prompt_registry().register(
+    'calibration_question',
+    system="Odpowiadaj krótko i rzeczowo na pytania.",
+)
+BATCH_PROMPT = get_prompt_registry().register(
+    'calibration_batch',
+    system=(
+        "Odpowiadaj krótko i rzeczowo na pytania. "
+        'Zwróć wyłącznie JSON w formacie {"answers": ["odpowiedź 1", "odpowiedź 2", ...]} '
+        "z odpowiedziami w kolejności pytań."
+    ),
+    user="{numbered}",
+)
+
+# Kaskada: działania liczone lokalnie -> mały model -> duży model (gdy odpowiedź jest pusta, "???" lub ucięta na max_tokens)
+QUESTION_ROUTER = build_router('challenge3', rule_engine=RuleEngine([{'name': 'math', 'solver': 'arithmetic'}]))
+
+def is_open_question(test):
+    """Pytanie otwarte czeka na odpowiedź LLM, gdy nie ma odpowiedzi albo jest nią '???'"""
+    return not test.get('a') or test['a'] == '???'
+
+
+def validate_event(event):
+    """Etap potoku: poprawia błędne sumy w paczce rekordów (funkcja modułu - może działać w puli procesów)"""
+    if event[0] != 'batch':
+        return event
+    records = event[2]
+    for index, correct_answer in validate_sums(records):
+        logger.info("Poprawiam %s: było %s, powinno być %s",
+                    records[index]['question'], records[index]['answer'], correct_answer)
+        records[index]['answer'] = correct_answer
+    return event
+
+
+class _QuestionPacker:
+    """Zbiera pytania otwarte z kolejnych paczek rekordów w prompty po pack_size pytań
+
+    Pełny prompt od razu trafia do wspólnej puli wątków; niepełny czeka na pytania z następnych
+    paczek, aż ktoś będzie potrzebował odpowiedzi (flush). submit nie czeka na odpowiedź LLM.
+    """
+
+    def __init__(self, executor, answer_pack, pack_size):
+        self.executor = executor
+        self.answer_pack = answer_pack
+        self.pack_size = pack_size
+        self._pending = []  # (pytanie, Future) czekające na pełny prompt
+        self._lock = threading.Lock()
+
+    def submit(self, question):
+        """Zleca odpowiedź na pytanie - zwraca Future z odpowiedzią"""
+        future = Future()
+        with self._lock:
+            self._pending.append((question, future))
+            if len(self._pending) < self.pack_size:
+                return future
+            pack, self._pending = self._pending, []
+        self.executor.submit(self._run, pack)
+        return future
+
+    def flush(self):
+        """Wysyła niepełny prompt - wywoływane przed czekaniem na odpowiedzi"""
+        with self._lock:
+            pack, self._pending = self._pending, []
+        if pack:
+            self.executor.submit(self._run, pack)
+
+    def _run(self, pack):
+        try:
+            answers = self.answer_pack([question for question, _ in pack])
+        except BaseException as e:
+            for _, future in pack:
+                future.set_exception(e)
+            return
+        for (_, future), answer in zip(pack, answers):
+            future.set_result(answer)
+
+
 class JSONCalibrator:
-    def __init__(self):
+    def __init__(self, max_workers=8, requests_per_minute=None, pack_size=1, streaming=False,
+                 stream_batch_size=1000, chunk_size=64 * 1024, base_url=None, validate_processes=0):
         load_dotenv()
         self.api_key = os.getenv('AI_DEVS_API_KEY')
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.base_url = "https://centrala.ag3nts.org"
+        self.client = get_shared_scheduler().client_for(BULK)
+        self.router = QUESTION_ROUTER
+        self.base_url = base_url or os.getenv('CENTRALA_BASE_URL', "https://centrala.ag3nts.org")
+        self.cache = get_shared_cache()
+        self.session = get_shared_client()
+        self.metrics = get_metrics()
+        # Równoległe odpowiadanie na pytania otwarte - jedna pula dla pytań ze wszystkich paczek
+        self.max_workers = max_workers
+        self.pack_size = max(1, pack_size)  # ile pytań pakujemy w jeden prompt
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        # Tryb strumieniowy - stałe zużycie pamięci niezależnie od rozmiaru pliku
+        self.streaming = streaming
+        self.stream_batch_size = stream_batch_size  # ile rekordów przetwarzamy naraz
+        self.chunk_size = chunk_size
+        # Potok: paczki rekordów przechodzą walidację i odpowiadanie LLM jednocześnie.
+        # Walidacja sum (numpy) jest szybsza niż serializacja paczki do innego procesu,
+        # więc domyślnie działa w wątku; validate_processes > 0 przenosi ją do puli procesów.
+        self.validate_processes = validate_processes
+        self.pipeline = self.build_pipeline()
+        self._packer = None  # _QuestionPacker bieżącego przebiegu potoku
         
     def fetch_json(self):
         """Pobiera plik JSON z API"""
         url = f"{self.base_url}/data/{self.api_key}/json.txt"
         try:
-            response = requests.get(url)
+            response = self.session.get(url)
             response.raise_for_status()
             data = response.text
             logger.info("Pobrano dane JSON")
-            return json.loads(data)
+            with self.metrics.span('parse', kind='json'):
+                return json.loads(data)
         except Exception as e:
-            logger.error(f"Błąd podczas pobierania JSON: {e}")
+            logger.error("Błąd podczas pobierania JSON: %s", e)
             raise
 
-    def evaluate_expression(self, expression):
-        """Bezpiecznie oblicza wyrażenie matematyczne"""
-        try:
-            # Usuń wszystkie znaki oprócz liczb i podstawowych operatorów
-            clean_expr = re.sub(r'[^0-9+\-*/\s\.]', '', expression)
-            return eval(clean_expr)
-        except:
-            return None
-
-    def validate_calculations(self, data):
-        """Sprawdza i poprawia obliczenia oraz uzupełnia odpowiedzi na pytania"""
+    def fetch_json_stream(self):
+        """Pobiera plik JSON strumieniowo - zwraca generator zdarzeń z iter_json_events"""
+        url = f"{self.base_url}/data/{self.api_key}/json.txt"
         try:
-            test_data = data.get('test-data', [])
-            logger.info(f"Znaleziono {len(test_data)} rekordów do sprawdzenia")
-            
-            for record in test_data:
-                # Jeśli rekord ma pole test - to pytanie dla LLM
-                if isinstance(record, dict) and 'test' in record:
-                    test = record['test']
-                    if 'q' in test and ('a' not in test or test['a'] == '???'):
-                        question = test['q']
-                        logger.info(f"Znaleziono pytanie dla LLM: {question}")
-                        answer = self.get_answer_for_question(question)
-                        if answer:
-                            test['a'] = answer
-                            logger.info(f"Uzupełniono odpowiedź: {answer}")
-                
-                # W przeciwnym razie sprawdzamy obliczenia
-                elif 'question' in record and 'answer' in record:
-                    question = record['question']
-                    if '+' in question and question.replace('+','').replace(' ','').isdigit():
-                        given_answer = record['answer']
-                        correct_answer = self.evaluate_expression(question)
-                        
-                        if correct_answer is not None and given_answer != correct_answer:
-                            logger.info(f"Poprawiam {question}: było {given_answer}, powinno być {correct_answer}")
-                            record['answer'] = correct_answer
-            
-            return data
-                
+            response = self.session.get(url, stream=True)
+            response.raise_for_status()
+            logger.info("Rozpoczęto strumieniowe pobieranie danych JSON")
         except Exception as e:
-            logger.error(f"Błąd podczas walidacji danych: {e}")
+            logger.error("Błąd podczas pobierania JSON: %s", e)
             raise
+        
+        try:
+            yield from iter_json_events(response.iter_content(chunk_size=self.chunk_size))
+        finally:
+            response.close()
+
+    def evaluate_expression(self, expression):
+        """Bezpiecznie oblicza wyrażenie matematyczne"""
+        return safe_eval(expression)
 
     def get_answer_for_question(self, question):
-        """Używa LLM do odpowiedzi na pytania otwarte"""
+        """Odpowiada na pytanie otwarte najtańszym backendem, którego odpowiedź przejdzie walidację"""
+        logger.info("Pytanie do LLM: %s", question)
+        
+        result = self.router.answer(
+            question,
+            messages=QUESTION_PROMPT.messages(question=question),
+            validator=text_answer,
+            max_tokens=100,
+            client=self.client,
+            cache=self.cache,
+            question_tokens=QUESTION_PROMPT.user_tokens(question=question),
+        )
+        if result.errors:
+            logger.error("Błąd podczas uzyskiwania odpowiedzi od LLM: %s", result.errors)
+        logger.info("Odpowiedź (%s, próby: %s): %s", result.backend, result.attempts, result.answer)
+        return result.answer
+
+    def _collect_open_questions(self, records, is_open):
+        """Zbiera pytania otwarte jako listę (indeks rekordu, pytanie)"""
+        pending = []
+        for index, record in enumerate(records):
+            if isinstance(record, dict) and 'test' in record:
+                test = record['test']
+                if 'q' in test and is_open(test):
+                    pending.append((index, test['q']))
+        return pending
+
+    def _answer_pack(self, questions):
+        """Odpowiada na prompt z pytaniami - pojedyncze pytanie bez JSON, kilka w jednym prompcie"""
+        self.rate_limiter.acquire()
+        if len(questions) == 1:
+            return [self.get_answer_for_question(questions[0])]
+        return self.get_answers_for_batch(questions)
+
+    def get_answers_for_batch(self, questions):
+        """Odpowiada na kilka krótkich pytań w jednym prompcie ze strukturalną odpowiedzią JSON"""
         try:
-            messages = [
-                {"role": "system", "content": "Odpowiadaj krótko i rzeczowo na pytania."},
-                {"role": "user", "content": question}
-            ]
+            numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+            messages = BATCH_PROMPT.messages(numbered=numbered)
             
-            logger.info(f"Pytanie do LLM: {question}")
+            logger.info("Pytania do LLM (paczka %d)", len(questions))
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0,
-                max_tokens=100
-            )
+            with self.metrics.span('llm_call', model=SMALL_MODEL):
+                response = self.client.chat.completions.create(
+                    model=SMALL_MODEL,
+                    messages=messages,
+                    temperature=0,
+                    max_tokens=100 * len(questions),
+                    response_format={"type": "json_object"}
+                )
             
-            answer = response.choices[0].message.content.strip()
-            logger.info(f"Odpowiedź LLM: {answer}")
-            
-            return answer
-        except Exception as e:
-            logger.error(f"Błąd podczas uzyskiwania odpowiedzi od LLM: {e}")
-            return None
-
-    def complete_test_answers(self, data):
-        """Uzupełnia brakujące odpowiedzi w polach test"""
-        try:
-            for record in data:
-                if isinstance(record, dict) and 'test' in record:
-                    test_data = record['test']
-                    if 'q' in test_data and ('a' not in test_data or not test_data['a']):
-                        question = test_data['q']
-                        answer = self.get_answer_for_question(question)
-                        if answer:
-                            test_data['a'] = answer
-                            logger.info(f"Uzupełniono odpowiedź dla pytania: {question}")
-            return data
+            answers = json.loads(response.choices[0].message.content)['answers']
+            if len(answers) != len(questions):
+                raise ValueError(f"oczekiwano {len(questions)} odpowiedzi, otrzymano {len(answers)}")
+            return [str(answer).strip() for answer in answers]
         except Exception as e:
-            logger.error(f"Błąd podczas uzupełniania odpowiedzi: {e}")
-            raise
+            # Paczka się nie udała - pytamy pojedynczo
+            logger.error("Błąd podczas odpowiadania na paczkę pytań, pytam pojedynczo: %s", e)
+            return [self.get_answer_for_question(question) for question in questions]
 
     def send_solution(self, data):
         """Wysyła rozwiązanie do API"""
@@ -131,38 +234,157 @@ class JSONCalibrator:
             }
             
             logger.info("Wysyłam pełny poprawiony plik JSON")
-            response = requests.post(url, json=payload)
+            # Ten sam plik wysłany drugi raz daje ten sam wynik - POST można bezpiecznie ponowić
+            response = self.session.post(url, json=payload, retry=True)
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            logger.error(f"Błąd podczas wysyłania rozwiązania: {e}")
+            logger.error("Błąd podczas wysyłania rozwiązania: %s", e)
+            raise
+
+    def _batch_events(self, events):
+        """Grupuje zdarzenia 'item' w paczki ('batch', klucz, rekordy) po stream_batch_size"""
+        batch = []
+        key = None
+        for event in events:
+            if event[0] == 'item':
+                key = event[1]
+                batch.append(event[2])
+                if len(batch) >= self.stream_batch_size:
+                    yield ('batch', key, batch)
+                    batch = []
+                continue
+            if batch:
+                yield ('batch', key, batch)
+                batch = []
+            yield event
+        if batch:
+            yield ('batch', key, batch)
+
+    def _submit_event(self, event):
+        """Etap potoku: zleca pytania otwarte z paczki do wspólnej puli LLM, nie czekając na odpowiedzi"""
+        if event[0] != 'batch':
+            return event, []
+        pending = self._collect_open_questions(event[2], is_open_question)
+        if pending:
+            logger.info("Znaleziono %d pytań dla LLM (równolegle: %s, w jednym prompcie: %s)", len(pending), self.max_workers, self.pack_size)
+        return event, [(index, question, self._packer.submit(question)) for index, question in pending]
+
+    def _collect_event(self, submitted):
+        """Etap potoku: czeka na odpowiedzi na pytania z paczki i wpisuje je do rekordów"""
+        event, pending = submitted
+        if pending:
+            self._packer.flush()
+        for index, question, future in pending:
+            answer = future.result()
+            if answer:
+                event[2][index]['test']['a'] = answer
+                logger.info("Uzupełniono odpowiedź na '%s': %s", question, answer)
+        return event
+
+    def build_pipeline(self):
+        """Walidacja sum, zlecanie pytań i zbieranie odpowiedzi LLM jako osobne etapy
+
+        Pytania z kolejnych paczek trafiają do jednej puli max_workers wątków (i mogą dzielić prompt),
+        więc równoległość LLM nie zależy od podziału na paczki; kolejka etapu 'collect' pozwala
+        zlecać pytania z max_workers paczek naprzód.
+        """
+        if self.validate_processes:
+            validate = Stage('validate', validate_event, workers=self.validate_processes, kind='process', queue_size=2)
+        else:
+            validate = Stage('validate', validate_event, queue_size=2)
+        return Pipeline('challenge3', [
+            validate,
+            Stage('answer', self._submit_event, queue_size=2),
+            Stage('collect', self._collect_event, queue_size=self.max_workers),
+        ])
+
+    def _run_pipeline(self, events):
+        """Przepuszcza zdarzenia przez potok ze wspólną pulą wątków LLM na czas przebiegu"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self._packer = _QuestionPacker(executor, self._answer_pack, self.pack_size)
+            yield from self.pipeline.run(self._batch_events(events))
+
+    def correct_records(self, records):
+        """Poprawia listę rekordów test-data potokiem - zwraca poprawione rekordy w tej samej kolejności"""
+        corrected = []
+        for event in self._run_pipeline(('item', 'test-data', record) for record in records):
+            corrected.extend(event[2])
+        return corrected
+
+    def correct_stream(self, events):
+        """Przepuszcza zdarzenia JSON przez potok, poprawiając rekordy test-data paczkami po stream_batch_size"""
+        has_apikey = False
+        for event in self._run_pipeline(events):
+            if event[0] == 'batch':
+                for record in event[2]:
+                    yield ('item', event[1], record)
+                continue
+            
+            if event[0] == 'field' and event[1] == 'apikey':
+                # Podmień klucz API na właściwy w danych
+                has_apikey = True
+                event = ('field', 'apikey', self.api_key)
+            yield event
+        
+        if not has_apikey:
+            yield ('field', 'apikey', self.api_key)
+
+    def send_solution_stream(self, events):
+        """Wysyła poprawiony plik JSON strumieniowo (chunked transfer encoding)"""
+        url = f"{self.base_url}/report"
+        try:
+            prefix = f'{{"task": "JSON", "apikey": {json.dumps(self.api_key)}, "answer": '
+            body = iter_json_bytes(events, prefix=prefix, suffix='}', buffer_size=self.chunk_size)
+            
+            logger.info("Wysyłam strumieniowo poprawiony plik JSON")
+            response = self.session.post(url, data=body, headers={"content-type": "application/json"})
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error("Błąd podczas wysyłania rozwiązania: %s", e)
+            raise
+
+    def solve_streaming(self):
+        """Pobieranie, poprawianie i wysyłanie pliku w jednym przebiegu strumieniowym"""
+        try:
+            result = self.send_solution_stream(self.correct_stream(self.fetch_json_stream()))
+            logger.info("Wysłano rozwiązanie: %s", result)
+            return result
+        except Exception as e:
+            logger.error("Błąd podczas rozwiązywania zadania: %s", e)
             raise
 
     def solve(self):
         """Główna logika rozwiązania"""
+        if self.streaming:
+            return self.solve_streaming()
+        
         try:
             # 1. Pobierz dane
             data = self.fetch_json()
             logger.info("Pobrano plik JSON")
 
-            # 2. Sprawdź i popraw obliczenia
-            data = self.validate_calculations(data)
-            logger.info("Sprawdzono obliczenia")
-
-            # 3. Uzupełnij brakujące odpowiedzi
-            data = self.complete_test_answers(data)
-            logger.info("Uzupełniono odpowiedzi")
+            # 2. Popraw obliczenia i uzupełnij brakujące odpowiedzi (etapy potoku działają jednocześnie)
+            test_data = data.get('test-data', [])
+            logger.info("Znaleziono %d rekordów do sprawdzenia", len(test_data))
+            data['test-data'] = self.correct_records(test_data)
+            logger.info("Sprawdzono obliczenia i uzupełniono odpowiedzi: %s", self.pipeline.stats())
 
-            # 4. Wyślij rozwiązanie
+            # 3. Wyślij rozwiązanie
             result = self.send_solution(data)
-            logger.info(f"Wysłano rozwiązanie: {result}")
+            logger.info("Wysłano rozwiązanie: %s", result)
             return result
 
         except Exception as e:
-            logger.error(f"Błąd podczas rozwiązywania zadania: {e}")
+            logger.error("Błąd podczas rozwiązywania zadania: %s", e)
             raise
 
 def solve_challenge():
     logger.info("Rozpoczynam zadanie 3 - Kalibracja JSON")
     calibrator = JSONCalibrator()
-    return calibrator.solve()
\ No newline at end of file
+    try:
+        return calibrator.solve()
+    finally:
+        logger.info("Statystyki routera: %s", calibrator.router.stats())
+        export_summary('challenge3')
\ No newline at end of file
@@ -1,25 +1,93 @@
+import argparse
+import ast
 import importlib
-import pkgutil
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from multiprocessing.connection import wait
 from challenges import *
+from utils.metrics import get_metrics
+
+CHALLENGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'challenges')
+MANIFEST_PATH = os.path.join('cache', 'challenges_manifest.json')
+BATCH_LOG_DIR = os.path.join('logs', 'batch')
+CHALLENGE_FILE_RE = re.compile(r'challenge(\d+)\.py$')
+
+
+def _read_challenge_info(path):
+    """Czyta docstring i sprawdza obecność solve_challenge bez importowania modułu"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    has_solve = any(
+        isinstance(node, ast.FunctionDef) and node.name == 'solve_challenge'
+        for node in tree.body
+    )
+    return {'description': ast.get_docstring(tree), 'has_solve': has_solve}
+
+
+def _load_manifest():
+    try:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest):
+    try:
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"Nie można zapisać manifestu zadań: {e}")
+
 
 def get_available_challenges():
+    """Wykrywa zadania po plikach challengeN.py - moduły są importowane dopiero przy uruchomieniu
+
+    Opisy są czytane z AST i zapamiętywane w manifeście (klucz: czas modyfikacji pliku),
+    więc kolejne uruchomienia nie muszą nawet parsować plików.
+    """
     challenges = {}
     print("\nSzukam dostępnych zadań...")
-    for _, name, _ in pkgutil.iter_modules(['challenges']):
-        if name.startswith('challenge'):
+    manifest = _load_manifest()
+    updated = False
+    for file_name in sorted(os.listdir(CHALLENGES_DIR)):
+        match = CHALLENGE_FILE_RE.match(file_name)
+        if not match:
+            continue
+        path = os.path.join(CHALLENGES_DIR, file_name)
+        mtime = os.path.getmtime(path)
+        entry = manifest.get(file_name)
+        if entry is None or entry.get('mtime') != mtime:
             try:
-                module = importlib.import_module(f'challenges.{name}')
-                if hasattr(module, 'solve_challenge'):
-                    challenge_number = name.replace('challenge', '')
-                    description = module.__doc__ or "Brak opisu zadania"
-                    challenges[challenge_number] = {
-                        'module': module,
-                        'description': description.strip()
-                    }
-            except ImportError as e:
-                print(f"Nie można załadować modułu {name}: {e}")
+                entry = {'mtime': mtime, **_read_challenge_info(path)}
+            except (OSError, SyntaxError) as e:
+                print(f"Nie można odczytać modułu {file_name}: {e}")
+                continue
+            manifest[file_name] = entry
+            updated = True
+        if entry['has_solve']:
+            challenges[match.group(1)] = {
+                'module_name': f"challenges.{file_name[:-3]}",
+                'description': (entry['description'] or "Brak opisu zadania").strip()
+            }
+    if updated:
+        _save_manifest(manifest)
     return challenges
 
+
+def load_challenge(challenges, number):
+    """Importuje moduł wybranego zadania (razem z jego ciężkimi zależnościami)"""
+    return importlib.import_module(challenges[number]['module_name'])
+
+
 def display_challenges(challenges):
     print("\nDostępne zadania:")
     print("-" * 50)
@@ -27,25 +95,167 @@ def display_challenges(challenges):
         print(f"{number}. {data['description']}")
     print("-" * 50)
 
-def main():
-    challenges = get_available_challenges()
-    
+
+def run_challenge(challenges, number):
+    print(f"\nUruchamiam zadanie {number}...")
+    # Wspólny rejestr metryk żyje tyle, co proces - w menu każde zadanie zaczyna od zera,
+    # żeby metrics_<zadanie>.json/.prom nie zawierały liczników poprzednich zadań
+    get_metrics().reset()
+    try:
+        load_challenge(challenges, number).solve_challenge()
+        return True
+    except Exception as e:
+        print(f"Błąd podczas wykonywania zadania: {e}")
+        return False
+
+
+def _json_safe(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def _batch_worker(module_name, log_dir, conn):
+    """Uruchamia solve_challenge w osobnym procesie i odsyła wynik przez potok"""
+    # Logger zadania tworzony jest przy imporcie modułu - katalog logów ustawiamy wcześniej
+    os.environ['LOG_DIR'] = log_dir
+    start = time.perf_counter()
+    try:
+        result = importlib.import_module(module_name).solve_challenge()
+        payload = {'status': 'ok', 'result': _json_safe(result)}
+    except BaseException as e:
+        payload = {'status': 'error', 'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()}
+    payload['duration'] = time.perf_counter() - start
+    conn.send(payload)
+    conn.close()
+
+
+def run_batch(challenges, numbers, workers=None, timeout=None, log_root=BATCH_LOG_DIR):
+    """Uruchamia wybrane zadania równolegle - każde w osobnym procesie, z własnym katalogiem logów
+
+    Naraz działa najwyżej `workers` procesów (domyślnie tyle, ile zadań). Zadanie, które nie
+    skończy się w `timeout` sekund, jest przerywane. Błąd lub awaria jednego procesu nie
+    wpływa na pozostałe - każde zadanie dostaje wpis ze statusem ok/error/timeout/crashed.
+    """
+    # spawn: czysty interpreter bez wątków i połączeń odziedziczonych po procesie głównym
+    context = multiprocessing.get_context('spawn')
+    workers = max(1, workers or len(numbers))
+    pending = deque(numbers)
+    running = {}  # potok -> (numer, proces, start)
+    results = {}
+    started_at = datetime.now().isoformat()
+    started = time.perf_counter()
+
+    while pending or running:
+        while pending and len(running) < workers:
+            number = pending.popleft()
+            log_dir = os.path.join(log_root, f"challenge{number}")
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_batch_worker, args=(challenges[number]['module_name'], log_dir, sender),
+                name=f"challenge{number}", daemon=True
+            )
+            process.start()
+            sender.close()
+            running[receiver] = (number, process, time.perf_counter())
+            results[number] = {'challenge': number, 'log_dir': log_dir}
+            print(f"Uruchomiono zadanie {number} (pid {process.pid})")
+
+        now = time.perf_counter()
+        wait_for = None
+        if timeout is not None:
+            wait_for = max(0.0, min(start + timeout for _, _, start in running.values()) - now)
+        for receiver in wait(list(running), timeout=wait_for):
+            number, process, start = running.pop(receiver)
+            try:
+                results[number].update(receiver.recv())
+            except EOFError:
+                # Proces zakończył się bez wyniku (np. zabity przez system)
+                process.join()
+                results[number].update(status='crashed', exit_code=process.exitcode,
+                                       duration=time.perf_counter() - start)
+            receiver.close()
+            process.join()
+            print(f"Zadanie {number}: {results[number]['status']} ({results[number]['duration']:.1f}s)")
+
+        if timeout is not None:
+            now = time.perf_counter()
+            for receiver, (number, process, start) in list(running.items()):
+                if now - start >= timeout:
+                    process.terminate()
+                    process.join()
+                    receiver.close()
+                    del running[receiver]
+                    results[number].update(status='timeout', duration=now - start,
+                                           error=f"Przekroczono limit czasu {timeout}s")
+                    print(f"Zadanie {number}: timeout")
+
+    return {
+        'started': started_at,
+        'duration': time.perf_counter() - started,
+        'workers': workers,
+        'timeout': timeout,
+        'results': [results[number] for number in numbers],
+    }
+
+
+def interactive(challenges):
     while True:
         display_challenges(challenges)
         choice = input("\nWybierz numer zadania (q aby wyjść): ").strip()
-        
+
         if choice.lower() == 'q':
             print("Do widzenia!")
             break
-            
+
         if choice in challenges:
-            print(f"\nUruchamiam zadanie {choice}...")
-            try:
-                challenges[choice]['module'].solve_challenge()
-            except Exception as e:
-                print(f"Błąd podczas wykonywania zadania: {e}")
+            run_challenge(challenges, choice)
         else:
             print(f"\nNieznane zadanie: {choice}")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rozwiązania zadań AI_devs 3")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="uruchamia wybrane zadanie bez menu")
+    run_parser.add_argument('number', help="numer zadania, np. 3")
+    subparsers.add_parser('list', help="wypisuje dostępne zadania")
+    batch_parser = subparsers.add_parser('batch', help="uruchamia wiele zadań równolegle, bez interakcji")
+    batch_parser.add_argument('numbers', nargs='*', help="numery zadań (domyślnie wszystkie)")
+    batch_parser.add_argument('--workers', type=int, help="liczba równoległych procesów")
+    batch_parser.add_argument('--timeout', type=float, help="limit czasu jednego zadania w sekundach")
+    batch_parser.add_argument('--output', help="plik JSON z wynikami (domyślnie wypisywany na konsolę)")
+    args = parser.parse_args(argv)
+
+    challenges = get_available_challenges()
+
+    if args.command == 'list':
+        display_challenges(challenges)
+    elif args.command == 'run':
+        if args.number not in challenges:
+            print(f"\nNieznane zadanie: {args.number}")
+            return 2
+        return 0 if run_challenge(challenges, args.number) else 1
+    elif args.command == 'batch':
+        numbers = args.numbers or sorted(challenges, key=int)
+        unknown = [number for number in numbers if number not in challenges]
+        if unknown:
+            print(f"\nNieznane zadania: {', '.join(unknown)}")
+            return 2
+        report = run_batch(challenges, numbers, workers=args.workers, timeout=args.timeout)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output)
+            print(f"Zapisano wyniki do {args.output}")
+        else:
+            print(output)
+        return 0 if all(result['status'] == 'ok' for result in report['results']) else 1
+    else:
+        interactive(challenges)
+    return 0
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Porównanie walidacji obliczeń: pętla z eval (stara wersja) vs validate_sums (NumPy)
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_arithmetic
+"""
+import random
+import re
+import time
+
+from utils.arithmetic import validate_sums
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_records(count, error_rate=0.05, seed=42):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        a, b = rng.randint(0, 100), rng.randint(0, 100)
+        answer = a + b if rng.random() > error_rate else a + b + 1
+        records.append({'question': f"{a} + {b}", 'answer': answer})
+    return records
+
+
+def legacy_loop(records):
+    """Stara pętla z JSONCalibrator.validate_calculations"""
+    mismatches = []
+    for index, record in enumerate(records):
+        question = record['question']
+        if '+' in question and question.replace('+', '').replace(' ', '').isdigit():
+            clean_expr = re.sub(r'[^0-9+\-*/\s\.]', '', question)
+            correct = eval(clean_expr)
+            if record['answer'] != correct:
+                mismatches.append((index, correct))
+    return mismatches
+
+
+def measure(func, records):
+    start = time.perf_counter()
+    result = func(records)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'rekordy':>10} {'pętla [s]':>12} {'numpy [s]':>12} {'przyspieszenie':>15}")
+    for size in SIZES:
+        records = make_records(size)
+        legacy_time, legacy_result = measure(legacy_loop, records)
+        vector_time, vector_result = measure(validate_sums, records)
+        assert legacy_result == vector_result, "Wyniki się różnią!"
+        print(f"{size:>10} {legacy_time:>12.3f} {vector_time:>12.3f} {legacy_time / vector_time:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
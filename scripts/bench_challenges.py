@@ -0,0 +1,115 @@
+"""Wydajność end-to-end zadań offline - na lokalnych zamiennikach usług (scripts/standins.py)
+
+Każdy scenariusz uruchamiany jest --runs razy; raportowane są czasy (p50/średnia/max) i przebiegi/s.
+Domyślnie cache LLM jest czyszczony przed każdym przebiegiem (--warm wyłącza czyszczenie).
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_challenges --runs 5 --llm-latency 0.05
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from scripts.standins import StandinConfig, StandinServer
+
+
+def build_scenarios(args):
+    # Importy dopiero po ustawieniu zmiennych środowiskowych zamienników
+    from challenges.challenge1 import CaptchaSolver
+    from challenges.challenge2 import RobotVerifier, run_parallel_sessions
+    from challenges.challenge3 import JSONCalibrator
+
+    def captcha():
+        stats = CaptchaSolver().run_adaptive(max_attempts=50, poll_interval=0.01)
+        assert stats['success'], stats
+
+    def verify():
+        RobotVerifier().verify()
+
+    def verify_parallel():
+        report = run_parallel_sessions(args.sessions, concurrency=min(args.sessions, 50))
+        assert report['statuses'] == {'flag': args.sessions}, report['statuses']
+
+    def calibrate():
+        JSONCalibrator().solve()
+
+    def calibrate_streaming():
+        JSONCalibrator(streaming=True).solve()
+
+    return {
+        'challenge1 captcha (adaptive)': captcha,
+        'challenge2 verify': verify,
+        f'challenge2 {args.sessions} sesji równolegle': verify_parallel,
+        'challenge3 kalibracja': calibrate,
+        'challenge3 kalibracja strumieniowa': calibrate_streaming,
+    }
+
+
+def measure(scenario, runs, clear_cache):
+    from utils.llm_cache import get_shared_cache
+
+    timings = []
+    for _ in range(runs):
+        if clear_cache:
+            get_shared_cache().clear()
+        start = time.perf_counter()
+        scenario()
+        timings.append(time.perf_counter() - start)
+    return {
+        'runs': runs,
+        'p50': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'max': max(timings),
+        'runs_per_second': runs / sum(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--records', type=int, default=10_000)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--warm', action='store_true', help="nie czyść cache LLM między przebiegami")
+    parser.add_argument('--json', help="zapisz wyniki do pliku JSON")
+    args = parser.parse_args()
+
+    config = StandinConfig(records=args.records, rotation=0.2,
+                           llm_latency=args.llm_latency, llm_error_rate=args.llm_error_rate)
+    server = StandinServer(config).start()
+    os.environ.update(server.environment())
+    os.environ['LLM_CACHE_PATH'] = ''
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    # Pliki wynikowe zadań i logi trafiają do katalogu tymczasowego
+    repo_root = os.getcwd()
+    sys.path.insert(0, repo_root)
+    workdir = tempfile.mkdtemp(prefix='bench_challenges_')
+    os.chdir(workdir)
+
+    results = {}
+    try:
+        for name, scenario in build_scenarios(args).items():
+            for logger_name in ('challenge1', 'challenge2', 'challenge3'):
+                logging.getLogger(logger_name).setLevel(os.environ['LOG_LEVEL'])
+            results[name] = measure(scenario, args.runs, clear_cache=not args.warm)
+    finally:
+        os.chdir(repo_root)
+        server.stop()
+
+    print(f"{'scenariusz':>40} {'p50 [s]':>9} {'średnio [s]':>12} {'max [s]':>9} {'przebiegi/s':>12}")
+    for name, result in results.items():
+        print(f"{name:>40} {result['p50']:>9.3f} {result['mean']:>12.3f} {result['max']:>9.3f} "
+              f"{result['runs_per_second']:>12.2f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
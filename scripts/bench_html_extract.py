@@ -0,0 +1,76 @@
+"""Odczyt pytania captcha: pełne drzewo BeautifulSoup vs HTMLExtractor
+
+Strony: realistyczna strona logowania (~4 KB), duże strony (pytanie na początku i na końcu)
+oraz strony o nietypowej strukturze, które wymuszają ścieżkę parsera i BeautifulSoup.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_html_extract
+"""
+import time
+
+from bs4 import BeautifulSoup
+
+from utils.html_extract import HTMLExtractor
+
+QUESTION = '<p id="human-question">Question:<br />Rok zdobycia Bastylii?</p>'
+HEAD = (
+    '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>XYZ - Login</title>'
+    '<link rel="stylesheet" href="/css/style.css"><script>window.dataLayer = window.dataLayer || [];'
+    'function gtag(){dataLayer.push(arguments);}</script>'
+    '<style>body { font-family: sans-serif; } .login { margin: 0 auto; }</style></head><body>'
+)
+NAV = ''.join(f'<li class="nav-item"><a href="/page/{i}">Strona {i}</a></li>' for i in range(40))
+FORM = (
+    '<div class="login"><form method="post"><label for="username">Login</label>'
+    '<input type="text" name="username" id="username" /><label for="password">Hasło</label>'
+    '<input type="password" name="password" id="password" />'
+    f'{QUESTION}<input type="text" name="answer" id="answer" /><button type="submit">Zaloguj</button></form></div>'
+)
+FILLER = '<div class="row"><p>Lorem ipsum dolor sit amet, <b>zażółć</b> gęślą jaźń &amp; co.</p></div>\n'
+TAIL = '<footer><p>&copy; XYZ 2024</p></footer></body></html>'
+
+
+def large(size_mb, question_first):
+    filler = FILLER * (size_mb * 1024 * 1024 // len(FILLER))
+    body = f'{FORM}{filler}' if question_first else f'{filler}{FORM}'
+    return f'{HEAD}<ul>{NAV}</ul>{body}{TAIL}'
+
+
+PAGES = {
+    'realistyczna (~4 KB)': f'{HEAD}<ul>{NAV}</ul>{FORM}{TAIL}',
+    '1 MB, pytanie na początku': large(1, True),
+    '1 MB, pytanie na końcu': large(1, False),
+    '5 MB, pytanie na końcu': large(5, False),
+    'zagnieżdżony <p> (parser)': f'{HEAD}<p id="human-question">Question:<p>Rok?</p> zdobycia</p>{TAIL}',
+    'niezamknięty <p> (fallback)': f'{HEAD}<div><p id="human-question">Question: Rok?</div>{TAIL}',
+}
+
+
+def bs4_question(page):
+    element = BeautifulSoup(page, 'html.parser').find(id='human-question')
+    return element.text if element is not None else None
+
+
+def measure(function, page, budget=0.5):
+    runs, start = 0, time.perf_counter()
+    while True:
+        result = function(page)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return result, elapsed / runs * 1000
+
+
+def main():
+    extractor = HTMLExtractor({'question': '#human-question'})
+    print(f"{'strona':>30} {'BeautifulSoup [ms]':>19} {'ekstraktor [ms]':>16} {'ścieżka':>9} {'x':>7}")
+    for name, page in PAGES.items():
+        expected, soup_ms = measure(bs4_question, page)
+        before = dict(extractor.stats)
+        result, fast_ms = measure(lambda text: extractor.extract(text)['question'], page)
+        path = max(extractor.stats, key=lambda key: extractor.stats[key] - before[key])
+        assert result == expected, (name, result, expected)
+        print(f"{name:>30} {soup_ms:>19.3f} {fast_ms:>16.3f} {path:>9} {soup_ms / fast_ms:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Zapis historii rozmowy: YAML całej historii na końcu vs dziennik JSON-lines tura po turze
+
+Dla N tur mierzy: koszt jednej tury (dopisanie do dziennika), czas zamknięcia (fsync +
+kompaktowanie) oraz czas jednorazowego yaml.dump całej historii, jak w dawnym
+_save_conversation_history. Zrzut YAML 100k tur trwa długo - --sizes pozwala go pominąć.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_journal --sizes 1000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import yaml
+
+from challenges.challenge2 import compact_journal
+from utils.journal import Journal
+
+
+def turns(count):
+    for i in range(count):
+        yield f"What is {i} + {i}?", str(2 * i)
+
+
+def bench_yaml(count, path):
+    messages = []
+    for question, answer in turns(count):
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": answer})
+    start = time.perf_counter()
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.dump({'timestamp': datetime.now().isoformat(), 'messages': messages}, f, allow_unicode=True)
+    return time.perf_counter() - start
+
+
+def bench_journal(count, path):
+    journal = Journal(path)
+    start = time.perf_counter()
+    journal.append('session_start', session='bench')
+    for i, (question, answer) in enumerate(turns(count)):
+        journal.append('turn', session='bench', msg_id=i, question=question, answer=answer, source='llm')
+    appended = time.perf_counter() - start
+    start = time.perf_counter()
+    journal.close(compact=compact_journal)
+    return appended, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100_000])
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_journal_')
+    print(f"{'tury':>8} {'YAML [s]':>10} {'dziennik: tura [µs]':>20} {'dopisanie [s]':>14} {'zamknięcie [s]':>15}")
+    for count in args.sizes:
+        yaml_time = bench_yaml(count, os.path.join(folder, f'history_{count}.yaml'))
+        appended, closed = bench_journal(count, os.path.join(folder, f'journal_{count}.jsonl'))
+        print(f"{count:>8} {yaml_time:>10.2f} {appended / count * 1e6:>20.1f} {appended:>14.3f} {closed:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
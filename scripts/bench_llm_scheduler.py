@@ -0,0 +1,77 @@
+"""Harmonogram LLM na lokalnym zamienniku OpenAI: łączenie zapytań, priorytety i 429
+
+Scenariusze:
+  * coalescing - N wątków zadaje to samo pytanie naraz; do API trafia jedno zapytanie,
+  * priorytety - zaległa paczka BULK i pytania INTERACTIVE przy limicie RPM,
+  * 429 - zamiennik odrzuca część zapytań, harmonogram ponawia je z backoffem.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_llm_scheduler
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.standins import StandinConfig, StandinServer
+
+
+def params(question):
+    return {
+        'model': 'gpt-3.5-turbo',
+        'messages': [{'role': 'user', 'content': question}],
+        'max_tokens': 10,
+    }
+
+
+def api_calls(server):
+    return next(server.completion_ids) - 1
+
+
+def main():
+    server = StandinServer(StandinConfig(llm_latency=0.05)).start()
+    os.environ.update(server.environment())
+
+    from utils.llm_scheduler import LLMScheduler, INTERACTIVE, BULK
+
+    # Łączenie identycznych zapytań w locie
+    scheduler = LLMScheduler(max_concurrency=8, backoff=0.05)
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: scheduler.create(**params("Ile to jest 2 + 2?")), range(50)))
+        elapsed = time.perf_counter() - start
+    stats = scheduler.stats()
+    print(f"coalescing: 50 wywołań -> {api_calls(server)} zapytań do API, "
+          f"połączonych {stats['coalesced']}, {elapsed:.3f}s")
+    scheduler.close()
+
+    # Priorytety przy limicie 600 RPM (zapytanie co 0.1s)
+    scheduler = LLMScheduler(requests_per_minute=600, max_concurrency=4)
+    scheduler.request_bucket.reserve(scheduler.request_bucket.capacity)  # bez zapasu na start
+    bulk = [scheduler.submit(BULK, **params(f"Ile to jest {i} + 1?")) for i in range(30)]
+    time.sleep(0.3)
+    start = time.perf_counter()
+    interactive = [scheduler.submit(INTERACTIVE, **params(f"Ile to jest {i} * 2?")) for i in range(3)]
+    for future in interactive:
+        future.result()
+    interactive_done = time.perf_counter() - start
+    for future in bulk:
+        future.result()
+    waits = scheduler.stats()['queue_wait']
+    print(f"priorytety: 3 pytania interactive obsłużone po {interactive_done:.2f}s mimo {len(bulk)} zaległych bulk; "
+          f"średnie oczekiwanie interactive {waits['interactive']['mean']:.2f}s, bulk {waits['bulk']['mean']:.2f}s")
+    scheduler.close()
+    server.stop()
+
+    # Ponowienia po 429
+    server = StandinServer(StandinConfig(llm_latency=0.01, llm_error_rate=0.3)).start()
+    os.environ.update(server.environment())
+    scheduler = LLMScheduler(max_concurrency=8, retries=10, backoff=0.05)
+    futures = [scheduler.submit(BULK, **params(f"Ile to jest {i} + 3?")) for i in range(100)]
+    answers = sum(1 for future in futures if future.result().choices[0].message.content)
+    stats = scheduler.stats()
+    print(f"429: {answers}/100 odpowiedzi, ponowień {stats['retries']}, nieudanych {stats['failed']}")
+    scheduler.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
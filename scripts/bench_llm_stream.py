@@ -0,0 +1,61 @@
+"""Czas do odpowiedzi: pełna odpowiedź LLM vs strumień z wczesnym zakończeniem
+
+Zamiennik OpenAI odpowiada "gadatliwie" (liczba + zdanie wyjaśnienia), generując fragment
+co --token-latency sekund. Strumień kończymy, gdy walidator rozpozna kompletną liczbę/słowo.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_llm_stream
+"""
+import argparse
+import os
+import statistics
+import time
+
+from scripts.standins import StandinConfig, StandinServer
+
+QUESTIONS = [
+    ("Rok zdobycia Bastylii?", 'integer'),
+    ("Rok lądowania na Księżycu?", 'integer'),
+    ("What is the capital of Poland?", 'short'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help="czas do pierwszego tokenu [s]")
+    parser.add_argument('--token-latency', type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = StandinServer(StandinConfig(llm_latency=args.latency, llm_token_latency=args.token_latency,
+                                         llm_chatty=True)).start()
+    os.environ.update(server.environment())
+
+    from utils.llm_stream import integer_answer, short_answer, stream_answer
+    from utils.replay import openai_client
+
+    validators = {'integer': integer_answer, 'short': short_answer}
+    client = openai_client(max_retries=0)
+
+    print(f"{'pytanie':>32} {'pełna [ms]':>11} {'TTFT [ms]':>10} {'strumień [ms]':>14} {'odpowiedź':>10}")
+    for question, kind in QUESTIONS:
+        params = {
+            'model': 'gpt-3.5-turbo',
+            'messages': [{'role': 'user', 'content': question}],
+            'temperature': 0,
+            'max_tokens': 30,
+        }
+        full, ttft, streamed = [], [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            client.chat.completions.create(**params)
+            full.append(time.perf_counter() - start)
+            result = stream_answer(client, validators[kind], **params)
+            ttft.append(result.ttft)
+            streamed.append(result.time_to_answer)
+        print(f"{question:>32} {statistics.median(full) * 1000:>11.1f} {statistics.median(ttft) * 1000:>10.1f} "
+              f"{statistics.median(streamed) * 1000:>14.1f} {result.answer:>10}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
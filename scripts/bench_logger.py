@@ -0,0 +1,39 @@
+"""Narzut pojedynczego wywołania loggera w gorącej pętli: synchroniczne handlery vs kolejka
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_logger 2>/dev/null
+
+Konsola loggera pisze na stderr - przekierowanie usuwa koszt terminala z pomiaru.
+"""
+import time
+
+from utils.logger import setup_logger, _stop_listeners
+
+CALLS = 20_000
+
+
+def per_call(func):
+    start = time.perf_counter()
+    for i in range(CALLS):
+        func(i)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main():
+    payload = {"text": "What is the capital of Poland?", "msgID": "123456"}
+    results = []
+    for buffered in (False, True):
+        logger = setup_logger(f'bench_logger_{"buffered" if buffered else "sync"}', buffered=buffered)
+        mode = 'kolejka' if buffered else 'synchronicznie'
+        results.append((mode, 'info f-string', per_call(lambda i: logger.info(f"Wysyłam: {payload} {i}"))))
+        results.append((mode, 'info %-style', per_call(lambda i: logger.info("Wysyłam: %s %d", payload, i))))
+        results.append((mode, 'debug wyłączony', per_call(lambda i: logger.debug("Wysyłam: %s %d", payload, i))))
+    _stop_listeners()
+
+    print(f"{'tryb':>15} {'wywołanie':>18} {'µs/wywołanie':>14}")
+    for mode, call, micros in results:
+        print(f"{mode:>15} {call:>18} {micros:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Router modeli: wszystko do dużego modelu vs stała kaskada vs kaskada adaptacyjna
+
+Backendy to lokalne zamienniki (scripts/standins.FakeBackend) z konfigurowalnym czasem
+i odsetkiem błędów; mały model często nie radzi sobie z trudnymi pytaniami ('text/hard').
+Mieszanka pytań: działania (reguły), pytania z krótką odpowiedzią i długie pytania otwarte.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_model_router --requests 300
+"""
+import argparse
+import random
+import time
+
+from scripts.standins import FakeBackend
+from utils.llm_stream import integer_answer, short_answer, text_answer
+from utils.model_router import ModelRouter, RuleBackend, RouteRequest
+from utils.rule_engine import RuleEngine
+
+HARD_QUESTION = ("Opisz, jakie czynniki wpływały na wybór stolicy państwa w średniowiecznej Europie "
+                 "i dlaczego capital of Poland przez wieki pozostawała w Krakowie, zanim przeniesiono ją do Warszawy.")
+
+
+def workload(count, seed=7):
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            a, b = rng.randint(0, 99), rng.randint(0, 99)
+            requests.append(RouteRequest(f"Ile to jest {a} + {b}?", validator=integer_answer, max_tokens=10))
+        elif kind < 0.7:
+            requests.append(RouteRequest("What is the capital of Poland?", validator=short_answer, max_tokens=10))
+        else:
+            requests.append(RouteRequest(HARD_QUESTION, validator=text_answer, max_tokens=100))
+    return requests
+
+
+def build(strategy, args):
+    small = FakeBackend('small', latency=args.small_latency, error_rate=args.error_rate,
+                        reject_rate={'text/hard': args.hard_reject, 'short/easy': 0.05}, cost=1.0)
+    large = FakeBackend('large', latency=args.large_latency, error_rate=args.error_rate / 5, cost=16.0, seed=43)
+    rules = RuleBackend(RuleEngine([{'name': 'math', 'solver': 'arithmetic'}]))
+    if strategy == 'duży model':
+        router = ModelRouter('bench', [large])
+    elif strategy == 'kaskada stała':
+        router = ModelRouter('bench', [rules, small, large], min_samples=10 ** 9, explore_every=0)
+    else:
+        router = ModelRouter('bench', [rules, small, large])
+    small.classify = large.classify = router.classify
+    return router, {'small': small, 'large': large}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--small-latency', type=float, default=0.02)
+    parser.add_argument('--large-latency', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.05, help="odsetek błędów małego modelu")
+    parser.add_argument('--hard-reject', type=float, default=0.9, help="odrzucone odpowiedzi małego modelu na trudne pytania")
+    args = parser.parse_args()
+
+    requests = workload(args.requests)
+    print(f"{'strategia':>19} {'czas [s]':>9} {'śr. [ms]':>9} {'odpowiedzi':>11} {'koszt':>7} "
+          f"{'wywołania small/large':>22}")
+    for strategy in ('duży model', 'kaskada stała', 'kaskada adaptacyjna'):
+        router, fakes = build(strategy, args)
+        answered = 0
+        start = time.perf_counter()
+        for request in requests:
+            answered += router.route(request).answer is not None
+        elapsed = time.perf_counter() - start
+        cost = sum(fake.calls * fake.cost for fake in fakes.values())
+        calls = f"{fakes['small'].calls}/{fakes['large'].calls}"
+        print(f"{strategy:>19} {elapsed:>9.2f} {elapsed / len(requests) * 1000:>9.1f} "
+              f"{answered:>5}/{len(requests):<5} {cost:>7.0f} {calls:>22}")
+    print()
+    print("Plan adaptacyjny po przebiegu (pominięcia = próby, których router nie wykonał):")
+    for route, stats in router.stats().items():  # ostatni przebieg - kaskada adaptacyjna
+        summary = ", ".join(f"{name}: {entry['accepted']}/{entry['attempts']} pominięte {entry['skipped']}"
+                            for name, entry in stats['backends'].items())
+        print(f"  {route:>12} ({stats['requests']} zapytań, lokalnie {stats['local_fraction']:.0%}) - {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Potok etapów vs szeregowy łańcuch: pobieranie -> walidacja sum -> odpowiadanie LLM
+
+Źródło oddaje paczki rekordów kalibracji z opóźnieniem --fetch-latency (sieć), walidacja
+to prawdziwe validate_event z challenge3 (CPU), a odpowiadanie czeka --llm-latency na paczkę.
+Szeregowo czasy się sumują; w potoku etapy pracują jednocześnie na kolejnych paczkach.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_pipeline --batches 20
+"""
+import argparse
+import os
+import time
+
+from scripts.standins import StandinConfig, calibration_records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--fetch-latency', type=float, default=0.02)
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    parser.add_argument('--answer-workers', type=int, default=2)
+    parser.add_argument('--processes', type=int, default=0, help="walidacja w puli procesów (0 = wątek)")
+    args = parser.parse_args()
+
+    # Importy dopiero po ustawieniu zmiennych środowiskowych (challenge3 tworzy klienta OpenAI)
+    os.environ.setdefault('OPENAI_API_KEY', 'bench')
+    os.environ['LLM_CACHE_PATH'] = ''
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from challenges.challenge3 import validate_event
+    from utils.pipeline import Pipeline, Stage
+
+    records = list(calibration_records(StandinConfig(records=args.batch_size)))
+
+    def source():
+        for _ in range(args.batches):
+            time.sleep(args.fetch_latency)
+            yield ('batch', 'test-data', [dict(record) for record in records])
+
+    def answer(event):
+        time.sleep(args.llm_latency)
+        return event
+
+    start = time.perf_counter()
+    serial = [answer(validate_event(event)) for event in source()]
+    serial_time = time.perf_counter() - start
+
+    validate = Stage('validate', validate_event, workers=args.processes or 1,
+                     kind='process' if args.processes else 'thread', queue_size=2)
+    pipeline = Pipeline('bench', [validate, Stage('answer', answer, workers=args.answer_workers, queue_size=2)])
+    start = time.perf_counter()
+    piped = list(pipeline.run(source()))
+    pipeline_time = time.perf_counter() - start
+    assert [event[2] for event in piped] == [event[2] for event in serial]
+
+    print(f"{'wariant':>10} {'czas [s]':>9} {'paczki/s':>9}")
+    print(f"{'szeregowo':>10} {serial_time:>9.3f} {args.batches / serial_time:>9.1f}")
+    print(f"{'potok':>10} {pipeline_time:>9.3f} {args.batches / pipeline_time:>9.1f}")
+    print()
+    print(f"{'etap':>10} {'elementy':>9} {'el./s':>8} {'śr. [ms]':>9} {'max [ms]':>9} {'bezczynny [s]':>14} "
+          f"{'wstrzymany [s]':>15} {'max kolejka':>12}")
+    for name, stats in pipeline.stats().items():
+        print(f"{name:>10} {stats['items']:>9} {stats['throughput']:>8.1f} {stats['mean_latency'] * 1000:>9.2f} "
+              f"{stats['max_latency'] * 1000:>9.2f} {stats['idle']:>14.3f} {stats['blocked']:>15.3f} "
+              f"{stats['max_queue']:>12}")
+
+
+if __name__ == "__main__":
+    main()
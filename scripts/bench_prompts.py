@@ -0,0 +1,66 @@
+"""Koszt zbudowania promptu na jedno zapytanie: budowa za każdym razem vs rejestr promptów
+
+Mierzy to, co weryfikator robi przy każdym pytaniu: system prompt, lista wiadomości
+z historią, liczba tokenów promptu i klucz cache LLM.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_prompts
+"""
+import hashlib
+import json
+import time
+
+import yaml
+
+from challenges.challenge2 import ROBOISO_PROMPT, ROBOISO_TEMPLATE
+from utils.conversation import estimate_messages_tokens
+from utils.llm_cache import LLMCache
+
+REQUESTS = 20_000
+QUESTIONS = [f"What is the capital of country number {i}?" for i in range(100)]
+HISTORY = [
+    {"role": "user", "content": "What year is it now?"},
+    {"role": "assistant", "content": "1999"},
+]
+# Okno rozmowy utrzymuje liczbę tokenów historii przyrostowo (ConversationWindow.token_count)
+HISTORY_TOKENS = estimate_messages_tokens(HISTORY)
+
+
+def legacy_key(messages):
+    normalized = [[message['role'], ' '.join(str(message['content']).split())] for message in messages]
+    raw = json.dumps(["gpt-3.5-turbo", normalized, 0, 10], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def per_call(question):
+    system_prompt = yaml.dump(ROBOISO_PROMPT, allow_unicode=True)
+    key = legacy_key([{"role": "system", "content": system_prompt}, {"role": "user", "content": question}])
+    messages = [{"role": "system", "content": system_prompt}, *HISTORY, {"role": "user", "content": question}]
+    return key, messages, estimate_messages_tokens(messages)
+
+
+def registry(question):
+    key = LLMCache.make_key("gpt-3.5-turbo", ROBOISO_TEMPLATE.messages(question=question), 0, 10)
+    messages = ROBOISO_TEMPLATE.prefix([*HISTORY, ROBOISO_TEMPLATE.user_message(question=question)])
+    return key, messages, ROBOISO_TEMPLATE.token_count(HISTORY_TOKENS, question=question)
+
+
+def measure(build, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        build(QUESTIONS[i % len(QUESTIONS)])
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    assert per_call(QUESTIONS[0]) == registry(QUESTIONS[0]), "klucze cache i liczby tokenów muszą być zgodne"
+    # yaml.dump jest wolny - budowa per wywołanie mierzona na mniejszej liczbie zapytań
+    legacy = measure(per_call, REQUESTS // 20)
+    cached = measure(registry, REQUESTS)
+    print(f"{'wariant':>26} {'µs / zapytanie':>16}")
+    print(f"{'budowa przy każdym pytaniu':>26} {legacy:>16.1f}")
+    print(f"{'rejestr promptów':>26} {cached:>16.1f}")
+    print(f"przyspieszenie: {legacy / cached:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
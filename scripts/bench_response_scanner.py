@@ -0,0 +1,85 @@
+"""Wyszukiwanie flagi i linku w dużych odpowiedziach: response.text + find vs ResponseScanner
+
+Strona ma kilka MB, flaga i link są na jej końcu. Wariant "dawny" dekoduje treść do str
+(requests wykrywa kodowanie, gdy serwer go nie podał), szuka kilka razy i zapisuje całość
+do pliku. Skaner przechodzi raz po bajtach - z pamięci albo strumieniowo (iter_content).
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_response_scanner
+"""
+import io
+import os
+import tempfile
+import time
+
+import requests
+
+from utils.response_scanner import ResponseScanner
+
+SIZES_MB = [1, 5, 20]
+REPEATS = 3
+
+
+def make_page(size_mb):
+    row = '<div class="row"><p>Lorem ipsum dolor sit amet, zażółć gęślą jaźń</p><a href="/about">o nas</a></div>\n'
+    body = row * (size_mb * 1024 * 1024 // len(row.encode('utf-8')))
+    return f'<html><body>{body}{{{{FLG:FIRMWARE}}}} <a href="/files/0_13_4b.txt">Firmware</a></body></html>'.encode('utf-8')
+
+
+def make_response(body, streamed):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'text/html'
+    if streamed:
+        response.raw = io.BytesIO(body)
+    else:
+        response._content = body
+    return response
+
+
+def legacy(body, path):
+    response = make_response(body, streamed=False)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(response.text)
+    flag = None
+    if "{{FLG:" in response.text:
+        start = response.text.find("{{FLG:") + 6
+        end = response.text.find("}}", start)
+        flag = response.text[start:end]
+    return flag, '/files/0_13_4b.txt' in response.text
+
+
+def scanner_variant(scanner, streamed, save):
+    def run(body, path):
+        result = scanner.scan_response(make_response(body, streamed), save_to=path, save=save)
+        return result.flag, '/files/0_13_4b.txt' in result.links
+    return run
+
+
+def measure(variant, body, path):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        found = variant(body, path)
+        timings.append(time.perf_counter() - start)
+    assert found == ('FIRMWARE', True), found
+    return min(timings) * 1000
+
+
+def main():
+    scanner = ResponseScanner(links=[r'/files/[\w.-]+'])
+    variants = {
+        'text + find + zapis': legacy,
+        'skaner (pamięć)': scanner_variant(scanner, streamed=False, save='never'),
+        'skaner (strumień)': scanner_variant(scanner, streamed=True, save='never'),
+        'skaner (strumień + zapis)': scanner_variant(scanner, streamed=True, save='on_match'),
+    }
+    path = os.path.join(tempfile.mkdtemp(prefix='bench_scanner_'), 'answer.html')
+    print(f"{'rozmiar':>8} " + ' '.join(f"{name:>26}" for name in variants) + "   [ms]")
+    for size_mb in SIZES_MB:
+        body = make_page(size_mb)
+        results = [measure(variant, body, path) for variant in variants.values()]
+        print(f"{size_mb:>6}MB " + ' '.join(f"{value:>26.1f}" for value in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Czas wyszukiwania w SemanticIndex w zależności od rozmiaru indeksu
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_semantic_index
+"""
+import random
+import string
+import time
+
+from utils.semantic_index import SemanticIndex
+
+SIZES = [1_000, 10_000, 100_000]
+LOOKUPS = 200
+
+
+def random_question(rng):
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(4, 9))]
+    return ' '.join(words).capitalize() + '?'
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'rozmiar':>10} {'budowa [s]':>12} {'lookup [ms]':>12}")
+    for size in SIZES:
+        index = SemanticIndex()
+        questions = [random_question(rng) for _ in range(size)]
+        start = time.perf_counter()
+        for i, question in enumerate(questions):
+            index.add(question, str(i))
+        build_time = time.perf_counter() - start
+
+        queries = [rng.choice(questions) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for query in queries:
+            index.lookup(query)
+        lookup_ms = (time.perf_counter() - start) / LOOKUPS * 1000
+        print(f"{size:>10} {build_time:>12.2f} {lookup_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Zimny start CLI: leniwe wykrywanie zadań vs import wszystkich modułów challengeN
+
+Mierzy czas procesu i sumaryczny czas importów z `python -X importtime`.
+Uruchomienie z katalogu głównego repozytorium:
+    python -m scripts.bench_startup
+"""
+import re
+import subprocess
+import sys
+import time
+
+RUNS = 5
+SCENARIOS = {
+    'leniwie (main.get_available_challenges)':
+        "import main; main.get_available_challenges()",
+    'import wszystkich zadań (poprzednio)':
+        "import challenges.challenge1, challenges.challenge2, challenges.challenge3",
+}
+IMPORTTIME_RE = re.compile(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|\s?(\S.*)$')
+
+
+def top_level_import_us(stderr):
+    """Suma czasów skumulowanych importów najwyższego poziomu (bez wcięcia w nazwie modułu)"""
+    total = 0
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match and not match.group(2).startswith(' '):
+            total += int(match.group(1))
+    return total
+
+
+def measure(code):
+    wall, imports = [], []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, check=True
+        )
+        wall.append(time.perf_counter() - start)
+        imports.append(top_level_import_us(result.stderr))
+    return min(wall), min(imports) / 1000
+
+
+def main():
+    print(f"{'scenariusz':>45} {'proces [ms]':>12} {'importy [ms]':>13}")
+    for name, code in SCENARIOS.items():
+        wall, imports = measure(code)
+        print(f"{name:>45} {wall * 1000:>12.1f} {imports:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""Lokalne zamienniki zdalnych usług: strona captcha, /verify, plik kalibracji, /report i OpenAI
+
+Jeden serwer HTTP obsługuje wszystkie ścieżki, więc XYZ_BASE_URL, CENTRALA_BASE_URL
+i OPENAI_BASE_URL mogą wskazywać na ten sam adres. Odpowiedzi są deterministyczne
+(stałe ziarno), a opóźnienie i odsetek błędów fałszywego OpenAI są konfigurowalne.
+Fałszywe OpenAI obsługuje też stream=True (SSE, fragmenty po kilka znaków z opóźnieniem
+llm_token_latency); llm_chatty dopisuje do odpowiedzi wyjaśnienie, jak robią to prawdziwe modele.
+
+Uruchomienie samodzielne (serwer działa do Ctrl+C):
+    python -m scripts.standins --port 8080 --llm-latency 0.2
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from utils.arithmetic import eval_in_text, safe_eval
+from utils.json_stream import iter_json_events
+
+CAPTCHA_QUESTIONS = [
+    ("Rok zdobycia Bastylii?", "1789"),
+    ("Ile to jest 12 + 7?", "19"),
+    ("Rok lądowania na Księżycu?", "1969"),
+]
+VERIFY_QUESTIONS = [
+    ("What is the capital of Poland?", "Kraków"),
+    ("What year is it now?", "1999"),
+    ("What is 12 + 30?", "42"),
+]
+# Odpowiedzi fałszywego LLM na pytania, których nie da się policzyć
+LLM_KNOWLEDGE = {
+    'bastyl': '1789',
+    'księżyc': '1969',
+    'capital of poland': 'Kraków',
+    'stolica polski': 'Kraków',
+    'year': '1999',
+}
+FLAG = "{{FLG:STANDIN}}"
+CHATTY_SUFFIX = " - to odpowiedź na podstawie ogólnej wiedzy, bez dodatkowych założeń."
+
+
+class StandinConfig:
+    def __init__(self, records=1000, question_every=100, rotation=7.0,
+                 llm_latency=0.0, llm_error_rate=0.0, llm_token_latency=0.0, llm_chatty=False, seed=42):
+        self.records = records
+        self.question_every = question_every
+        self.rotation = rotation
+        self.llm_latency = llm_latency
+        self.llm_error_rate = llm_error_rate
+        self.llm_token_latency = llm_token_latency
+        self.llm_chatty = llm_chatty
+        self.seed = seed
+
+
+def fake_llm_answer(text):
+    value = eval_in_text(text)
+    if value is not None:
+        return str(value)
+    lowered = text.lower()
+    for needle, answer in LLM_KNOWLEDGE.items():
+        if needle in lowered:
+            return answer
+    return "42"
+
+
+class FakeBackend:
+    """Lokalny zamiennik backendu routera modeli (utils.model_router) bez sieci
+
+    latency     - czas odpowiedzi [s],
+    error_rate  - odsetek wyjątków (np. 429, timeout),
+    reject_rate - odsetek pustych odpowiedzi, które walidator odrzuci;
+                  słownik klasa zapytania -> odsetek pozwala np. psuć tylko pytania 'text/hard'.
+    Losowanie ma stałe ziarno - przebiegi są powtarzalne.
+    """
+
+    local = False
+
+    def __init__(self, name, latency=0.0, error_rate=0.0, reject_rate=0.0, cost=1.0, seed=42,
+                 answer=fake_llm_answer, classify=None):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate
+        self.cost = cost
+        self.answer = answer
+        self.classify = classify  # funkcja zapytanie -> klasa (np. ModelRouter.classify)
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        reject_rate = self.reject_rate
+        if isinstance(reject_rate, dict):
+            reject_rate = reject_rate.get(self.classify(request) if self.classify else None, 0.0)
+        with self._lock:
+            self.calls += 1
+            error, reject = self._random.random() < self.error_rate, self._random.random() < reject_rate
+        time.sleep(self.latency)
+        if error:
+            raise RuntimeError(f"{self.name}: błąd backendu")
+        if reject:
+            return ""
+        return self.answer(request.question)
+
+
+def calibration_records(config):
+    """Deterministyczny plik kalibracji: co question_every-ty rekord ma pytanie, co 7. zwykły wynik jest błędny"""
+    rng = random.Random(config.seed)
+    for i in range(config.records):
+        a, b = rng.randint(0, 99), rng.randint(0, 99)
+        has_test = bool(config.question_every) and i % config.question_every == 0
+        record = {"question": f"{a} + {b}", "answer": a + b + (1 if i % 7 == 0 and not has_test else 0)}
+        if has_test:
+            record["test"] = {"q": "What is the capital city of Poland?", "a": "???"}
+        yield record
+
+
+def _usage(request, content):
+    prompt_tokens = sum(len(str(message['content'])) // 4 + 1 for message in request['messages'])
+    completion_tokens = len(content) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _pieces(content):
+    """Podział odpowiedzi na "tokeny" po kilka znaków"""
+    return re.findall(r'.{1,3}', content, re.S)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # małe fragmenty SSE mają wychodzić od razu
+    server_version = 'Standin/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _send(self, body, status=200, content_type='text/html; charset=utf-8', headers=None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, payload, status=200, headers=None):
+        self._send(json.dumps(payload, ensure_ascii=False), status, 'application/json', headers)
+
+    def _body_chunks(self):
+        """Treść żądania fragmentami - duże pliki nie trafiają w całości do pamięci"""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                yield self.rfile.read(size)
+                self.rfile.readline()
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining > 0:
+            data = self.rfile.read(min(remaining, 64 * 1024))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+    def _read_body(self):
+        return b''.join(self._body_chunks())
+
+    # --- routing ---
+
+    def do_GET(self):
+        if self.path == '/':
+            return self._captcha_page()
+        if self.path == '/files/0_13_4b.txt':
+            return self._send("Firmware 0.13.4b - dane testowe", content_type='text/plain')
+        if re.fullmatch(r'/data/[^/]+/json\.txt', self.path):
+            return self._calibration_file()
+        self._send("Not found", status=404)
+
+    def do_POST(self):
+        if self.path == '/report':
+            return self._report()
+        body = self._read_body()
+        if self.path == '/':
+            return self._captcha_login(body)
+        if self.path == '/verify':
+            return self._verify(body)
+        if self.path.endswith('/chat/completions'):
+            return self._chat_completion(body)
+        self._send("Not found", status=404)
+
+    # --- captcha ---
+
+    def _current_captcha(self):
+        index = int((time.monotonic() - self.server.started) / self.config.rotation)
+        return CAPTCHA_QUESTIONS[index % len(CAPTCHA_QUESTIONS)]
+
+    def _captcha_page(self):
+        question = self._current_captcha()[0]
+        self._send(
+            '<html><body><form method="post">'
+            f'<p id="human-question">Question:<br />{question}</p>'
+            '<input name="answer" /></form></body></html>'
+        )
+
+    def _captcha_login(self, body):
+        form = parse_qs(body.decode('utf-8'))
+        if form.get('answer', [''])[0] == self._current_captcha()[1]:
+            return self._send(f'<html><body>{FLAG} <a href="/files/0_13_4b.txt">Firmware</a></body></html>')
+        self._send('<html><body>Wrong answer</body></html>')
+
+    # --- verify ---
+
+    def _verify(self, body):
+        message = json.loads(body)
+        with self.server.lock:
+            if message.get('text') == 'READY':
+                msg_id = next(self.server.msg_ids)
+                question = VERIFY_QUESTIONS[msg_id % len(VERIFY_QUESTIONS)]
+                self.server.conversations[msg_id] = question
+                return self._send_json({"msgID": msg_id, "text": question[0]})
+            question = self.server.conversations.pop(int(message.get('msgID', -1)), None)
+        ok = question is not None and message.get('text') == question[1]
+        self._send_json({"msgID": message.get('msgID'), "text": FLAG if ok else "NOT VERIFIED"})
+
+    # --- kalibracja ---
+
+    def _calibration_file(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def chunk(data):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+        chunk(b'{"apikey": "%%PUT-YOUR-API-KEY-HERE%%", "description": "standin", "copyright": "test", "test-data": [')
+        buffer = []
+        for i, record in enumerate(calibration_records(self.config)):
+            buffer.append(('' if i == 0 else ', ') + json.dumps(record))
+            if len(buffer) >= 1000:
+                chunk(''.join(buffer).encode('utf-8'))
+                buffer = []
+        if buffer:
+            chunk(''.join(buffer).encode('utf-8'))
+        chunk(b']}')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _report(self):
+        """Sprawdza poprawiony plik strumieniowo - "answer" jest ostatnim polem payloadu"""
+        chunks = self._body_chunks()
+        head = b''
+        for chunk in chunks:
+            head += chunk
+            if b'"answer":' in head:
+                break
+        answer = head.partition(b'"answer":')[2]
+        records = errors = 0
+        for event in iter_json_events(itertools.chain([answer], chunks)):
+            if event[0] != 'item':
+                continue
+            record = event[2]
+            records += 1
+            if safe_eval(record['question']) != record['answer']:
+                errors += 1
+            if 'test' in record and record['test'].get('a') in (None, '', '???'):
+                errors += 1
+        for _ in chunks:  # zamykający nawias payloadu
+            pass
+        if errors or records != self.config.records:
+            return self._send_json({"code": -1, "message": f"Błędne rekordy: {errors}, liczba: {records}"}, 400)
+        self._send_json({"code": 0, "message": FLAG})
+
+    # --- OpenAI ---
+
+    def _chat_completion(self, body):
+        request = json.loads(body)
+        if self.config.llm_latency:
+            time.sleep(self.config.llm_latency)
+        with self.server.lock:
+            fail = self.server.rng.random() < self.config.llm_error_rate
+        if fail:
+            return self._send_json({"error": {"message": "standin overloaded", "type": "rate_limit"}}, 429,
+                                   headers={'Retry-After': '0'})
+
+        question = request['messages'][-1]['content']
+        if request.get('response_format', {}).get('type') == 'json_object':
+            lines = [line.split('. ', 1)[-1] for line in question.splitlines() if line.strip()]
+            content = json.dumps({"answers": [fake_llm_answer(line) for line in lines]})
+        else:
+            content = fake_llm_answer(question) + (CHATTY_SUFFIX if self.config.llm_chatty else '')
+        if request.get('stream'):
+            return self._stream_completion(request, content)
+        # Bez strumienia odpowiedź przychodzi dopiero po wygenerowaniu wszystkich fragmentów
+        if self.config.llm_token_latency:
+            time.sleep(self.config.llm_token_latency * (len(_pieces(content)) - 1))
+        self._send_json({
+            "id": f"chatcmpl-standin-{next(self.server.completion_ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get('model', 'standin'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(request, content),
+        })
+
+    def _stream_completion(self, request, content):
+        """Odpowiedź jako Server-Sent Events - po kilka znaków, jak tokeny modelu"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        completion_id = f"chatcmpl-standin-{next(self.server.completion_ids)}"
+
+        def event(delta, finish_reason=None, usage=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get('model', 'standin'),
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage:
+                chunk["usage"] = usage
+            data = f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+
+        try:
+            for i, piece in enumerate(_pieces(content)):
+                if i and self.config.llm_token_latency:
+                    time.sleep(self.config.llm_token_latency)
+                event({"role": "assistant", "content": piece} if i == 0 else {"content": piece})
+            event({}, finish_reason="stop")
+            if (request.get('stream_options') or {}).get('include_usage'):
+                # Jak w OpenAI: zużycie tokenów w osobnym, ostatnim fragmencie bez choices
+                event({}, usage=_usage(request, content))
+            done = b"data: [DONE]\n\n"
+            self.wfile.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(done), done))
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient przerwał strumień po otrzymaniu odpowiedzi
+            self.close_connection = True
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.config = config or StandinConfig()
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.rng = random.Random(self.config.seed)
+        self.msg_ids = itertools.count(1000)
+        self.completion_ids = itertools.count(1)
+        self.conversations = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def environment(self):
+        """Zmienne środowiskowe kierujące wszystkie zadania na ten serwer"""
+        return {
+            'XYZ_BASE_URL': self.url,
+            'CENTRALA_BASE_URL': self.url,
+            'OPENAI_BASE_URL': f"{self.url}/v1",
+            'OPENAI_API_KEY': 'standin',
+            'AI_DEVS_API_KEY': 'standin',
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalne zamienniki usług zadań")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--rotation', type=float, default=7.0)
+    parser.add_argument('--llm-latency', type=float, default=0.0)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-token-latency', type=float, default=0.0)
+    parser.add_argument('--llm-chatty', action='store_true')
+    args = parser.parse_args()
+
+    config = StandinConfig(records=args.records, rotation=args.rotation,
+                           llm_latency=args.llm_latency, llm_error_rate=args.llm_error_rate,
+                           llm_token_latency=args.llm_token_latency, llm_chatty=args.llm_chatty)
+    server = StandinServer(config, port=args.port)
+    print(f"Zamienniki usług działają pod {server.url}")
+    for name, value in server.environment().items():
+        print(f"  {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
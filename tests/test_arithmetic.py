@@ -0,0 +1,77 @@
+"""Arytmetyka bez eval: safe_eval i wektorowe sprawdzanie sum z pliku kalibracji"""
+import pytest
+
+from utils.arithmetic import eval_in_text, safe_eval, validate_sums
+
+
+@pytest.mark.parametrize('expression, value', [
+    ("2 + 3 * 4", 14),
+    ("2 * 3 + 4", 10),
+    ("10 - 4 - 3", 3),
+    ("64 / 4 / 2", 8),
+    ("7 / 2", 3.5),
+    ("-3 + 5", 2),
+    ("2 * -3", -6),
+    ("--4", 4),
+    ("-(2 + 3)", -5),
+    ("(2 + 3) * 4", 20),
+    ("((1 + 2) * (3 + 4))", 21),
+    ("1.5 + 1.5", 3),
+    (" 12+7 ", 19),
+])
+def test_safe_eval_follows_precedence_and_parentheses(expression, value):
+    result = safe_eval(expression)
+    assert result == value and type(result) is type(value)
+
+
+@pytest.mark.parametrize('expression', [
+    "1 / 0",
+    "5 / (2 - 2)",
+    "(1 + 2",
+    "1 + 2)",
+    "2 +",
+    "",
+    "x + 1",
+    "__import__('os').system('echo')",
+    "abs(-1)",
+    "2 ** 10",
+    "[1, 2]",
+])
+def test_safe_eval_rejects_invalid_expressions_names_and_calls(expression):
+    assert safe_eval(expression) is None
+
+
+@pytest.mark.parametrize('text, value', [
+    ("Ile to jest 12 + 7?", 19),
+    ("What is (2 + 3) * 4?", 20),
+    ("Wojna trwała w latach 1939-1945", None),
+    ("Data: 1999-12-31", None),
+    ("Bez działań", None),
+])
+def test_eval_in_text(text, value):
+    assert eval_in_text(text) == value
+
+
+def test_validate_sums_reports_only_mismatches():
+    records = [
+        {"question": "1 + 1", "answer": 2},
+        {"question": "2 + 2", "answer": 5},
+        {"question": "3 + 4", "answer": "7"},
+        {"question": "1 + 2 + 3", "answer": 7},
+        {"question": "99999999999999999999 + 1", "answer": 1},
+        {"question": "5 + 5", "answer": 10, "test": {"q": "Stolica Polski?", "a": "???"}},
+        {"question": "Ile to 2 + 2?", "answer": 1},
+    ]
+
+    assert validate_sums(records) == [(1, 4), (2, 7), (3, 6), (4, 100000000000000000000)]
+
+
+def test_validate_sums_compares_numbers_by_value():
+    # Jak porównanie == w Pythonie: 5.0 to poprawny wynik 2 + 3, 5.5 już nie
+    records = [
+        {"question": "2 + 3", "answer": 5.0},
+        {"question": "2 + 3", "answer": 5.5},
+        {"question": "1 + 2 + 3", "answer": 6.0},
+    ]
+
+    assert validate_sums(records) == [(1, 5)]
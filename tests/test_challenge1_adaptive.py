@@ -0,0 +1,100 @@
+"""Tryb adaptacyjny captcha na lokalnej atrapie strony xyz: wykrywanie rotacji pytania i ponowienia sterowane serwerem"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from utils import llm_scheduler
+
+FLAG = '{{FLG:ADAPTIVE}}'
+QUESTIONS = [("Ile to jest 2 + 3?", '5'), ("Ile to jest 7 * 6?", '42'), ("Ile to jest 10 - 4?", '6')]
+# Odpowiedzi serwera na kolejne logowania: 429 z Retry-After, 503 bez niego, potem sprawdzenie odpowiedzi
+LOGIN_STATUSES = [(429, {'Retry-After': '2'}), (503, {})]
+# Po każdym logowaniu pytanie zmienia się dopiero przy trzecim odczycie strony
+GETS_TO_ROTATE = 3
+
+
+class _XyzHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path == '/files/0_13_4b.txt':
+            return self._send("Firmware 0.13.4b")
+        with self.server.lock:
+            state['gets'] += 1
+            state['gets_since_login'] += 1
+            if state['rotate'] and state['gets_since_login'] >= GETS_TO_ROTATE:
+                state['index'] += 1
+                state['rotate'] = False
+            question = QUESTIONS[state['index']][0]
+        self._send(f'<html><body><p id="human-question">Question:<br />{question}</p></body></html>')
+
+    def do_POST(self):
+        state = self.server.state
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        with self.server.lock:
+            state['answers'].append((QUESTIONS[state['index']][0], form['answer'][0]))
+            state['gets_since_login'] = 0
+            state['rotate'] = True
+            attempt = len(state['answers']) - 1
+            correct = form['answer'][0] == QUESTIONS[state['index']][1]
+        if attempt < len(LOGIN_STATUSES):
+            status, headers = LOGIN_STATUSES[attempt]
+            return self._send("Try again later", status=status, headers=headers)
+        if correct:
+            return self._send(f'<html><body>{FLAG} <a href="/files/0_13_4b.txt">Firmware</a></body></html>')
+        self._send('<html><body>Wrong answer</body></html>')
+
+
+@pytest.fixture
+def xyz_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _XyzHandler)
+    server.lock = threading.Lock()
+    server.state = {'index': 0, 'gets': 0, 'gets_since_login': 0, 'rotate': False, 'answers': []}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_adaptive_mode_waits_for_rotation_and_follows_server_backoff(xyz_server, monkeypatch, tmp_path):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('LLM_CACHE_PATH', '')
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(llm_scheduler, '_shared_scheduler', None)
+    from challenges import challenge1
+
+    sleeps = []
+    monkeypatch.setattr(challenge1.time, 'sleep', sleeps.append)
+    try:
+        solver = challenge1.CaptchaSolver(base_url=f"http://127.0.0.1:{xyz_server.server_port}")
+        stats = solver.run_adaptive(max_attempts=10, poll_interval=0.01)
+    finally:
+        llm_scheduler._shared_scheduler.close()
+
+    state = xyz_server.state
+    assert stats['success'] and stats['attempts'] == 3
+    # Każde pytanie dostało dokładnie jedną odpowiedź - po próbie solver czekał na nowe pytanie
+    assert state['answers'] == [(question, answer) for question, answer in QUESTIONS]
+    assert state['gets'] == 1 + 2 * GETS_TO_ROTATE
+    # Opóźnienia tylko z Retry-After (2 s) i wykładniczego backoffu po drugim błędzie z rzędu (2 ** 2 s);
+    # pozostałe to odpytywanie strony w oczekiwaniu na rotację
+    assert [delay for delay in sleeps if delay != 0.01] == [2.0, 4]
+    assert sleeps.count(0.01) == 2 * (GETS_TO_ROTATE - 1)
+    with open(tmp_path / 'data_and_instructions' / 'flaga.txt', encoding='utf-8') as f:
+        assert f.read() in FLAG
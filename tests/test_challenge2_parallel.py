@@ -0,0 +1,31 @@
+"""Równoległe sesje challenge2: flaga zapisywana raz po zakończeniu sesji, wspólny klient HTTP bez zmian"""
+from scripts.standins import FLAG, StandinConfig, StandinServer
+from utils import llm_scheduler
+from utils.http_client import get_shared_client
+
+
+def test_parallel_sessions_save_flag_once_and_keep_shared_client(monkeypatch, tmp_path):
+    server = StandinServer(StandinConfig(llm_latency=0.0)).start()
+    try:
+        for name, value in server.environment().items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setenv('LLM_CACHE_PATH', '')
+        monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+        monkeypatch.chdir(tmp_path)
+        # Wspólny harmonogram LLM tylko na czas testu - jego klient wskazuje na zamiennik tego testu
+        monkeypatch.setattr(llm_scheduler, '_shared_scheduler', None)
+        from challenges import challenge2
+
+        saved = []
+        monkeypatch.setattr(challenge2, 'save_flag', saved.append)
+        pool_sizes = dict(get_shared_client().pool_sizes)
+
+        report = challenge2.run_parallel_sessions(20, concurrency=10)
+
+        assert report['statuses'] == {'flag': 20}
+        assert len(saved) == 1 and saved[0] in FLAG
+        assert get_shared_client().pool_sizes == pool_sizes
+    finally:
+        if llm_scheduler._shared_scheduler is not None:
+            llm_scheduler._shared_scheduler.close()
+        server.stop()
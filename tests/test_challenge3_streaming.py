@@ -0,0 +1,77 @@
+"""Tryb strumieniowy challenge3 na pliku kalibracji rzędu setek MB z lokalnego zamiennika centrali
+
+Zamiennik (scripts.standins) generuje plik w locie i sprawdza wysłany plik strumieniowo, więc
+pamięć procesu testu zależy tylko od klienta. Rozmiar pliku: CHALLENGE3_STREAM_RECORDS rekordów
+(domyślnie 100 tys., ok. 4 MB - kilka sekund). Pełny rozmiar (6 mln, ok. 230 MB; kilka minut
+na jednym rdzeniu) z katalogu głównego repozytorium:
+    CHALLENGE3_STREAM_RECORDS=6000000 python -m pytest -q tests/test_challenge3_streaming.py
+"""
+import json
+import os
+import threading
+import time
+
+from scripts.standins import FLAG, StandinConfig, StandinServer, calibration_records
+
+RECORDS = int(os.getenv('CHALLENGE3_STREAM_RECORDS', 100_000))
+# Dopuszczalny przyrost pamięci: paczki rekordów w potoku i bufory HTTP, niezależnie od rozmiaru pliku
+MAX_RSS_GROWTH = 150 * 1024 * 1024
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def _rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE
+
+
+class _PeakRSS:
+    """Próbkuje pamięć procesu w tle i zapamiętuje maksimum"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = _rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss())
+
+
+def test_streaming_calibration_of_large_file_uses_bounded_memory(monkeypatch):
+    config = StandinConfig(records=RECORDS, question_every=1000)
+    server = StandinServer(config).start()
+    try:
+        for name, value in server.environment().items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setenv('LLM_CACHE_PATH', '')
+        monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+        from challenges.challenge3 import JSONCalibrator
+
+        sample = StandinConfig(records=10_000, question_every=1000)
+        size = sum(len(json.dumps(record)) + 2 for record in calibration_records(sample)) / 10_000 * RECORDS
+        calibrator = JSONCalibrator(streaming=True)
+        baseline = _rss()
+        with _PeakRSS() as memory:
+            start = time.perf_counter()
+            result = calibrator.solve()
+            elapsed = time.perf_counter() - start
+
+        # Zamiennik przyjmuje plik tylko wtedy, gdy wszystkie sumy są poprawne, pytania mają
+        # odpowiedzi, a liczba rekordów się zgadza
+        assert result == {'code': 0, 'message': FLAG}
+        growth = memory.peak - baseline
+        print(f"{RECORDS} rekordów (~{size / 2 ** 20:.0f} MB) w {elapsed:.1f} s, "
+              f"przyrost pamięci {growth / 2 ** 20:.1f} MB")
+        assert growth < MAX_RSS_GROWTH
+    finally:
+        server.stop()
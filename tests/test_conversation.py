@@ -0,0 +1,143 @@
+"""ConversationWindow w długich sesjach (10 tys. tur): przycinanie całych tur, budżet tokenów, streszczenia"""
+import random
+
+from utils.conversation import ConversationWindow, Turn, estimate_messages_tokens
+from utils.prompts import PromptTemplate
+
+TURNS = 10_000
+
+
+def _session(window, turns=TURNS, seed=7, check=None):
+    """Symuluje rozmowę o losowych długościach wiadomości; co 10. pytanie zostaje bez odpowiedzi"""
+    rng = random.Random(seed)
+    for i in range(turns):
+        window.add_user(f"pytanie {i}: " + "x" * rng.randint(0, 400))
+        if check is not None:
+            check(window)
+        if i % 10 != 9:
+            window.add_assistant(f"odpowiedź {i}: " + "y" * rng.randint(0, 400))
+            if check is not None:
+                check(window)
+
+
+def _assert_whole_turns(messages):
+    """Każda odpowiedź asystenta następuje po pytaniu z tej samej tury"""
+    previous = None
+    for message in messages:
+        if message['role'] == 'assistant':
+            assert previous is not None and previous['role'] == 'user'
+            assert message['content'].split(':')[0].split()[1] == previous['content'].split(':')[0].split()[1]
+        previous = message
+
+
+def test_turn_limit_keeps_window_size_independent_of_session_length():
+    def check(window):
+        assert len(window._turns) <= 50
+
+    window = ConversationWindow(max_tokens=10 ** 9, max_turns=50)
+    _session(window, check=check)
+
+    messages = window.messages()
+    assert len(window._turns) == 50
+    assert len(messages) == len(window) <= 100
+    assert messages[0]['role'] == 'user' and messages[0]['content'].startswith(f"pytanie {TURNS - 50}:")
+    _assert_whole_turns(messages)
+    assert window.evicted_turns == TURNS - 50
+    assert window.total_messages == TURNS + TURNS - TURNS // 10
+
+
+def test_token_cap_holds_after_every_message_and_counts_match_prompt():
+    def check(window):
+        assert window.token_count <= window.max_tokens or len(window._turns) == 1
+        # Liczniki przyrostowe zgadzają się z przeliczeniem całego promptu
+        assert window.token_count == estimate_messages_tokens(window.messages())
+
+    window = ConversationWindow(max_tokens=600, max_turns=10 ** 9)
+    _session(window, check=check)
+
+    _assert_whole_turns(window.messages())
+    assert window.max_prompt_tokens <= 600
+
+
+def test_last_turn_is_kept_even_above_token_cap():
+    window = ConversationWindow(max_tokens=50, max_turns=10)
+    window.add_user("krótkie pytanie")
+    window.add_user("z" * 1000)
+    window.add_assistant("a" * 1000)
+
+    assert [message['role'] for message in window.messages()] == ['user', 'assistant']
+    assert window.evicted_turns == 1
+
+
+def test_assistant_overwrite_keeps_token_count():
+    window = ConversationWindow(max_tokens=10 ** 6)
+    window.add_user("pytanie")
+    window.add_assistant("a" * 400)
+    window.add_assistant("b")
+
+    assert window.token_count == estimate_messages_tokens(window.messages())
+    assert window.total_messages == 2
+
+
+def test_summarizer_gets_every_evicted_turn_once_and_in_order():
+    calls = []
+
+    def summarizer(evicted, summary):
+        assert all(isinstance(turn, Turn) for turn in evicted)
+        calls.append([int(turn.user.split(':')[0].split()[1]) for turn in evicted])
+        # Streszczenie ograniczonej długości - okno nie może przez nie rosnąć
+        return f"{sum(len(batch) for batch in calls)} wcześniejszych tur"
+
+    def check(window):
+        assert window.token_count <= window.max_tokens or len(window._turns) == 1
+
+    window = ConversationWindow(max_tokens=800, max_turns=20, summarizer=summarizer)
+    _session(window, check=check)
+
+    evicted = [number for batch in calls for number in batch]
+    assert evicted == list(range(len(evicted)))
+    assert len(evicted) == window.evicted_turns
+    assert len(calls) <= window.evicted_turns
+    messages = window.messages()
+    assert messages[0] == {"role": "system",
+                           "content": f"Earlier conversation summary: {window.evicted_turns} wcześniejszych tur"}
+    assert messages[1]['content'].startswith(f"pytanie {window.evicted_turns}:")
+    _assert_whole_turns(messages[1:])
+
+
+def test_summary_tokens_count_towards_token_cap():
+    def summarizer(evicted, summary):
+        # Pierwsze streszczenie (ok. 200 tokenów) jest dłuższe niż zwolnione miejsce
+        return "s" * 800
+
+    window = ConversationWindow(max_tokens=300, max_turns=10 ** 9, summarizer=summarizer)
+    for i in range(200):
+        window.add_user(f"pytanie {i}: " + "x" * 100)
+        window.add_assistant(f"odpowiedź {i}: " + "y" * 100)
+        assert window.token_count <= window.max_tokens or len(window._turns) == 1
+
+
+def test_token_counts_memoized_in_template_match_full_prompt():
+    template = PromptTemplate('test', system={'rules': ["Odpowiadaj krótko.", "Zawsze po angielsku."]})
+    window = ConversationWindow(max_tokens=300, max_turns=10 ** 9, prefix_tokens=template.system_tokens)
+    for i in range(200):
+        question = f"pytanie {i}: " + "x" * (i % 40) * 10
+        window.add_user(question, tokens=template.user_tokens(question=question))
+        window.add_assistant(f"odpowiedź {i}", tokens=template.user_tokens(question=f"odpowiedź {i}"))
+        # Pełny prompt (system + historia) bez liczenia treści od nowa
+        assert template.system_tokens + window.token_count == estimate_messages_tokens(
+            template.prefix(window.messages()))
+        assert window.token_count <= window.max_tokens or len(window._turns) == 1
+
+    assert template.system_tokens < window.max_prompt_tokens <= template.system_tokens + window.max_tokens
+    assert template.token_count(question="pytanie 0: ") == estimate_messages_tokens(
+        template.messages(question="pytanie 0: "))
+
+
+def test_assistant_overwrite_with_given_tokens_keeps_token_count():
+    window = ConversationWindow(max_tokens=10 ** 6)
+    window.add_user("pytanie", tokens=2)
+    window.add_assistant("a" * 400, tokens=101)
+    window.add_assistant("b", tokens=1)
+
+    assert window.token_count == estimate_messages_tokens(window.messages())
@@ -0,0 +1,90 @@
+"""HTTPClient: ponawianie tylko tam, gdzie powtórzone zapytanie nie zmieni stanu serwera"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.http_client import HTTPClient
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """Przetwarza zapytanie (liczy je), ale odpowiada dopiero po czasie dłuższym niż timeout klienta"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        with self.server.lock:
+            self.server.requests.append(self.command)
+        time.sleep(self.server.delay)
+        try:
+            self.send_response(self.server.status)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    do_GET = do_POST = _handle
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.delay = 0.0
+    server.status = 200
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/verify"
+
+
+def _client():
+    return HTTPClient(timeout=(1, 0.2), retries=2, backoff=0.001)
+
+
+def test_post_is_not_resent_after_read_timeout(server):
+    server.delay = 0.5
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        _client().post(_url(server), json={"text": "READY", "msgID": 0})
+    time.sleep(0.1)
+    assert server.requests == ['POST']
+
+
+def test_get_is_retried_after_read_timeout(server):
+    server.delay = 0.5
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        _client().get(_url(server))
+    time.sleep(0.6)
+    assert server.requests == ['GET'] * 3
+
+
+def test_post_is_not_retried_on_server_error_unless_caller_opts_in(server):
+    server.status = 503
+    assert _client().post(_url(server), json={}).status_code == 503
+    assert server.requests == ['POST']
+
+    assert _client().post(_url(server), json={}, retry=True).status_code == 503
+    assert server.requests == ['POST'] * 4
+
+
+def test_post_is_retried_when_connection_was_refused():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    client = _client()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post(f"http://127.0.0.1:{port}/verify", json={})
+    assert client.metrics.summary()[f"127.0.0.1:{port}"]['retries'] == 2
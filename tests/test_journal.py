@@ -0,0 +1,60 @@
+"""Dziennik rozmów: wpis przeżywa awarię procesu, a odpowiedzi z poprzednich uruchomień rozgrzewają cache"""
+import json
+import time
+
+import pytest
+
+from utils.journal import Journal
+
+
+def test_each_entry_reaches_the_file_before_close(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = Journal(str(path))
+    journal.append('session_start', session='s1')
+    journal.append('turn', session='s1', question="What year is it now?", answer="1999", source='small')
+
+    # Odczyt innym uchwytem - tak zobaczy plik proces uruchomiony po awarii (bez close)
+    assert [entry['kind'] for entry in Journal.replay(str(path))] == ['session_start', 'turn']
+    journal.close()
+
+
+def test_fsync_runs_on_first_append_after_interval(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr('utils.journal.os.fsync', synced.append)
+    journal = Journal(str(tmp_path / 'journal.jsonl'), fsync_interval=0.05)
+    journal.append('turn', msg_id=1)
+    assert synced == []
+
+    time.sleep(0.06)
+    journal.append('turn', msg_id=2)
+    journal.append('turn', msg_id=3)
+    assert len(synced) == 1
+    journal.close()
+
+
+@pytest.fixture
+def challenge2(monkeypatch):
+    monkeypatch.setenv('LLM_CACHE_PATH', '')
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+    from challenges import challenge2
+    return challenge2
+
+
+def test_journal_older_than_cache_timeout_still_warms_the_index(tmp_path, challenge2):
+    path = tmp_path / 'conversation_journal.jsonl'
+    written = time.time() - 10 * challenge2.CACHE_TIMEOUT
+    entry = {'t': written, 'kind': 'turn', 'session': 'old', 'msg_id': 7,
+             'question': "What is the tallest mountain on Earth?", 'answer': "Everest", 'source': 'large'}
+    path.write_text(json.dumps(entry) + '\n', encoding='utf-8')
+
+    assert challenge2.warm_from_journal(str(path)) == 1
+    assert challenge2.cached_answer("what is the tallest mountain on earth") == "Everest"
+
+
+def test_live_answers_expire_after_cache_timeout(challenge2, monkeypatch):
+    challenge2.remember_answer("Who painted the Mona Lisa?", "Leonardo")
+    assert challenge2.cached_answer("who painted the Mona Lisa") == "Leonardo"
+
+    later = time.time() + challenge2.CACHE_TIMEOUT + 1
+    monkeypatch.setattr('time.time', lambda: later)
+    assert challenge2.cached_answer("who painted the Mona Lisa") is None
@@ -0,0 +1,151 @@
+"""Harmonogram LLM z klientem-atrapą: kubełek tokenów, łączenie zapytań, priorytety i wstrzymanie po 429"""
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from utils.llm_scheduler import BULK, INTERACTIVE, LLMScheduler
+from utils.rate_limiter import TokenBucket
+
+
+def _params(content, max_tokens=10):
+    return {'model': 'fake', 'messages': [{"role": "user", "content": content}], 'max_tokens': max_tokens}
+
+
+def _rate_limit_error(retry_after=None):
+    headers = {} if retry_after is None else {'retry-after': str(retry_after)}
+    response = SimpleNamespace(status_code=429, headers=headers, request=None)
+    return openai.RateLimitError("Rate limit exceeded", response=response, body=None)
+
+
+class FakeClient:
+    """Klient w kształcie openai.OpenAI: zapisuje kolejność pytań, może wstrzymać odpowiedź lub rzucić błędy"""
+
+    def __init__(self, errors=()):
+        self.calls = []
+        self.errors = list(errors)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        content = params['messages'][-1]['content']
+        self.calls.append((time.monotonic(), content))
+        self.started.set()
+        self.release.wait(5)
+        if self.errors:
+            raise self.errors.pop(0)
+        message = SimpleNamespace(content=f"odpowiedź: {content}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+
+@pytest.fixture
+def scheduler_for():
+    schedulers = []
+
+    def make(client, **options):
+        schedulers.append(LLMScheduler(client, **options))
+        return schedulers[-1]
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_continuously_up_to_capacity(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr('utils.rate_limiter.time.monotonic', clock)
+    bucket = TokenBucket(per_minute=60)
+
+    # Pełny kubełek pozwala na zryw do pojemności, potem trzeba czekać 1 s na token
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+    clock.now += 10
+    assert bucket.reserve(9) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+    # Długa przerwa nie odkłada budżetu ponad pojemność
+    clock.now += 3600
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_token_bucket_without_limit_never_waits():
+    bucket = TokenBucket(per_minute=None)
+    assert all(bucket.reserve(10_000) == 0.0 for _ in range(100))
+
+
+def test_identical_requests_in_flight_share_one_call(scheduler_for):
+    client = FakeClient()
+    client.release.clear()
+    scheduler = scheduler_for(client)
+
+    futures = [scheduler.submit(BULK, **_params("Jaka jest stolica Polski?")) for _ in range(5)]
+    assert client.started.wait(5)
+    client.release.set()
+
+    assert len({id(future) for future in futures}) == 1
+    assert futures[0].result(5).choices[0].message.content == "odpowiedź: Jaka jest stolica Polski?"
+    assert len(client.calls) == 1
+    assert scheduler.stats()['coalesced'] == 4
+
+    # Po zakończeniu zapytanie nie jest już w locie - kolejne trafia do API
+    scheduler.create(BULK, timeout=5, **_params("Jaka jest stolica Polski?"))
+    assert len(client.calls) == 2
+
+
+def test_interactive_requests_overtake_queued_bulk(scheduler_for):
+    client = FakeClient()
+    client.release.clear()
+    scheduler = scheduler_for(client, max_concurrency=1)
+
+    first = scheduler.submit(BULK, **_params("paczka 0"))
+    assert client.started.wait(5)
+    # Jedyny slot jest zajęty - reszta czeka w kolejce
+    queued = [scheduler.submit(BULK, **_params(f"paczka {i}")) for i in range(1, 4)]
+    queued.append(scheduler.submit(INTERACTIVE, **_params("rozmowa")))
+    client.release.set()
+
+    for future in [first, *queued]:
+        future.result(5)
+    assert [content for _, content in client.calls] == ["paczka 0", "rozmowa", "paczka 1", "paczka 2", "paczka 3"]
+
+
+def test_rate_limit_pauses_for_retry_after_and_retries(scheduler_for):
+    client = FakeClient(errors=[_rate_limit_error(retry_after=0.3)])
+    scheduler = scheduler_for(client)
+
+    response = scheduler.create(BULK, timeout=5, **_params("pytanie"))
+
+    assert response.choices[0].message.content == "odpowiedź: pytanie"
+    (first, _), (second, _) = client.calls
+    assert second - first >= 0.3
+    assert scheduler.stats()['retries'] == 1
+
+
+def test_rate_limit_backoff_grows_and_gives_up_after_retries(scheduler_for):
+    client = FakeClient(errors=[_rate_limit_error() for _ in range(3)])
+    scheduler = scheduler_for(client, retries=2, backoff=0.1)
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler.create(BULK, timeout=5, **_params("pytanie"))
+
+    # Backoff 0.1 s, potem 0.2 s, każdy z losowym rozrzutem 50-100%
+    times = [moment for moment, _ in client.calls]
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.05
+    assert times[2] - times[1] >= 0.1
+    stats = scheduler.stats()
+    assert stats['retries'] == 2 and stats['failed'] == 1
@@ -0,0 +1,101 @@
+"""Strumieniowanie odpowiedzi LLM: walidatory kształtu i odrzucanie odpowiedzi uciętych na max_tokens"""
+from types import SimpleNamespace
+
+import pytest
+
+from utils.llm_cache import LLMCache
+from utils.llm_stream import integer_answer, short_answer, stream_answer, text_answer
+
+
+class FakeClient:
+    """Klient w kształcie openai.OpenAI: odpowiada zadanym tekstem, kończąc go podanym finish_reason"""
+
+    def __init__(self, content, finish_reason='stop'):
+        self.content = content
+        self.finish_reason = finish_reason
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, stream=False, **params):
+        self.calls += 1
+        if not stream:
+            message = SimpleNamespace(content=self.content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=self.finish_reason)])
+        pieces = [self.content[i:i + 3] for i in range(0, len(self.content), 3)]
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece), finish_reason=None)])
+                  for piece in pieces]
+        chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None),
+                                                               finish_reason=self.finish_reason)]))
+        return iter(chunks)
+
+
+PARAMS = {'model': 'fake', 'messages': [{"role": "user", "content": "Opisz Kraków"}], 'temperature': 0, 'max_tokens': 5}
+
+
+def test_answer_cut_at_max_tokens_is_rejected():
+    result = stream_answer(FakeClient("Kraków to miasto, które", finish_reason='length'), text_answer, **PARAMS)
+
+    assert result.answer is None
+    assert result.finish_reason == 'length'
+    assert result.text == "Kraków to miasto, które"
+
+
+def test_complete_answer_is_accepted():
+    result = stream_answer(FakeClient("Kraków to dawna stolica Polski."), text_answer, **PARAMS)
+
+    assert result.answer == "Kraków to dawna stolica Polski."
+    assert result.finish_reason == 'stop'
+
+
+@pytest.mark.parametrize('validator', [None, text_answer])
+def test_truncated_answer_is_not_cached(validator):
+    cache = LLMCache(path='')
+    client = FakeClient("Kraków to miasto, które", finish_reason='length')
+
+    assert cache.complete(client, validator=validator, **PARAMS) is None
+    assert cache.complete(client, validator=validator, **PARAMS) is None
+    assert client.calls == 2
+
+
+@pytest.mark.parametrize('text, answer', [
+    ("Kraków", "Kraków"),
+    ("Kraków.", "Kraków"),
+    ("New York", "New York"),
+    ("Blue whale", "Blue whale"),
+    ("Warszawa, Polska", "Warszawa, Polska"),
+    ("  1999\n", "1999"),
+    ("Kraków\nTo dawna stolica Polski.", None),
+    ("The capital of Poland was Kraków for many centuries", None),
+    ("???", None),
+])
+def test_short_answer_when_finished(text, answer):
+    assert short_answer(text, finished=True) == answer
+
+
+@pytest.mark.parametrize('text, answer', [
+    ("Kraków - to dawna stolica", "Kraków"),
+    ("New York. It is", "New York"),
+    ("Warszawa, Polska\n", "Warszawa, Polska"),
+    ("Warszawa, Pol", None),
+    ("New", None),
+])
+def test_short_answer_while_streaming_waits_for_unambiguous_end(text, answer):
+    assert short_answer(text) == answer
+
+
+@pytest.mark.parametrize('text, answer', [
+    ("42", "42"),
+    ("42.", "42"),
+    ("2.5", None),
+    ("1,000", None),
+    ("3/4", None),
+])
+def test_integer_answer_when_finished(text, answer):
+    assert integer_answer(text, finished=True) == answer
+
+
+def test_streamed_multi_word_answer_stops_at_explanation():
+    result = stream_answer(FakeClient("New York - the largest city in the USA"), short_answer, **PARAMS)
+
+    assert result.answer == "New York"
+    assert result.early_stop
@@ -0,0 +1,58 @@
+"""Metryki: eksport Prometheusa z # TYPE dla każdej rodziny i czysty rejestr dla każdego zadania z menu"""
+import sys
+from types import ModuleType
+
+import main
+from utils.metrics import Metrics, get_metrics
+
+
+def test_prometheus_export_declares_every_family_once():
+    metrics = Metrics()
+    metrics.observe('llm_api_call', 0.1, model='small')
+    metrics.observe('llm_api_call', 0.3, model='large')
+    with metrics.span('parse'):
+        pass
+    metrics.count('llm_cache_hits', tier='memory')
+    metrics.count('llm_cache_hits', tier='disk')
+    metrics.count('llm_retries')
+    metrics.gauge('llm_queue_depth', 3)
+
+    lines = metrics.to_prometheus().splitlines()
+    types = [line for line in lines if line.startswith('# TYPE')]
+    assert types == [
+        '# TYPE llm_api_call_seconds histogram',
+        '# TYPE parse_seconds histogram',
+        '# TYPE llm_cache_hits_total counter',
+        '# TYPE llm_retries_total counter',
+        '# TYPE llm_queue_depth gauge',
+    ]
+    # Każda seria stoi po deklaracji swojej rodziny
+    declared = set()
+    for line in lines:
+        if line.startswith('# TYPE'):
+            declared.add(line.split()[2])
+        else:
+            name = line.split('{')[0].split()[0]
+            assert any(name == family or name.startswith(family + '_') for family in declared), line
+
+
+def test_each_challenge_run_from_menu_starts_with_empty_metrics(monkeypatch):
+    seen = []
+
+    def make_challenge(name):
+        module = ModuleType(name)
+
+        def solve_challenge():
+            seen.append(get_metrics().to_dict()['counters'])
+            get_metrics().count('requests', challenge=name)
+
+        module.solve_challenge = solve_challenge
+        monkeypatch.setitem(sys.modules, name, module)
+        return {'module_name': name, 'description': name}
+
+    challenges = {'1': make_challenge('fake_challenge1'), '2': make_challenge('fake_challenge2')}
+    get_metrics().count('requests', challenge='earlier')
+
+    assert main.run_challenge(challenges, '1') and main.run_challenge(challenges, '2')
+    assert seen == [{}, {}]
+    assert get_metrics().to_dict()['counters'] == {'requests{challenge=fake_challenge2}': 1}
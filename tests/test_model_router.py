@@ -0,0 +1,118 @@
+"""Router modeli z lokalnymi atrapami backendów: reguły bez LLM, eskalacja do dużego modelu, trafienia w cache"""
+from types import SimpleNamespace
+
+import pytest
+
+from utils.llm_cache import LLMCache
+from utils.llm_stream import integer_answer, short_answer
+from utils.model_router import FunctionBackend, LLMBackend, ModelRouter, RuleBackend
+from utils.rule_engine import RuleEngine
+
+RULES = [
+    {'name': 'capital', 'patterns': [r'capital of Poland'], 'answer': 'Kraków'},
+    {'name': 'math', 'solver': 'arithmetic'},
+]
+
+
+class FakeClient:
+    """Klient w kształcie openai.OpenAI: każdy model odpowiada swoim tekstem, wywołania są zapisywane"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, stream=False, **params):
+        self.calls.append(model)
+        content = self.answers[model]
+        if not stream:
+            message = SimpleNamespace(content=content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')])
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + 4]),
+                                                           finish_reason=None)])
+                  for i in range(0, len(content), 4)]
+        chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None),
+                                                               finish_reason='stop')]))
+        return iter(chunks)
+
+
+def _router(client, local=()):
+    backends = [RuleBackend(RuleEngine(RULES))]
+    backends += [FunctionBackend(name, func) for name, func in local]
+    backends.append(LLMBackend('small', 'small-model', cost=1.0, client=client))
+    backends.append(LLMBackend('large', 'large-model', cost=16.0, client=client))
+    # explore_every=0 - plan bez okresowego odpytywania wszystkich backendów
+    return ModelRouter('test', backends, explore_every=0)
+
+
+def _messages(question):
+    return [{"role": "user", "content": question}]
+
+
+@pytest.mark.parametrize('question, answer', [
+    ("What is the capital of Poland?", 'Kraków'),
+    ("Ile to jest 12 + 30 * 2?", '72'),
+])
+def test_rule_hit_makes_no_llm_call(question, answer):
+    client = FakeClient({'small-model': '1', 'large-model': '2'})
+    router = _router(client)
+
+    result = router.answer(question, _messages(question), validator=short_answer)
+
+    assert (result.answer, result.backend) == (answer, 'rules')
+    assert client.calls == []
+
+
+def test_rejected_small_model_answer_escalates_to_large():
+    client = FakeClient({
+        'small-model': "The capital of France has been Paris for many centuries now",
+        'large-model': "Paris",
+    })
+    router = _router(client)
+    question = "What is the capital of France?"
+
+    result = router.answer(question, _messages(question), validator=short_answer)
+
+    assert (result.answer, result.backend) == ('Paris', 'large')
+    assert result.attempts == [('rules', 'rejected'), ('small', 'rejected'), ('large', 'accepted')]
+    assert client.calls == ['small-model', 'large-model']
+    backends = router.stats()['short/easy']['backends']
+    assert backends['small']['rejected'] == 1 and backends['large']['accepted'] == 1
+
+
+def test_small_model_error_escalates_to_large():
+    client = FakeClient({'large-model': '1945'})
+    router = _router(client)
+    question = "In which year did the Second World War end?"
+
+    result = router.answer(question, _messages(question), validator=integer_answer)
+
+    assert (result.answer, result.backend) == ('1945', 'large')
+    assert 'small' in result.errors
+    assert result.attempts[1] == ('small', 'error')
+
+
+def test_local_cache_hit_short_circuits_models():
+    client = FakeClient({'small-model': 'Paris', 'large-model': 'Paris'})
+    answers = {"What is the capital of France?": 'Paris'}
+    router = _router(client, local=[('cache', answers.get)])
+
+    result = router.answer("What is the capital of France?", _messages("What is the capital of France?"),
+                           validator=short_answer)
+
+    assert (result.answer, result.backend) == ('Paris', 'cache')
+    assert client.calls == []
+
+
+def test_llm_cache_answers_repeated_question_without_api_call():
+    client = FakeClient({'small-model': 'Paris', 'large-model': 'Paris'})
+    router = _router(client)
+    cache = LLMCache(path='')
+    question = "What is the capital of France?"
+
+    first = router.answer(question, _messages(question), validator=short_answer, cache=cache)
+    second = router.answer(question, _messages(question), validator=short_answer, cache=cache)
+
+    assert first.answer == second.answer == 'Paris'
+    assert second.backend == 'small'
+    assert client.calls == ['small-model']
@@ -0,0 +1,58 @@
+"""SemanticIndex: pytania o inną encję z tego samego szablonu nie mogą dostać cudzej odpowiedzi"""
+import time
+
+import pytest
+
+from utils.semantic_index import SemanticIndex
+
+SEED = [
+    ('What is 2+2?', '4'),
+    ('What is the capital of Poland?', 'Kraków'),
+    ('Quelle est la capitale de la Pologne?', 'Kraków'),
+    ('Jaka jest stolica Polski?', 'Kraków'),
+    ('What color is the sky?', 'Blue'),
+]
+
+
+@pytest.fixture
+def index():
+    index = SemanticIndex()
+    for question, answer in SEED:
+        index.add(question, answer)
+    return index
+
+
+@pytest.mark.parametrize('question', [
+    "What is the capital of Holland?",
+    "What is the capital of Portugal?",
+    "What color is the sun?",
+    "What color is the grass?",
+    "What is 2-2?",
+    "What is 2*2?",
+    "What is 3+3?",
+    "What's the capital city of Poland?",
+])
+def test_near_miss_questions_are_not_answered(index, question):
+    assert index.lookup(question) is None
+
+
+@pytest.mark.parametrize('question, answer', [
+    ("WHAT IS THE CAPITAL OF POLAND", 'Kraków'),
+    ("what's the capital of Poland", 'Kraków'),
+    ("Which is the capital of Poland?", 'Kraków'),
+    ("What is the capitol of Poland?", 'Kraków'),
+    ("Jaka jest stolica Polski", 'Kraków'),
+    ("What color is the sky", 'Blue'),
+    ("What is 2 + 2", '4'),
+])
+def test_rewordings_of_the_same_question_are_answered(index, question, answer):
+    match = index.lookup(question)
+    assert match is not None and match[2] == answer
+
+
+def test_expired_answers_are_skipped(index):
+    index.add("What year is it now?", "1999", expires=time.time() - 1)
+    index.add("Rok zdobycia Bastylii?", "1789", expires=time.time() + 60)
+
+    assert index.lookup("What year is it now") is None
+    assert index.lookup("Rok zdobycia Bastylii")[2] == "1789"
@@ -0,0 +1,157 @@
+import operator
+import re
+
+import numpy as np
+
+# Wyrażenie arytmetyczne osadzone w tekście, np. "Ile to jest 12 + 7?"
+_EMBEDDED_RE = re.compile(r'[\d(][\d\s.+\-*/()]*[+\-*/][\d\s.+\-*/()]*[\d)]')
+# Daty (1999-12-31) i zakresy lat (1939-1945) wyglądają jak odejmowanie, ale nim nie są;
+# krótsze liczby ("12-5", "2-2-2") to zwykłe odejmowanie
+_DATE_RE = re.compile(r'\d{4}-\d{4}|\d{4}-\d{2}-\d{2}')
+_TOKEN_RE = re.compile(r'\s*(?:(\d+\.\d*|\.\d+|\d+)|(.))')
+_OPERATORS = {
+    '+': (1, operator.add),
+    '-': (1, operator.sub),
+    '*': (2, operator.mul),
+    '/': (2, operator.truediv),
+}
+# Liczby dłuższe niż 18 cyfr nie zmieszczą się w int64 - liczymy je w Pythonie
+_MAX_INT64_DIGITS = 18
+
+
+def _tokenize(expression):
+    for number, symbol in _TOKEN_RE.findall(expression):
+        if number:
+            yield float(number) if '.' in number else int(number)
+        elif symbol.strip():
+            yield symbol
+
+
+class _Parser:
+    """Parser zejść rekurencyjnych dla + - * / i nawiasów - bez eval i bez budowania drzewa"""
+
+    def __init__(self, expression):
+        self.tokens = list(_tokenize(expression))
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        value = self._expression(1)
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Nieoczekiwany token: {self._peek()}")
+        return value
+
+    def _expression(self, min_precedence):
+        value = self._unary()
+        while True:
+            token = self._peek()
+            if not isinstance(token, str) or token not in _OPERATORS:
+                return value
+            precedence, func = _OPERATORS[token]
+            if precedence < min_precedence:
+                return value
+            self._next()
+            value = func(value, self._expression(precedence + 1))
+
+    def _unary(self):
+        token = self._next()
+        if token == '-':
+            return -self._unary()
+        if token == '+':
+            return self._unary()
+        if token == '(':
+            value = self._expression(1)
+            if self._next() != ')':
+                raise ValueError("Brak nawiasu zamykającego")
+            return value
+        if isinstance(token, (int, float)):
+            return token
+        raise ValueError(f"Nieoczekiwany token: {token}")
+
+
+def safe_eval(expression):
+    """Bezpiecznie oblicza wyrażenie arytmetyczne (+ - * / i nawiasy), zwraca None gdy jest niepoprawne"""
+    try:
+        value = _Parser(expression).parse()
+    except (ValueError, ZeroDivisionError, RecursionError):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def eval_in_text(text):
+    """Znajduje w tekście wyrażenie arytmetyczne i je oblicza - None, gdy go nie ma"""
+    match = _EMBEDDED_RE.search(text)
+    if not match or _DATE_RE.fullmatch(match.group().strip()):
+        return None
+    return safe_eval(match.group())
+
+
+def _as_int64(answer):
+    """Odpowiedź jako int, jeśli jest liczbą całkowitą mieszczącą się w int64 (także 5.0), w przeciwnym razie None"""
+    if isinstance(answer, float) and answer.is_integer():
+        answer = int(answer)
+    if isinstance(answer, int) and abs(answer) < 2 ** 63:
+        return int(answer)
+    return None
+
+
+def validate_sums(records):
+    """Sprawdza wektorowo rekordy postaci {"question": "a + b", "answer": n}
+
+    Zwraca listę par (indeks rekordu, poprawny wynik) tylko dla rekordów z błędnym wynikiem.
+    Sumy dwóch liczb liczone są wektorowo w NumPy, pozostałe sumy liczb naturalnych przez safe_eval.
+    Rekordy z polem test lub bez sumy w pytaniu są pomijane.
+    """
+    indices = []
+    questions = []
+    answers = []
+    for index, record in enumerate(records):
+        if isinstance(record, dict) and 'test' not in record:
+            question = record.get('question')
+            if isinstance(question, str) and 'answer' in record:
+                indices.append(index)
+                questions.append(question)
+                answers.append(record['answer'])
+
+    if not indices:
+        return []
+
+    left, _, right = np.char.partition(np.array(questions, dtype=str), '+').T
+    left = np.char.strip(left)
+    right = np.char.strip(right)
+    valid = (
+        np.char.isdigit(left) & np.char.isdigit(right)
+        & (np.char.str_len(left) <= _MAX_INT64_DIGITS)
+        & (np.char.str_len(right) <= _MAX_INT64_DIGITS)
+    )
+    mismatches = []
+    # Sumy wielu składników lub bardzo dużych liczb liczymy klasycznie
+    for i in np.flatnonzero(~valid):
+        question = questions[i]
+        if '+' in question and question.replace('+', '').replace(' ', '').isdigit():
+            correct = safe_eval(question)
+            if correct is not None and answers[i] != correct:
+                mismatches.append((indices[i], correct))
+    if not valid.any():
+        return mismatches
+
+    sums = np.zeros(len(indices), dtype=np.int64)
+    sums[valid] = left[valid].astype(np.int64) + right[valid].astype(np.int64)
+
+    # Porównanie liczbowe jak w Pythonie (5.0 == 5); odpowiedzi nieliczbowe (np. tekst) są zawsze błędne
+    given = [_as_int64(answer) for answer in answers]
+    is_int = np.fromiter((value is not None for value in given), dtype=bool, count=len(answers))
+    given = np.fromiter((value or 0 for value in given), dtype=np.int64, count=len(answers))
+    mismatched = np.flatnonzero(valid & ~(is_int & (given == sums)))
+    mismatches.extend((indices[i], int(sums[i])) for i in mismatched)
+    mismatches.sort()
+    return mismatches
@@ -0,0 +1,126 @@
+from collections import deque
+
+# Stały narzut tokenów na każdą wiadomość w formacie chat (rola, separatory)
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """Przybliżona liczba tokenów (~4 znaki na token) - bez zależności od tokenizera modelu"""
+    return len(text) // 4 + 1
+
+
+def estimate_messages_tokens(messages):
+    """Przybliżona liczba tokenów promptu w formacie chat (treść + narzut na każdą wiadomość)"""
+    return sum(estimate_tokens(str(message['content'])) + MESSAGE_OVERHEAD for message in messages)
+
+
+class Turn:
+    """Jedna wymiana: pytanie użytkownika i (opcjonalnie) odpowiedź asystenta"""
+
+    __slots__ = ('user', 'assistant', 'tokens', 'assistant_tokens')
+
+    def __init__(self, user, tokens):
+        self.user = user
+        self.assistant = None
+        self.tokens = tokens
+        self.assistant_tokens = 0
+
+
+class ConversationWindow:
+    """Ograniczona historia rozmowy z budżetem tokenów
+
+    Przechowuje całe tury (pytanie + odpowiedź), więc przy przycinaniu para nigdy nie jest
+    rozdzielana. Liczba tokenów każdej tury jest liczona raz, przy dodawaniu (albo podana
+    przez wywołującego, np. zapamiętana w PromptTemplate). Najstarsze tury są usuwane, gdy
+    przekroczony zostanie max_tokens lub max_turns; opcjonalny summarizer dostaje usuwane tury
+    i poprzednie streszczenie i zwraca nowe streszczenie. prefix_tokens to stały prefiks promptu
+    (np. PromptTemplate.system_tokens) - nie wlicza się do budżetu, ale do max_prompt_tokens tak.
+    """
+
+    def __init__(self, max_tokens=1000, max_turns=50, tokenizer=estimate_tokens, summarizer=None, prefix_tokens=0):
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.tokenizer = tokenizer
+        self.prefix_tokens = prefix_tokens
+        self.summarizer = summarizer
+        self.summary = None
+        self._summary_tokens = 0
+        self._turns = deque()
+        self._tokens = 0
+        self.total_messages = 0
+        self.evicted_turns = 0
+        self.max_prompt_tokens = 0
+
+    def _count(self, text, tokens=None):
+        return (self.tokenizer(text) if tokens is None else tokens) + MESSAGE_OVERHEAD
+
+    @property
+    def token_count(self):
+        return self._tokens + self._summary_tokens
+
+    def __len__(self):
+        return sum(1 if turn.assistant is None else 2 for turn in self._turns)
+
+    def add_user(self, content, tokens=None):
+        """Dodaje pytanie jako nową turę; tokens - znana już liczba tokenów treści"""
+        self._turns.append(Turn(content, self._count(content, tokens)))
+        self._tokens += self._turns[-1].tokens
+        self.total_messages += 1
+        self._evict()
+
+    def add_assistant(self, content, tokens=None):
+        """Uzupełnia odpowiedź w ostatniej turze (jeśli tura już ma odpowiedź - nadpisuje ją)"""
+        if not self._turns:
+            raise ValueError("Brak pytania, do którego można dodać odpowiedź")
+        turn = self._turns[-1]
+        if turn.assistant is None:
+            self.total_messages += 1
+        turn.tokens -= turn.assistant_tokens
+        self._tokens -= turn.assistant_tokens
+        turn.assistant = content
+        turn.assistant_tokens = self._count(content, tokens)
+        turn.tokens += turn.assistant_tokens
+        self._tokens += turn.assistant_tokens
+        self._evict()
+
+    def _evict(self):
+        """Usuwa najstarsze całe tury - bieżąca (ostatnia) tura zawsze zostaje
+
+        Nowe streszczenie może być dłuższe od poprzedniego, więc po nim budżet jest sprawdzany ponownie.
+        """
+        while True:
+            evicted = []
+            while len(self._turns) > 1 and (
+                len(self._turns) > self.max_turns or self.token_count > self.max_tokens
+            ):
+                turn = self._turns.popleft()
+                self._tokens -= turn.tokens
+                evicted.append(turn)
+            if not evicted:
+                return
+            self.evicted_turns += len(evicted)
+            if self.summarizer is None:
+                return
+            self.summary = self.summarizer(evicted, self.summary)
+            self._summary_tokens = self._count(self.summary) if self.summary else 0
+
+    def messages(self):
+        """Zwraca wiadomości w formacie chat - streszczenie (jeśli jest) jako wiadomość systemowa"""
+        result = []
+        if self.summary:
+            result.append({"role": "system", "content": f"Earlier conversation summary: {self.summary}"})
+        for turn in self._turns:
+            result.append({"role": "user", "content": turn.user})
+            if turn.assistant is not None:
+                result.append({"role": "assistant", "content": turn.assistant})
+        self.max_prompt_tokens = max(self.max_prompt_tokens, self.prefix_tokens + self.token_count)
+        return result
+
+    def stats(self):
+        return {
+            'turns': len(self._turns),
+            'tokens': self.token_count,
+            'max_prompt_tokens': self.max_prompt_tokens,
+            'evicted_turns': self.evicted_turns,
+            'total_messages': self.total_messages,
+        }
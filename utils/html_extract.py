@@ -0,0 +1,176 @@
+import html
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+
+# Elementy bez zamykającego znacznika - ich tekst jest zawsze pusty
+VOID_TAGS = frozenset({'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'})
+# Obsługiwane selektory: "#id", "tag#id", "tag.klasa", "tag"
+_SELECTOR_RE = re.compile(r'^(?P<tag>[a-zA-Z][\w-]*)?(?:#(?P<id>[\w-]+)|\.(?P<class>[\w-]+))?$')
+_TAG_RE = re.compile(r'<[^>]*>')
+# Treści, których nie da się poprawnie obsłużyć wyrażeniem regularnym - wtedy parser
+_UNSAFE_CONTENT_RE = re.compile(r'<!--|<script|<style|<!\[CDATA\[', re.IGNORECASE)
+
+
+@lru_cache(maxsize=64)
+def _close_re(tag):
+    return re.compile(rf'</{re.escape(tag)}\s*>', re.IGNORECASE)
+
+
+@lru_cache(maxsize=64)
+def _nested_re(tag):
+    return re.compile(rf'<{re.escape(tag)}[\s/>]', re.IGNORECASE)
+
+
+class Selector:
+    """Prosty selektor CSS skompilowany do wyrażenia regularnego znacznika otwierającego"""
+
+    __slots__ = ('css', 'tag', 'id', 'css_class', 'open_re')
+
+    def __init__(self, css):
+        match = _SELECTOR_RE.match(css)
+        if not match or not any(match.groupdict().values()):
+            raise ValueError(f"Nieobsługiwany selektor: {css}")
+        self.css = css
+        self.tag = match.group('tag').lower() if match.group('tag') else None
+        self.id = match.group('id')
+        self.css_class = match.group('class')
+
+        tag = re.escape(self.tag) if self.tag else r'[a-zA-Z][\w:-]*'
+        if self.id:
+            condition = rf'''(?=[^>]*?\sid\s*=\s*["']?{re.escape(self.id)}["'\s/>])'''
+        elif self.css_class:
+            condition = rf'''(?=[^>]*?\sclass\s*=\s*["'][^"']*?(?<![\w-]){re.escape(self.css_class)}(?![\w-]))'''
+        else:
+            condition = r'(?=[\s/>])'
+        self.open_re = re.compile(rf'<(?P<tag>{tag}){condition}[^>]*>', re.IGNORECASE)
+
+    def matches(self, tag, attrs):
+        if self.tag and tag != self.tag:
+            return False
+        if self.id:
+            return any(name == 'id' and value == self.id for name, value in attrs)
+        if self.css_class:
+            return any(name == 'class' and value and self.css_class in value.split() for name, value in attrs)
+        return True
+
+
+class _Found(Exception):
+    pass
+
+
+class _TargetParser(HTMLParser):
+    """Tokenizer zbierający tekst wybranych elementów - przerywa, gdy znajdzie wszystkie"""
+
+    def __init__(self, selectors):
+        super().__init__(convert_charrefs=True)
+        self.selectors = selectors
+        self.results = {}
+        self._open = {}  # nazwa -> [znacznik, zagłębienie, fragmenty tekstu]
+
+    def handle_starttag(self, tag, attrs):
+        for entry in self._open.values():
+            if entry[0] == tag:
+                entry[1] += 1
+        for name, selector in self.selectors.items():
+            if name in self.results or name in self._open or not selector.matches(tag, attrs):
+                continue
+            if tag in VOID_TAGS:
+                self._finish(name, '')
+            else:
+                self._open[name] = [tag, 1, []]
+
+    def handle_endtag(self, tag):
+        for name, entry in list(self._open.items()):
+            if entry[0] == tag:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._open[name]
+                    self._finish(name, ''.join(entry[2]))
+
+    def handle_data(self, data):
+        for entry in self._open.values():
+            entry[2].append(data)
+
+    def _finish(self, name, text):
+        self.results[name] = text
+        if len(self.results) == len(self.selectors):
+            raise _Found
+
+
+class HTMLExtractor:
+    """Wyciąga tekst wybranych elementów strony bez budowania pełnego drzewa DOM
+
+    Kolejne ścieżki, od najszybszej:
+      1. regex - znacznik otwierający z selektora i najbliższy zamykający (gdy w środku nie ma
+         zagnieżdżonego elementu tego samego typu, komentarzy ani skryptów),
+      2. strumieniowy tokenizer HTMLParser - przerywany, gdy wszystkie elementy są znalezione,
+      3. BeautifulSoup - tylko gdy struktura strony jest nietypowa (np. niezamknięte znaczniki).
+    Tekst odpowiada `element.text` z BeautifulSoup (encje zamienione, znaczniki pominięte).
+    """
+
+    def __init__(self, selectors, chunk_size=8192):
+        self.selectors = {name: Selector(css) for name, css in selectors.items()}
+        self.chunk_size = chunk_size
+        self.stats = {'regex': 0, 'parser': 0, 'fallback': 0}
+
+    def _regex(self, text, selector):
+        match = selector.open_re.search(text)
+        if match is None:
+            return None
+        tag = match.group('tag').lower()
+        if tag in VOID_TAGS:
+            return ''
+        close = _close_re(tag).search(text, match.end())
+        if close is None:
+            return None
+        content = text[match.end():close.start()]
+        if _nested_re(tag).search(content) or _UNSAFE_CONTENT_RE.search(content):
+            return None
+        return html.unescape(_TAG_RE.sub('', content))
+
+    def _parse(self, text, names):
+        parser = _TargetParser({name: self.selectors[name] for name in names})
+        try:
+            for start in range(0, len(text), self.chunk_size):
+                parser.feed(text[start:start + self.chunk_size])
+            parser.close()
+        except _Found:
+            pass
+        return parser.results
+
+    def _fallback(self, text, names):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(text, 'html.parser')
+        results = {}
+        for name in names:
+            element = soup.select_one(self.selectors[name].css)
+            results[name] = element.text if element is not None else None
+        return results
+
+    def extract(self, data, encoding='utf-8'):
+        """Zwraca słownik nazwa -> tekst elementu (None, gdy elementu nie ma na stronie)"""
+        text = data.decode(encoding, errors='replace') if isinstance(data, bytes) else data
+        results = {}
+        missing = []
+        for name, selector in self.selectors.items():
+            value = self._regex(text, selector)
+            if value is None:
+                missing.append(name)
+            else:
+                results[name] = value
+        if not missing:
+            self.stats['regex'] += 1
+            return results
+
+        found = self._parse(text, missing)
+        results.update(found)
+        missing = [name for name in missing if name not in found]
+        if not missing:
+            self.stats['parser'] += 1
+            return results
+
+        self.stats['fallback'] += 1
+        results.update(self._fallback(text, missing))
+        return results
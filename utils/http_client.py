@@ -0,0 +1,214 @@
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from utils.metrics import get_metrics
+from utils.replay import get_cassette
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Metody, których powtórzenie nie zmienia stanu serwera - tylko je ponawiamy po dowolnym błędzie
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+def _connect_failed(error):
+    """Czy błąd wystąpił przy nawiązywaniu połączenia - zapytanie na pewno nie dotarło do serwera"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, NewConnectionError)
+
+
+class RequestMetrics:
+    """Czasy odpowiedzi per host - trzyma ostatnie max_samples pomiarów"""
+
+    def __init__(self, max_samples=10_000):
+        self._latencies = defaultdict(lambda: deque(maxlen=max_samples))
+        self._counters = defaultdict(lambda: {'requests': 0, 'errors': 0, 'retries': 0})
+        self._lock = threading.Lock()
+
+    def record(self, host, elapsed, ok):
+        with self._lock:
+            self._latencies[host].append(elapsed)
+            counters = self._counters[host]
+            counters['requests'] += 1
+            if not ok:
+                counters['errors'] += 1
+
+    def record_retry(self, host):
+        with self._lock:
+            self._counters[host]['retries'] += 1
+
+    def summary(self):
+        """Zwraca dla każdego hosta liczniki i percentyle czasu odpowiedzi (w sekundach)"""
+        with self._lock:
+            result = {}
+            for host, samples in self._latencies.items():
+                ordered = sorted(samples)
+                result[host] = {
+                    **self._counters[host],
+                    'p50': ordered[len(ordered) // 2] if ordered else None,
+                    'p95': ordered[int(len(ordered) * 0.95)] if ordered else None,
+                    'max': ordered[-1] if ordered else None,
+                }
+            return result
+
+
+class HTTPClient:
+    """Wspólny klient HTTP: pula połączeń keep-alive, timeouty i ponawianie z losowym opóźnieniem"""
+
+    def __init__(self, timeout=(5, 30), retries=3, backoff=0.5, max_backoff=10.0,
+                 pool_maxsize=10, host_pool_sizes=None, metrics=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics or RequestMetrics()
+        self.registry = get_metrics()
+        self.cassette = get_cassette()
+        self.session = requests.Session()
+        self.pool_sizes = dict(host_pool_sizes or {})
+        self.default_pool_size = pool_maxsize
+
+        # Ponawianie obsługujemy sami, dlatego adaptery mają max_retries=0
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        for host, size in self.pool_sizes.items():
+            self.configure_host(host, size)
+
+    def configure_host(self, host, pool_size):
+        """Ustawia osobny rozmiar puli połączeń dla hosta (np. przy wielu równoległych sesjach)"""
+        self.pool_sizes[host] = pool_size
+        host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount(f'http://{host}', host_adapter)
+        self.session.mount(f'https://{host}', host_adapter)
+
+    def pool_size(self, host):
+        return self.pool_sizes.get(host, self.default_pool_size)
+
+    def _retry_delay(self, attempt, response=None):
+        """Opóźnienie przed kolejną próbą - Retry-After z serwera lub wykładnicze z pełnym losowaniem"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, retry=None, **kwargs):
+        """Zapytanie HTTP z ponawianiem
+
+        Metody idempotentne (GET, PUT, DELETE...) są ponawiane po błędzie sieci, timeoucie
+        i statusach RETRY_STATUSES. Pozostałe (POST) - tylko gdy połączenie w ogóle nie powstało:
+        po timeoucie odczytu serwer mógł już przetworzyć zapytanie (np. wiadomość w /verify),
+        a ponowienie wysłałoby ją drugi raz. retry=True włącza pełne ponawianie dla wywołania,
+        retry=False je wyłącza.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        if self.cassette is not None and self.cassette.replaying:
+            return self.cassette.replay_http(method, url, kwargs)
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        # Ciała w postaci generatora nie da się wysłać drugi raz
+        retries = 0 if hasattr(kwargs.get('data'), '__next__') else self.retries
+
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                with self.registry.span('http_request', host=host, method=method):
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.metrics.record(host, time.perf_counter() - start, ok=False)
+                if attempt == retries or not (retry or _connect_failed(e)):
+                    raise
+                self.metrics.record_retry(host)
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            ok = response.status_code not in RETRY_STATUSES
+            self.metrics.record(host, time.perf_counter() - start, ok=ok)
+            self._count_bytes(host, response, streamed=kwargs.get('stream', False))
+            if ok or attempt == retries or not retry:
+                if self.cassette is not None:
+                    self.cassette.record_http(method, url, kwargs, response)
+                return response
+            self.metrics.record_retry(host)
+            delay = self._retry_delay(attempt, response)
+            response.close()
+            time.sleep(delay)
+
+    def _count_bytes(self, host, response, streamed):
+        if not self.registry.enabled:
+            return
+        body = response.request.body
+        if isinstance(body, (bytes, str)):
+            self.registry.count('http_bytes_sent', len(body), host=host)
+        # Przy stream=True treść nie jest jeszcze pobrana - liczymy z nagłówka, jeśli jest
+        received = response.headers.get('Content-Length') if streamed else len(response.content)
+        if received:
+            self.registry.count('http_bytes_received', int(received), host=host)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHTTPClient:
+    """Asynchroniczna nakładka na HTTPClient dla asyncio
+
+    Zapytania wykonywane są w wątkach na wspólnej puli połączeń, a liczba równoczesnych
+    zapytań do jednego hosta jest ograniczona do rozmiaru jego puli.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or get_shared_client()
+        self._semaphores = {}
+
+    def _semaphore(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.client.pool_size(host))
+        return self._semaphores[host]
+
+    async def request(self, method, url, **kwargs):
+        async with self._semaphore(urlsplit(url).netloc):
+            return await asyncio.to_thread(self.client.request, method, url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    @property
+    def metrics(self):
+        return self.client.metrics
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client():
+    """Zwraca wspólnego klienta HTTP używanego przez wszystkie zadania"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HTTPClient()
+        return _shared_client
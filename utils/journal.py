@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+    """Dziennik JSON-lines dopisywany na bieżąco - jedna linia na zdarzenie, koszt O(1)
+
+    Każdy wpis od razu trafia do systemu operacyjnego (flush), więc awaria procesu go nie gubi;
+    na dysk (fsync) dane są wymuszane przy pierwszym wpisie po upływie `fsync_interval` sekund
+    od poprzedniego fsync i przy zamknięciu. Awaria w trakcie zapisu może uciąć najwyżej
+    ostatnią linię - replay ją pomija. Przy zamknięciu dziennik można skompaktować:
+    funkcja `compact` dostaje wszystkie wpisy i zwraca te, które mają zostać (zapis atomowy).
+    """
+
+    def __init__(self, path, fsync_interval=1.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8', buffering=64 * 1024)
+        self._last_fsync = time.monotonic()
+        self._lock = threading.Lock()
+        self.entries_written = 0
+
+    def append(self, kind, **fields):
+        line = json.dumps({'t': time.time(), 'kind': kind, **fields}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self.entries_written += 1
+            self._flush(fsync=time.monotonic() - self._last_fsync >= self.fsync_interval)
+
+    def _flush(self, fsync=False):
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def flush(self, fsync=True):
+        with self._lock:
+            self._flush(fsync)
+
+    def close(self, compact=None):
+        """Zapisuje zaległe wpisy na dysk i opcjonalnie kompaktuje dziennik"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush(fsync=True)
+            self._file.close()
+        if compact is not None:
+            self.compact(self.path, compact)
+
+    @staticmethod
+    def replay(path):
+        """Zwraca kolejne wpisy dziennika (pomija uciętą przez awarię ostatnią linię)"""
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    @staticmethod
+    def compact(path, reducer):
+        """Przepisuje dziennik wpisami zwróconymi przez reducer - atomowo (plik tymczasowy + replace)"""
+        entries = reducer(list(Journal.replay(path)))
+        temporary = f"{path}.compact"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
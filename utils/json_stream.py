@@ -0,0 +1,145 @@
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    """Bufor tekstu dociągający kolejne fragmenty strumienia bajtów tylko wtedy, gdy są potrzebne"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def _fill(self):
+        """Dociąga kolejny fragment - zwraca False, gdy strumień się skończył"""
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.pos:] + text
+                self.pos = 0
+                return True
+        if not self.exhausted:
+            self.exhausted = True
+            tail = self.decoder.decode(b'', final=True)
+            if tail:
+                self.buffer = self.buffer[self.pos:] + tail
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self):
+        """Zwraca następny znak różny od białego (bez konsumowania)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Nieoczekiwany koniec strumienia JSON")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Oczekiwano '{char}', otrzymano '{self.buffer[self.pos]}'")
+        self.pos += 1
+
+    def value(self):
+        """Dekoduje jedną wartość JSON, w razie potrzeby dociągając dane"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # Liczba na końcu bufora mogła zostać ucięta - upewniamy się, że coś po niej jest
+                if end < len(self.buffer) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+            if not self._fill():
+                value, self.pos = _decoder.raw_decode(self.buffer, self.pos)
+                return value
+
+
+def iter_json_events(chunks, stream_key='test-data'):
+    """Parsuje przyrostowo obiekt JSON ze strumienia bajtów
+
+    Zwraca zdarzenia w kolejności występowania w dokumencie:
+      ('field', klucz, wartość)   - zwykłe pole najwyższego poziomu,
+      ('array_start', klucz)      - początek tablicy stream_key,
+      ('item', klucz, element)    - kolejny element tablicy stream_key,
+      ('array_end', klucz)        - koniec tablicy stream_key.
+    W pamięci trzymany jest tylko bieżący element, a nie cały dokument.
+    """
+    reader = _Reader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == stream_key and reader.peek() == '[':
+            reader.expect('[')
+            yield ('array_start', key)
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield ('item', key, reader.value())
+                    if reader.peek() == ']':
+                        reader.pos += 1
+                        break
+                    reader.expect(',')
+            yield ('array_end', key)
+        else:
+            yield ('field', key, reader.value())
+        if reader.peek() == '}':
+            return
+        reader.expect(',')
+
+
+def iter_json_bytes(events, prefix='', suffix='', buffer_size=64 * 1024):
+    """Serializuje zdarzenia z iter_json_events z powrotem do JSON jako strumień bajtów
+
+    prefix i suffix pozwalają osadzić obiekt wewnątrz większego dokumentu (np. payloadu /report).
+    Fragmenty są łączone do ok. buffer_size bajtów - wysyłanie każdego rekordu osobno
+    (osobny fragment chunked i osobne wywołanie send) kosztuje więcej niż sama serializacja.
+    """
+    buffer = []
+    size = 0
+    for piece in _iter_json_pieces(events, prefix, suffix):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= buffer_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _iter_json_pieces(events, prefix, suffix):
+    yield prefix + '{'
+    first_field = True
+    first_item = True
+    for event in events:
+        kind, key = event[0], event[1]
+        if kind == 'item':
+            text = json.dumps(event[2]) if first_item else ', ' + json.dumps(event[2])
+            first_item = False
+            yield text
+            continue
+        if kind == 'array_end':
+            yield ']'
+            continue
+        separator = '' if first_field else ', '
+        first_field = False
+        if kind == 'array_start':
+            first_item = True
+            yield f"{separator}{json.dumps(key)}: ["
+        else:
+            yield f"{separator}{json.dumps(key)}: {json.dumps(event[2])}"
+    yield '}' + suffix
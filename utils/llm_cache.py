@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from utils.llm_stream import answer_with, truncated
+from utils.metrics import get_metrics
+
+
+@lru_cache(maxsize=4096)
+def _normalize(content):
+    # System prompty powtarzają się w każdym zapytaniu - normalizujemy je raz
+    return ' '.join(content.split())
+
+
+class LLMCache:
+    """Wspólny cache odpowiedzi LLM: LRU w pamięci + trwały backend SQLite
+
+    Klucz to skrót znormalizowanej krotki (model, messages, temperature, max_tokens),
+    więc to samo pytanie zadane w kolejnym uruchomieniu nie kosztuje ani tokenów, ani czasu.
+    """
+
+    def __init__(self, path='cache/llm_cache.sqlite', ttl=7 * 24 * 3600,
+                 max_memory_entries=1024, max_disk_entries=100_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # klucz -> (odpowiedź, czas zapisu)
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+            'memory_evictions': 0, 'disk_evictions': 0, 'expired': 0,
+        }
+        self._writes = 0
+        self.registry = get_metrics()
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers (created)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, messages, temperature=None, max_tokens=None):
+        """Buduje klucz z parametrów zapytania - nadmiarowe białe znaki w treści są pomijane"""
+        normalized = [
+            [message['role'], _normalize(str(message['content']))]
+            for message in messages
+        ]
+        raw = json.dumps([model, normalized, temperature, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _is_fresh(self, created, max_age):
+        limit = self.ttl if max_age is None else min(self.ttl, max_age)
+        return time.time() - created < limit
+
+    def get(self, key, max_age=None):
+        """Zwraca odpowiedź z cache lub None; max_age pozwala zawęzić TTL dla danego wywołania"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._is_fresh(entry[1], max_age):
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    self.registry.count('llm_cache_hits', tier='memory')
+                    return entry[0]
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT answer, created FROM answers WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if self._is_fresh(row[1], max_age):
+                        self._remember(key, row[0], row[1])
+                        self._stats['disk_hits'] += 1
+                        self.registry.count('llm_cache_hits', tier='disk')
+                        return row[0]
+                    self._stats['expired'] += 1
+
+            self._stats['misses'] += 1
+            self.registry.count('llm_cache_misses')
+            return None
+
+    def set(self, key, answer):
+        created = time.time()
+        with self._lock:
+            self._remember(key, answer, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (key, answer, created) VALUES (?, ?, ?)",
+                    (key, answer, created)
+                )
+                self._writes += 1
+                # Sprzątanie co 100 zapisów - COUNT(*) w SQLite wymaga przejścia po tabeli
+                if self._writes % 100 == 0:
+                    self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key, answer, created):
+        self._memory[key] = (answer, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats['memory_evictions'] += 1
+
+    def _evict_disk(self):
+        """Usuwa przeterminowane wpisy i najstarsze ponad limit rozmiaru"""
+        expired = self._db.execute(
+            "DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,)
+        ).rowcount
+        overflow = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY created LIMIT ?)", (overflow,)
+            )
+        self._stats['disk_evictions'] += expired + max(overflow, 0)
+
+    def complete(self, client, max_age=None, validator=None, **params):
+        """Wywołuje chat.completions.create tylko przy braku odpowiedzi w cache
+
+        Z validatorem (np. utils.llm_stream.integer_answer) odpowiedź jest strumieniowana
+        i kończona, gdy tylko ma oczekiwany kształt.
+        """
+        key = self.make_key(params['model'], params['messages'],
+                            params.get('temperature'), params.get('max_tokens'))
+        answer = self.get(key, max_age=max_age)
+        if answer is not None:
+            return answer
+        with self.registry.span('llm_call', model=params['model']):
+            if validator is None:
+                choice = client.chat.completions.create(**params).choices[0]
+                # Odpowiedź ucięta na max_tokens nie jest odpowiedzią
+                answer = None if truncated(choice.finish_reason) else choice.message.content.strip()
+            else:
+                answer = answer_with(client, validator, **params).answer
+        # Odpowiedź odrzuconą przez walidator zwracamy (None), ale nie zapamiętujemy
+        if answer is not None:
+            self.set(key, answer)
+        return answer
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        total = hits + stats['misses']
+        stats['hit_rate'] = hits / total if total else 0.0
+        return stats
+
+    def clear(self):
+        """Czyści pamięć i backend dyskowy (liczniki zostają)"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Zwraca wspólny dla wszystkich zadań cache (ścieżka z LLM_CACHE_PATH)"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache(path=os.getenv('LLM_CACHE_PATH', 'cache/llm_cache.sqlite'))
+        return _shared_cache
@@ -0,0 +1,288 @@
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import openai
+
+from utils.conversation import estimate_messages_tokens
+from utils.llm_stream import stream_answer
+from utils.metrics import get_metrics
+from utils.rate_limiter import TokenBucket
+from utils.replay import openai_client
+
+# Priorytety - mniejsza wartość jest obsługiwana wcześniej
+INTERACTIVE = 0  # rozmowa na żywo (challenge2), captcha z limitem czasu (challenge1)
+BULK = 10        # przetwarzanie wsadowe (challenge3)
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+# Błędy, po których warto spróbować ponownie (po odczekaniu)
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def request_key(params):
+    """Skrót parametrów zapytania - identyczne zapytania w locie są łączone w jedno"""
+    raw = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def estimate_request_tokens(params):
+    """Szacuje koszt zapytania w tokenach: prompt + limit odpowiedzi"""
+    return estimate_messages_tokens(params['messages']) + (params.get('max_tokens') or 256)
+
+
+class _Job:
+    __slots__ = ('priority', 'seq', 'key', 'params', 'validator', 'future', 'tokens', 'enqueued', 'attempt')
+
+    def __init__(self, priority, seq, key, params, validator=None):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.params = params
+        self.validator = validator
+        self.future = Future()
+        self.tokens = estimate_request_tokens(params)
+        self.enqueued = time.monotonic()
+        self.attempt = 0
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _PriorityCompletions:
+    def __init__(self, scheduler, priority):
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def create(self, **params):
+        return self._scheduler.create(priority=self._priority, **params)
+
+
+class PriorityClient:
+    """Klient zgodny z OpenAI (chat.completions.create) kierujący zapytania do harmonogramu"""
+
+    def __init__(self, scheduler, priority):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.chat = SimpleNamespace(completions=_PriorityCompletions(scheduler, priority))
+
+    def answer(self, validator, **params):
+        """Odpowiedź strumieniowa z wczesnym zakończeniem (zob. utils.llm_stream)"""
+        return self.scheduler.answer(validator, priority=self.priority, **params)
+
+
+class LLMScheduler:
+    """Wspólny harmonogram zapytań LLM: jeden klient, budżety RPM/TPM, łączenie zapytań i priorytety
+
+    Zapytania trafiają do kolejki priorytetowej; wątek dyspozytora czeka na wolny slot
+    i budżet (kubełki tokenów zapytań i tokenów LLM), a dopiero wtedy wybiera zadanie
+    o najwyższym priorytecie - dlatego pytania z rozmowy na żywo wyprzedzają zaległą paczkę.
+    Identyczne zapytania będące w locie dostają ten sam Future (jedno wywołanie API).
+    Przy 429 / błędach połączenia cały harmonogram wstrzymuje się (Retry-After lub backoff),
+    a zapytanie wraca do kolejki z tym samym miejscem.
+    """
+
+    def __init__(self, client=None, requests_per_minute=None, tokens_per_minute=None,
+                 max_concurrency=8, retries=3, backoff=1.0, max_backoff=30.0):
+        # Ponowienia robi harmonogram - klient nie powtarza zapytań sam
+        self.client = client or openai_client(max_retries=0)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.registry = get_metrics()
+        self._queue = []
+        self._inflight = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(max_concurrency)
+        self._paused_until = 0.0
+        self._closed = False
+        self._executor = None
+        self._dispatcher = None
+        self._stats = {
+            'submitted': 0, 'coalesced': 0, 'completed': 0, 'failed': 0,
+            'retries': 0, 'max_queue_depth': 0,
+        }
+        self._waits = {name: [0, 0.0, 0.0] for name in PRIORITY_NAMES.values()}  # liczba, suma, max
+
+    def client_for(self, priority=BULK):
+        """Obiekt zgodny z klientem OpenAI (chat.completions.create) o zadanym priorytecie"""
+        return PriorityClient(self, priority)
+
+    def submit(self, priority=BULK, validator=None, **params):
+        """Dodaje zapytanie do kolejki i zwraca Future z odpowiedzią
+
+        Z validatorem odpowiedź jest strumieniowana i kończona wcześnie - Future zwraca StreamedAnswer.
+        """
+        key = request_key(params if validator is None else {**params, 'validator': validator.__qualname__})
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Harmonogram LLM został zamknięty")
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                self.registry.count('llm_coalesced')
+                return future
+            job = _Job(priority, next(self._seq), key, params, validator)
+            self._inflight[key] = job.future
+            self._stats['submitted'] += 1
+            self._push(job)
+            self._start()
+        return job.future
+
+    def create(self, priority=BULK, timeout=None, **params):
+        """Wersja blokująca submit - zwraca odpowiedź jak chat.completions.create"""
+        return self.submit(priority, **params).result(timeout)
+
+    def answer(self, validator, priority=BULK, timeout=None, **params):
+        """Wersja blokująca submit z validatorem - zwraca StreamedAnswer"""
+        return self.submit(priority, validator, **params).result(timeout)
+
+    def _push(self, job):
+        heapq.heappush(self._queue, job)
+        depth = len(self._queue)
+        self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+        self.registry.gauge('llm_queue_depth', depth)
+        self._cond.notify()
+
+    def _start(self):
+        if self._dispatcher is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='llm')
+            self._dispatcher = threading.Thread(target=self._dispatch, name='llm-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            self._slots.acquire()
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            self.request_bucket.acquire()
+            # Zadanie wybieramy dopiero, gdy jest budżet - wygrywa najwyższy priorytet w tej chwili
+            with self._cond:
+                if self._closed or not self._queue:
+                    self._slots.release()
+                    continue
+                job = heapq.heappop(self._queue)
+                self.registry.gauge('llm_queue_depth', len(self._queue))
+                # Executor zamykany jest dopiero po zatrzymaniu dyspozytora
+                self._executor.submit(self._run_after_budget, job)
+
+    def _run_after_budget(self, job):
+        self.token_bucket.acquire(job.tokens)
+        self._execute(job)
+
+    def _execute(self, job):
+        name = PRIORITY_NAMES.get(job.priority, str(job.priority))
+        waited = time.monotonic() - job.enqueued
+        self.registry.observe('llm_queue_wait', waited, priority=name)
+        try:
+            with self.registry.span('llm_api_call', model=job.params.get('model')):
+                if job.validator is None:
+                    response = self.client.chat.completions.create(**job.params)
+                else:
+                    response = stream_answer(self.client, job.validator, **job.params)
+        except RETRYABLE_ERRORS as e:
+            if job.attempt < self.retries:
+                self._retry(job, e)
+            else:
+                self._finish(job, name, waited, error=e)
+        except Exception as e:
+            self._finish(job, name, waited, error=e)
+        else:
+            self.registry.record_usage(response, model=job.params.get('model'))
+            self._finish(job, name, waited, response=response)
+        finally:
+            self._slots.release()
+
+    def _retry(self, job, error):
+        job.attempt += 1
+        delay = self._retry_after(error)
+        if delay is None:
+            delay = min(self.max_backoff, self.backoff * 2 ** (job.attempt - 1)) * (0.5 + random.random() / 2)
+        with self._cond:
+            self._stats['retries'] += 1
+            self.registry.count('llm_retries', reason=type(error).__name__)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._push(job)
+
+    @staticmethod
+    def _retry_after(error):
+        response = getattr(error, 'response', None)
+        try:
+            return float(response.headers.get('retry-after'))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def _finish(self, job, name, waited, response=None, error=None):
+        with self._cond:
+            self._inflight.pop(job.key, None)
+            self._stats['failed' if error is not None else 'completed'] += 1
+            stats = self._waits.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(response)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+            stats['inflight'] = len(self._inflight)
+            stats['queue_wait'] = {
+                name: {'count': count, 'mean': total / count if count else 0.0, 'max': longest}
+                for name, (count, total, longest) in self._waits.items()
+            }
+        return stats
+
+    def close(self):
+        """Zatrzymuje dyspozytora; zapytania czekające w kolejce kończą się błędem"""
+        with self._cond:
+            self._closed = True
+            pending, self._queue = self._queue, []
+            for job in pending:
+                self._inflight.pop(job.key, None)
+            self._cond.notify_all()
+        for job in pending:
+            job.future.set_exception(RuntimeError("Harmonogram LLM został zamknięty"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+_shared_scheduler = None
+_shared_lock = threading.Lock()
+
+
+def _env_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def get_shared_scheduler():
+    """Zwraca wspólny harmonogram LLM (limity z LLM_RPM, LLM_TPM, LLM_CONCURRENCY)"""
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = LLMScheduler(
+                requests_per_minute=_env_int('LLM_RPM'),
+                tokens_per_minute=_env_int('LLM_TPM'),
+                max_concurrency=_env_int('LLM_CONCURRENCY') or 8,
+            )
+        return _shared_scheduler
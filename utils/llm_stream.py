@@ -0,0 +1,134 @@
+import re
+import time
+from types import SimpleNamespace
+
+from utils.conversation import estimate_messages_tokens, estimate_tokens
+from utils.metrics import get_metrics
+
+# Liczba zakończona znakiem, który nie może jej przedłużyć: interpunkcją (nie ułamkiem ani separatorem
+# tysięcy), końcem linii albo wyjaśnieniem po spacji ("1789 - to...", "19 jabłek"); nie "3/4" ani "12 + 7"
+_INTEGER_RE = re.compile(r'\s*(-?\d+)(?=[.,;:!?)](?!\d)[\s\S]|\s*\n|\s+[-–—]?\s*[^\W\d_])')
+# Krótka odpowiedź: do SHORT_ANSWER_WORDS słów w jednej linii ("Kraków", "New York", "Warszawa, Polska")
+SHORT_ANSWER_WORDS = 5
+_WORD = r'[^\W_][\w\'’-]*'
+_SHORT = rf'{_WORD}(?:,?[ \t]+{_WORD}){{0,{SHORT_ANSWER_WORDS - 1}}}'
+# W trakcie strumienia odpowiedź kończy się dopiero na jednoznacznym końcu: końcu zdania, końcu linii
+# albo myślniku z wyjaśnieniem ("Kraków - to dawna stolica"); przecinek może być częścią odpowiedzi
+_SHORT_RE = re.compile(rf'\s*({_SHORT})(?=[.!?;](?!\d)\s|\s*\n|\s+[-–—]\s)')
+# Po zakończeniu strumienia cała odpowiedź musi mieć oczekiwany kształt (dozwolona kropka lub wykrzyknik na końcu)
+_INTEGER_FINAL_RE = re.compile(r'(-?\d+)[.!]?')
+_SHORT_FINAL_RE = re.compile(rf'({_SHORT})[.!]?')
+
+
+def integer_answer(text, finished=False):
+    """Zwraca liczbę całkowitą z odpowiedzi, gdy wiadomo już, że się skończyła (None - to nie jest liczba)"""
+    if finished:
+        match = _INTEGER_FINAL_RE.fullmatch(text.strip())
+    else:
+        match = _INTEGER_RE.match(text)
+    return match.group(1) if match else None
+
+
+def short_answer(text, finished=False):
+    """Zwraca krótką odpowiedź (np. "Kraków", "New York", "1999"), gdy wiadomo już, że się skończyła"""
+    if finished:
+        match = _SHORT_FINAL_RE.fullmatch(text.strip())
+    else:
+        match = _SHORT_RE.match(text)
+    return match.group(1) if match else None
+
+
+def text_answer(text, finished=False):
+    """Zwraca całą odpowiedź po zakończeniu strumienia - pusta lub "???" jest odrzucana"""
+    if not finished:
+        return None
+    answer = text.strip()
+    return answer if answer and answer != '???' else None
+
+
+def truncated(finish_reason):
+    """Czy model przerwał odpowiedź na limicie max_tokens - taka odpowiedź może być ucięta w pół słowa"""
+    return finish_reason == 'length'
+
+
+class StreamedAnswer:
+    """Wynik strumieniowanego zapytania: odpowiedź, odebrany tekst i czasy"""
+
+    __slots__ = ('answer', 'text', 'ttft', 'time_to_answer', 'early_stop', 'usage', 'finish_reason')
+
+    def __init__(self, answer, text, ttft, time_to_answer, early_stop, usage=None, finish_reason=None):
+        self.answer = answer
+        self.text = text
+        self.ttft = ttft
+        self.time_to_answer = time_to_answer
+        self.early_stop = early_stop
+        self.usage = usage
+        self.finish_reason = finish_reason
+
+
+def stream_answer(client, validator, **params):
+    """Strumieniuje odpowiedź i kończy ją, gdy tylko validator rozpozna kompletną odpowiedź
+
+    Resztę strumienia zamykamy (przerwanie połączenia = brak dalszego generowania po stronie API).
+    Gdy walidator nie rozpozna odpowiedzi do końca strumienia albo strumień skończył się na limicie
+    max_tokens (finish_reason 'length' - odpowiedź ucięta), answer jest None (tekst zostaje w text).
+    Zużycie tokenów przychodzi w ostatnim fragmencie (stream_options.include_usage); po wczesnym
+    zamknięciu strumienia go nie ma - wtedy usage jest szacowane z promptu i odebranego tekstu.
+    Czas do pierwszego tokenu i do odpowiedzi trafia do histogramów llm_ttft i llm_time_to_answer.
+    """
+    registry = get_metrics()
+    model = params.get('model')
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    usage = None
+    answer = None
+    finish_reason = None
+    params.setdefault('stream_options', {'include_usage': True})
+    stream = client.chat.completions.create(stream=True, **params)
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, 'usage', None) or usage
+            if not chunk.choices:
+                continue
+            finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or finish_reason
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(delta)
+            answer = validator(''.join(parts))
+            if answer is not None:
+                break
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+
+    text = ''.join(parts)
+    early_stop = answer is not None
+    if not early_stop:
+        if truncated(finish_reason):
+            registry.count('llm_truncated', model=model)
+        else:
+            answer = validator(text, finished=True)
+    if usage is None:
+        prompt_tokens = estimate_messages_tokens(params.get('messages', ()))
+        completion_tokens = estimate_tokens(text)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                total_tokens=prompt_tokens + completion_tokens)
+        registry.count('llm_usage_estimated', model=model)
+    elapsed = time.perf_counter() - start
+    registry.observe('llm_ttft', ttft if ttft is not None else elapsed, model=model)
+    registry.observe('llm_time_to_answer', elapsed, model=model)
+    if early_stop:
+        registry.count('llm_stream_early_stops', model=model)
+    return StreamedAnswer(answer, text, ttft, elapsed, early_stop, usage, finish_reason)
+
+
+def answer_with(client, validator, **params):
+    """Odpowiedź strumieniowa przez harmonogram (jeśli klient go obsługuje) lub bezpośrednio"""
+    if hasattr(client, 'answer'):
+        return client.answer(validator, **params)
+    return stream_answer(client, validator, **params)
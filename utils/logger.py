@@ -1,37 +1,122 @@
+import atexit
 import logging
 import os
+import queue
 import sys
 import codecs
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Listenery kolejek per logger - zatrzymywane (i opróżniane) przy wyjściu z programu
+_listeners = {}
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """Plik logu z rotacją wg rozmiaru, zapisywany na dysk paczkami zamiast po każdym wpisie"""
+
+    def __init__(self, filename, flush_every=100, flush_interval=1.0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        # StreamHandler.emit woła flush po każdym wpisie - fizycznie zapisujemy co kilka wpisów
+        self._pending += 1
+        now = time.monotonic()
+        if self._pending >= self.flush_every or now - self._last_flush >= self.flush_interval:
+            self._pending = 0
+            self._last_flush = now
+            super().flush()
+
+    def force_flush(self):
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        super().flush()
+
+    def close(self):
+        super().flush()
+        super().close()
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Wrzuca rekord do kolejki bez formatowania - formatowanie i I/O robi wątek listenera"""
+
+    def prepare(self, record):
+        return record
+
+
+class _BatchingQueueListener(QueueListener):
+    """Gdy kolejka się opróżni, zapisuje zaległą paczkę - pod obciążeniem zapis idzie paczkami"""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                if isinstance(handler, BatchedRotatingFileHandler):
+                    handler.force_flush()
+
+
+def _stop_listeners():
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
+
+
+atexit.register(_stop_listeners)
+
+
+def setup_logger(name, buffered=True):
+    """Tworzy logger z plikiem <LOG_DIR>/<name>.log (domyślnie logs/) i wyjściem na konsolę
+
+    W trybie buffered (domyślnie) wywołanie logger.info tylko wrzuca rekord do kolejki,
+    a formatowanie, zapis do pliku (paczkami, z rotacją) i konsola obsługiwane są w osobnym wątku.
+    Poziom logowania można zmienić zmienną LOG_LEVEL (np. DEBUG włącza zrzuty payloadów).
+    """
+    log_dir = os.getenv('LOG_DIR', 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f'{name}.log')
 
-def setup_logger(name):
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-        
     logger = logging.getLogger(name)
-    
+
     # Usuń istniejące handlery
     if logger.handlers:
         logger.handlers.clear()
-    
-    logger.setLevel(logging.INFO)
-    
+    if name in _listeners:
+        _listeners.pop(name).stop()
+
+    logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
     # Handler do pliku - używamy utf-8
-    file_handler = logging.FileHandler(f'logs/{name}.log', encoding='utf-8')
+    if buffered:
+        file_handler = BatchedRotatingFileHandler(
+            log_path, encoding='utf-8', maxBytes=10 * 1024 * 1024, backupCount=5
+        )
+    else:
+        file_handler = logging.FileHandler(log_path, encoding='utf-8')
     file_handler.setFormatter(logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     ))
-    
+
     # Handler do konsoli
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(logging.Formatter(
         '%(name)s - %(levelname)s - %(message)s'
     ))
-    
+
     # Ustawiamy kodowanie dla handlera konsoli
     if sys.platform == 'win32':
         console_handler.setStream(codecs.getwriter('utf-8')(sys.stdout.buffer))
-    
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+
+    if buffered:
+        log_queue = queue.SimpleQueue()
+        listener = _BatchingQueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        listener.start()
+        _listeners[name] = listener
+        logger.addHandler(_LazyQueueHandler(log_queue))
+    else:
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+
     return logger
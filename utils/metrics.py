@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Granice przedziałów histogramu czasów (w sekundach)
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count', 'max')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.counts)},
+        }
+
+
+class _Span:
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe(self.key, time.perf_counter() - self.start, failed=exc_type is not None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+class Metrics:
+    """Wspólne metryki: czasy operacji (span), liczniki (np. tokeny, bajty) i wartości zewnętrzne
+
+    Wyłączone (METRICS_ENABLED=0) zwracają współdzielony pusty span i nic nie liczą.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._histograms = defaultdict(Histogram)
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, **labels):
+        """Mierzy czas bloku with: `with metrics.span('llm_call', model=...)`"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, _key(name, labels))
+
+    def _observe(self, key, elapsed, failed=False):
+        with self._lock:
+            self._histograms[key].observe(elapsed)
+            if failed:
+                self._counters[(f"{key[0]}_errors", key[1])] += 1
+
+    def observe(self, name, seconds, **labels):
+        """Dodaje zmierzony poza blokiem with czas (np. oczekiwanie w kolejce) do histogramu"""
+        if not self.enabled:
+            return
+        self._observe(_key(name, labels), seconds)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def gauge(self, name, value, **labels):
+        """Ustawia wartość bieżącą (np. trafienia cache zebrane przez inny moduł)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def record_usage(self, response, **labels):
+        """Zlicza tokeny z response.usage odpowiedzi OpenAI"""
+        usage = getattr(response, 'usage', None)
+        if not self.enabled or usage is None:
+            return
+        self.count('llm_prompt_tokens', usage.prompt_tokens or 0, **labels)
+        self.count('llm_completion_tokens', usage.completion_tokens or 0, **labels)
+
+    def reset(self):
+        """Czyści wszystkie metryki - np. przed kolejnym zadaniem w tym samym procesie"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    @staticmethod
+    def _label_text(labels):
+        return ','.join(f"{name}={value}" for name, value in labels)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'histograms': {
+                    f"{name}{{{self._label_text(labels)}}}": histogram.to_dict()
+                    for (name, labels), histogram in self._histograms.items()
+                },
+                'counters': {
+                    f"{name}{{{self._label_text(labels)}}}": value
+                    for (name, labels), value in self._counters.items()
+                },
+                'gauges': {
+                    f"{name}{{{self._label_text(labels)}}}": value
+                    for (name, labels), value in self._gauges.items()
+                },
+            }
+
+    def to_prometheus(self):
+        """Eksport w formacie tekstowym Prometheusa (z linią # TYPE przed każdą rodziną metryk)"""
+        def labels_text(labels, extra=()):
+            items = [f'{name}="{value}"' for name, value in (*labels, *extra)]
+            return '{' + ','.join(items) + '}' if items else ''
+
+        lines = []
+        typed = set()
+
+        def declare(metric, kind):
+            # Serie są posortowane po nazwie, więc rodzina występuje w jednym ciągłym bloku
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        with self._lock:
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = f"{name}_seconds"
+                declare(metric, 'histogram')
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else str(bound)
+                    lines.append(f"{metric}_bucket{labels_text(labels, (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{labels_text(labels)} {histogram.total}")
+                lines.append(f"{metric}_count{labels_text(labels)} {histogram.count}")
+            for (name, labels), value in sorted(self._counters.items()):
+                declare(f"{name}_total", 'counter')
+                lines.append(f"{name}_total{labels_text(labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                declare(name, 'gauge')
+                lines.append(f"{name}{labels_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path_prefix):
+        """Zapisuje podsumowanie do <path_prefix>.json i <path_prefix>.prom"""
+        if not self.enabled:
+            return None
+        directory = os.path.dirname(path_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        summary = self.to_dict()
+        with open(f"{path_prefix}.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        with open(f"{path_prefix}.prom", 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        return summary
+
+
+def export_summary(name, folder='data_and_instructions'):
+    """Zapisuje metryki przebiegu zadania jako metrics_<name>.json/.prom i zwraca podsumowanie"""
+    return get_metrics().export(os.path.join(folder, f"metrics_{name}"))
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Zwraca wspólny rejestr metryk (wyłączany zmienną METRICS_ENABLED=0)"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics(enabled=os.getenv('METRICS_ENABLED', '1') != '0')
+        return _metrics
@@ -0,0 +1,294 @@
+import os
+import threading
+import time
+
+from utils.conversation import estimate_tokens
+from utils.llm_stream import answer_with, integer_answer, short_answer, text_answer, truncated
+from utils.metrics import get_metrics
+
+# Modele kaskady: najpierw mały i tani, większy tylko gdy walidator odrzuci odpowiedź
+SMALL_MODEL = os.getenv('LLM_SMALL_MODEL', 'gpt-4o-mini')
+LARGE_MODEL = os.getenv('LLM_LARGE_MODEL', 'gpt-4o')
+
+# Kształt odpowiedzi rozpoznawany po walidatorze
+SHAPES = {integer_answer: 'number', short_answer: 'short', text_answer: 'text'}
+# Pytanie jest "trudne", gdy jest długie
+HARD_QUESTION_TOKENS = 40
+
+
+class RouteRequest:
+    """Zapytanie do routera: pytanie, gotowe wiadomości dla LLM i oczekiwany kształt odpowiedzi
+
+    client i cache należą do wywołującego zadania (np. klient z jego priorytetem w schedulerze) -
+    router jest współdzielony i trzyma tylko reguły wyboru i statystyki. question_tokens to znana
+    już liczba tokenów pytania (np. PromptTemplate.user_tokens) - bez niej router ją szacuje.
+    """
+
+    __slots__ = ('question', 'messages', 'validator', 'max_tokens', 'client', 'cache', 'question_tokens')
+
+    def __init__(self, question, messages=None, validator=None, max_tokens=10, client=None, cache=None,
+                 question_tokens=None):
+        self.question = question
+        self.messages = messages
+        self.validator = validator
+        self.max_tokens = max_tokens
+        self.client = client
+        self.cache = cache
+        self.question_tokens = question_tokens
+
+
+class RouteResult:
+    """Odpowiedź routera: zaakceptowana odpowiedź (lub None), backend, który ją dał, i próby"""
+
+    __slots__ = ('answer', 'backend', 'route', 'attempts', 'errors', 'elapsed')
+
+    def __init__(self, answer, backend, route, attempts, errors, elapsed):
+        self.answer = answer
+        self.backend = backend
+        self.route = route
+        self.attempts = attempts  # lista (backend, wynik: 'accepted'/'rejected'/'error')
+        self.errors = errors  # backend -> treść wyjątku
+        self.elapsed = elapsed
+
+
+class RuleBackend:
+    """Lokalne reguły (RuleEngine) - odpowiedź w mikrosekundach albo None"""
+
+    local = True
+
+    def __init__(self, engine, name='rules', cost=0.0):
+        self.engine = engine
+        self.name = name
+        self.cost = cost
+
+    def __call__(self, request):
+        local = self.engine.answer(request.question)
+        return None if local is None else local[1]
+
+
+class FunctionBackend:
+    """Dowolna lokalna funkcja pytanie -> odpowiedź lub None (np. cache odpowiedzi)"""
+
+    local = True
+
+    def __init__(self, name, func, cost=0.0):
+        self.name = name
+        self.func = func
+        self.cost = cost
+
+    def __call__(self, request):
+        return self.func(request.question)
+
+
+class LLMBackend:
+    """Model językowy; z cache odpowiedzi jest zapamiętywana, a z walidatorem strumieniowana"""
+
+    local = False
+
+    def __init__(self, name, model, cost=1.0, client=None, cache=None):
+        self.name = name
+        self.model = model
+        self.cost = cost
+        self.client = client
+        self.cache = cache
+
+    def __call__(self, request):
+        client = request.client or self.client
+        cache = request.cache or self.cache
+        params = {
+            'model': self.model,
+            'messages': request.messages,
+            'temperature': 0,
+            'max_tokens': request.max_tokens,
+        }
+        if cache is not None:
+            return cache.complete(client, validator=request.validator, **params)
+        if request.validator is not None:
+            return answer_with(client, request.validator, **params).answer
+        choice = client.chat.completions.create(**params).choices[0]
+        return None if truncated(choice.finish_reason) else choice.message.content.strip()
+
+
+class BackendStats:
+    """Statystyki backendu dla jednej klasy zapytań: skuteczność i średni czas (EWMA)"""
+
+    __slots__ = ('attempts', 'accepted', 'rejected', 'errors', 'latency', 'total_time', 'skipped')
+
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.latency = None
+        self.total_time = 0.0
+        self.skipped = 0
+
+    @property
+    def accuracy(self):
+        return self.accepted / self.attempts if self.attempts else None
+
+    def observe(self, outcome, elapsed, smoothing):
+        self.attempts += 1
+        if outcome == 'accepted':
+            self.accepted += 1
+        elif outcome == 'rejected':
+            self.rejected += 1
+        else:
+            self.errors += 1
+        self.latency = elapsed if self.latency is None else self.latency + smoothing * (elapsed - self.latency)
+        self.total_time += elapsed
+
+    def to_dict(self):
+        return {
+            'attempts': self.attempts,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'accuracy': self.accuracy,
+            'latency': self.latency,
+            'total_time': self.total_time,
+        }
+
+
+class ModelRouter:
+    """Kaskada backendów od najtańszego: reguły lokalne -> mały model -> duży model
+
+    Każde zapytanie jest klasyfikowane (kształt odpowiedzi z walidatora + trudność) i trafia
+    do kolejnych backendów, aż walidator zaakceptuje odpowiedź; błąd backendu też oznacza
+    przejście dalej. Dla każdej klasy i backendu liczona jest skuteczność (odsetek zaakceptowanych
+    odpowiedzi) i średni czas. Backendy lokalne (reguły, cache - local=True) są pytane zawsze:
+    kosztują mikrosekundy, a ich trafienie zależy od konkretnego pytania, nie od klasy.
+    Między modelami router układa plan: model ze skutecznością p i ceną c
+    (czas + cost_weight * koszt) jest pytany tylko wtedy, gdy c < p * cena reszty kaskady,
+    czyli gdy próba średnio się opłaca. Model bez min_samples prób jest zawsze pytany, a co
+    explore_every zapytanie klasy pytane są wszystkie - statystyki pominiętych mogą się poprawić.
+    Ostatni backend jest pytany zawsze, gdy wcześniejsze nie dały odpowiedzi.
+    """
+
+    def __init__(self, name, backends, cost_weight=0.01, min_samples=5, explore_every=20, smoothing=0.2):
+        if not backends:
+            raise ValueError("Router nie ma żadnych backendów")
+        self.name = name
+        self.backends = list(backends)
+        self.cost_weight = cost_weight  # ile sekund "kosztuje" jednostka kosztu backendu
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        self.smoothing = smoothing
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        self._stats = {}  # klasa -> nazwa backendu -> BackendStats
+        self._requests = {}  # klasa -> liczba zapytań
+
+    def classify(self, request):
+        """Klasa zapytania, np. 'number/easy' albo 'text/hard'"""
+        shape = SHAPES.get(request.validator, 'text')
+        tokens = request.question_tokens
+        if tokens is None:
+            tokens = estimate_tokens(request.question)
+        hard = tokens > HARD_QUESTION_TOKENS
+        return f"{shape}/{'hard' if hard else 'easy'}"
+
+    def _price(self, backend, stats):
+        return (stats.latency or 0.0) + self.cost_weight * backend.cost
+
+    def plan(self, route):
+        """Backendy, które zostaną zapytane (w tej kolejności) dla zapytania z danej klasy"""
+        with self._lock:
+            count = self._requests.get(route, 0)
+            self._requests[route] = count + 1
+            if self.explore_every and count % self.explore_every == self.explore_every - 1:
+                return list(self.backends)
+            stats = self._stats.setdefault(route, {backend.name: BackendStats() for backend in self.backends})
+            # Od końca kaskady: oczekiwana cena reszty, gdy bieżący backend zawiedzie
+            # (nieznany czas ostatniego backendu - każda tańsza próba może się opłacić)
+            last = self.backends[-1]
+            last_stats = stats[last.name]
+            rest = self._price(last, last_stats) if last_stats.latency is not None else float('inf')
+            plan = [last]
+            for backend in reversed(self.backends[:-1]):
+                if backend.local:
+                    plan.append(backend)
+                    continue
+                entry = stats[backend.name]
+                price = self._price(backend, entry)
+                if entry.attempts < self.min_samples or (entry.accuracy and entry.accuracy * rest > price):
+                    plan.append(backend)
+                    failure = 1.0 - entry.accuracy if entry.attempts else 1.0
+                    rest = price + (failure * rest if failure else 0.0)
+                else:
+                    entry.skipped += 1
+            plan.reverse()
+            return plan
+
+    def _record(self, route, backend, outcome, elapsed):
+        with self._lock:
+            stats = self._stats.setdefault(route, {backend.name: BackendStats() for backend in self.backends})
+            stats[backend.name].observe(outcome, elapsed, self.smoothing)
+        self.metrics.observe('router_backend', elapsed, router=self.name, backend=backend.name, route=route)
+        self.metrics.count('router_attempts', router=self.name, backend=backend.name, outcome=outcome)
+
+    def route(self, request):
+        """Przepuszcza zapytanie przez kaskadę - zwraca RouteResult (answer None, gdy nikt nie odpowiedział)"""
+        start = time.perf_counter()
+        route = self.classify(request)
+        attempts = []
+        errors = {}
+        for backend in self.plan(route):
+            attempt_start = time.perf_counter()
+            try:
+                answer = backend(request)
+                if answer and request.validator is not None:
+                    answer = request.validator(str(answer), finished=True)
+                if not answer:
+                    answer = None
+                outcome = 'rejected' if answer is None else 'accepted'
+            except Exception as e:
+                answer = None
+                outcome = 'error'
+                errors[backend.name] = str(e)
+            self._record(route, backend, outcome, time.perf_counter() - attempt_start)
+            attempts.append((backend.name, outcome))
+            if answer is not None:
+                return RouteResult(answer, backend.name, route, attempts, errors, time.perf_counter() - start)
+        return RouteResult(None, None, route, attempts, errors, time.perf_counter() - start)
+
+    def answer(self, question, messages=None, validator=None, max_tokens=10, client=None, cache=None,
+               question_tokens=None):
+        return self.route(RouteRequest(question, messages, validator, max_tokens, client, cache, question_tokens))
+
+    def _local_summary(self, requests, backends):
+        """Udział zapytań obsłużonych lokalnie i szacowany zaoszczędzony czas (średni czas modelu x trafienia)"""
+        local = [backends[backend.name] for backend in self.backends if backend.local]
+        answered = sum(entry.accepted for entry in local)
+        model = next((backends[backend.name] for backend in self.backends
+                      if not backend.local and backends[backend.name].attempts), None)
+        saved = None
+        if model is not None:
+            saved = answered * model.total_time / model.attempts - sum(entry.total_time for entry in local)
+        return {'local_fraction': answered / requests if requests else 0.0, 'latency_saved': saved}
+
+    def stats(self):
+        """Statystyki klasa -> backend -> skuteczność, czas, pominięcia (plus udział odpowiedzi lokalnych)"""
+        with self._lock:
+            result = {}
+            for route, backends in self._stats.items():
+                requests = self._requests.get(route, 0)
+                result[route] = {
+                    'requests': requests,
+                    **self._local_summary(requests, backends),
+                    'backends': {name: entry.to_dict() for name, entry in backends.items()},
+                }
+            return result
+
+
+def build_router(name, rule_engine=None, local=()):
+    """Typowa kaskada zadania: reguły, lokalne funkcje (np. cache), mały model, duży model"""
+    backends = []
+    if rule_engine is not None:
+        backends.append(RuleBackend(rule_engine))
+    backends += [FunctionBackend(backend_name, func) for backend_name, func in local]
+    # Koszt względny: cena tokenu dużego modelu to ok. 16x cena małego
+    backends.append(LLMBackend('small', SMALL_MODEL, cost=1.0))
+    backends.append(LLMBackend('large', LARGE_MODEL, cost=16.0))
+    return ModelRouter(name, backends)
@@ -0,0 +1,224 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.metrics import get_metrics
+
+_POLL = 0.1  # co ile wątki sprawdzają, czy potok nie został zatrzymany
+_END = object()  # znacznik końca danych przekazywany między etapami
+
+
+class Stage:
+    """Etap potoku: funkcja wywoływana dla każdego elementu przez `workers` wątków
+
+    kind='thread'  - funkcja działa w wątkach etapu (I/O: HTTP, LLM),
+    kind='process' - wątki etapu oddają pracę do puli `workers` procesów (obliczenia CPU);
+                     funkcja i elementy muszą dać się zserializować (pickle).
+    queue_size - pojemność kolejki wejściowej etapu; pełna kolejka wstrzymuje etap poprzedni.
+    """
+
+    def __init__(self, name, func, workers=1, kind='thread', queue_size=8):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Nieznany rodzaj etapu: {kind}")
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.kind = kind
+        self.queue_size = max(1, queue_size)
+
+
+class StageStats:
+    """Statystyki etapu: przepustowość, czas przetwarzania, przestoje na wejściu i wyjściu"""
+
+    __slots__ = ('items', 'errors', 'busy', 'max_latency', 'idle', 'blocked', 'max_queue')
+
+    def __init__(self):
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0  # suma czasów przetwarzania elementów
+        self.max_latency = 0.0
+        self.idle = 0.0  # czas oczekiwania na dane od etapu poprzedniego
+        self.blocked = 0.0  # czas oczekiwania na miejsce w kolejce etapu następnego (backpressure)
+        self.max_queue = 0
+
+    def to_dict(self, elapsed):
+        return {
+            'items': self.items,
+            'errors': self.errors,
+            'throughput': self.items / elapsed if elapsed else 0.0,
+            'mean_latency': self.busy / self.items if self.items else 0.0,
+            'max_latency': self.max_latency,
+            'idle': self.idle,
+            'blocked': self.blocked,
+            'max_queue': self.max_queue,
+        }
+
+
+class _Stopped(Exception):
+    pass
+
+
+class Pipeline:
+    """Potok etapów połączonych ograniczonymi kolejkami - etapy pracują jednocześnie
+
+    Źródło jest czytane w osobnym wątku, każdy etap ma własne wątki robocze, a wyniki
+    są zwracane przez `run` w kolejności źródła. Pamięć jest ograniczona: pełna kolejka
+    wstrzymuje etap poprzedni, a źródło czeka, gdy w potoku jest `max_in_flight` elementów
+    (także tych czekających na wcześniejszy element przy przywracaniu kolejności).
+    Pierwszy wyjątek z etapu lub źródła zatrzymuje potok i jest zgłaszany w `run`.
+    """
+
+    def __init__(self, name, stages, max_in_flight=None):
+        if not stages:
+            raise ValueError("Potok nie ma żadnych etapów")
+        self.name = name
+        self.stages = list(stages)
+        self.max_in_flight = max_in_flight or sum(stage.queue_size + stage.workers for stage in self.stages)
+        self.metrics = get_metrics()
+        self._stats = {}
+        self._started = None
+        self._finished = None
+
+    def _put(self, target, item, stop):
+        while True:
+            try:
+                target.put(item, timeout=_POLL)
+                return
+            except queue.Full:
+                if stop.is_set():
+                    raise _Stopped
+
+    def _get(self, source, stop):
+        while True:
+            try:
+                return source.get(timeout=_POLL)
+            except queue.Empty:
+                if stop.is_set():
+                    raise _Stopped
+
+    def _feed(self, source, first, window, stop, errors):
+        try:
+            for seq, item in enumerate(source):
+                while not window.acquire(timeout=_POLL):
+                    if stop.is_set():
+                        raise _Stopped
+                self._put(first, (seq, item), stop)
+            self._put(first, _END, stop)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+    def _work(self, stage, stats, inbox, outbox, pool, stop, errors, lock, remaining):
+        try:
+            while True:
+                start = time.perf_counter()
+                entry = self._get(inbox, stop)
+                waited = time.perf_counter() - start
+                if entry is _END:
+                    # Koniec danych: oddajemy znacznik pozostałym wątkom etapu, ostatni przekazuje go dalej
+                    self._put(inbox, _END, stop)
+                    with lock:
+                        remaining[stage.name] -= 1
+                        last = remaining[stage.name] == 0
+                    if last:
+                        self._put(outbox, _END, stop)
+                    return
+
+                seq, item = entry
+                start = time.perf_counter()
+                try:
+                    if pool is not None:
+                        result = pool.submit(stage.func, item).result()
+                    else:
+                        result = stage.func(item)
+                except BaseException:
+                    with lock:
+                        stats.errors += 1
+                    raise
+                latency = time.perf_counter() - start
+                self.metrics.observe('pipeline_stage', latency, pipeline=self.name, stage=stage.name)
+
+                start = time.perf_counter()
+                self._put(outbox, (seq, result), stop)
+                blocked = time.perf_counter() - start
+                with lock:
+                    stats.items += 1
+                    stats.busy += latency
+                    stats.max_latency = max(stats.max_latency, latency)
+                    stats.idle += waited
+                    stats.blocked += blocked
+                    stats.max_queue = max(stats.max_queue, inbox.qsize())
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def run(self, source):
+        """Przepuszcza elementy źródła przez wszystkie etapy - generator wyników w kolejności źródła"""
+        stop = threading.Event()
+        errors = []
+        lock = threading.Lock()
+        window = threading.BoundedSemaphore(self.max_in_flight)
+        queues = [queue.Queue(stage.queue_size) for stage in self.stages]
+        queues.append(queue.Queue(self.max_in_flight))
+        self._stats = {stage.name: StageStats() for stage in self.stages}
+        remaining = {stage.name: stage.workers for stage in self.stages}
+        # spawn zamiast fork - forkowanie procesu z działającymi wątkami może zakleszczyć potomka
+        pools = [ProcessPoolExecutor(stage.workers, mp_context=multiprocessing.get_context('spawn'))
+                 if stage.kind == 'process' else None for stage in self.stages]
+
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0], window, stop, errors),
+                                    name=f"{self.name}-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, self._stats[stage.name], queues[index], queues[index + 1], pools[index],
+                          stop, errors, lock, remaining),
+                    name=f"{self.name}-{stage.name}-{number}", daemon=True))
+
+        self._started, self._finished = time.perf_counter(), None
+        for thread in threads:
+            thread.start()
+        try:
+            pending = {}
+            expected = 0
+            while True:
+                try:
+                    entry = self._get(queues[-1], stop)
+                except _Stopped:
+                    break
+                if entry is _END:
+                    break
+                pending[entry[0]] = entry[1]
+                while expected in pending:
+                    result = pending.pop(expected)
+                    expected += 1
+                    window.release()
+                    yield result
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            for pool in pools:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+            self._finished = time.perf_counter()
+
+    def stats(self):
+        """Statystyki etapów ostatniego (lub trwającego) przebiegu"""
+        if self._started is None:
+            return {}
+        elapsed = (self._finished or time.perf_counter()) - self._started
+        return {name: stats.to_dict(elapsed) for name, stats in self._stats.items()}
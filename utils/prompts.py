@@ -0,0 +1,111 @@
+import string
+import threading
+from collections import OrderedDict
+
+import yaml
+
+from utils.conversation import MESSAGE_OVERHEAD, estimate_tokens
+
+
+class PromptTemplate:
+    """Szablon promptu budowany raz: stały system prompt + szablon wiadomości użytkownika
+
+    System prompt (tekst albo słownik zapisywany jako YAML) jest renderowany przy rejestracji,
+    razem z liczbą tokenów i gotową wiadomością systemową. Ta sama wiadomość (ten sam tekst,
+    bajt w bajt) otwiera każde zapytanie, więc prefiks promptu jest stabilny i może być
+    cache'owany po stronie dostawcy. Wyrenderowane wiadomości użytkownika są zapamiętywane (LRU)
+    razem z liczbą tokenów treści, więc okno rozmowy i router nie liczą jej przy każdym pytaniu.
+    Zwracane słowniki wiadomości są współdzielone - nie należy ich modyfikować.
+    """
+
+    def __init__(self, name, system, user='{question}', max_rendered=1024):
+        self.name = name
+        self.system_text = yaml.dump(system, allow_unicode=True) if isinstance(system, dict) else system
+        self.system_message = {"role": "system", "content": self.system_text}
+        self.system_tokens = estimate_tokens(self.system_text) + MESSAGE_OVERHEAD
+        self.user_template = user
+        # Walidacja szablonu raz, przy rejestracji - błędny szablon nie wybuchnie przy pierwszym pytaniu
+        self.fields = tuple(field for _, field, _, _ in string.Formatter().parse(user) if field)
+        self.max_rendered = max_rendered
+        self._rendered = OrderedDict()  # wartości -> (wiadomość użytkownika, tokeny treści)
+        self._lock = threading.Lock()
+        self._stats = {'renders': 0, 'render_hits': 0}
+
+    def _render(self, values):
+        key = tuple(sorted(values.items()))
+        with self._lock:
+            entry = self._rendered.get(key)
+            if entry is not None:
+                self._rendered.move_to_end(key)
+                self._stats['render_hits'] += 1
+                return entry
+        content = self.user_template.format(**values)
+        entry = ({"role": "user", "content": content}, estimate_tokens(content))
+        with self._lock:
+            self._stats['renders'] += 1
+            self._rendered[key] = entry
+            while len(self._rendered) > self.max_rendered:
+                self._rendered.popitem(last=False)
+        return entry
+
+    def user_message(self, **values):
+        return self._render(values)[0]
+
+    def user_tokens(self, **values):
+        """Szacowana liczba tokenów treści wiadomości użytkownika (bez narzutu wiadomości)"""
+        return self._render(values)[1]
+
+    def prefix(self, history=()):
+        """Stały prefiks: wiadomość systemowa i (opcjonalnie) historia rozmowy"""
+        return [self.system_message, *history]
+
+    def messages(self, history=(), **values):
+        """Pełna lista wiadomości: system, historia, wyrenderowane pytanie"""
+        return [self.system_message, *history, self._render(values)[0]]
+
+    def token_count(self, history_tokens=0, **values):
+        """Szacowana liczba tokenów promptu (system + historia + pytanie) - bez ponownego liczenia"""
+        return self.system_tokens + history_tokens + self._render(values)[1] + MESSAGE_OVERHEAD
+
+    def stats(self):
+        with self._lock:
+            return {'system_tokens': self.system_tokens, 'cached': len(self._rendered), **self._stats}
+
+
+class PromptRegistry:
+    """Rejestr szablonów promptów współdzielony przez zadania"""
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, system, user='{question}', max_rendered=1024):
+        """Rejestruje szablon (ponowna rejestracja tej samej treści zwraca istniejący obiekt)"""
+        template = PromptTemplate(name, system, user, max_rendered)
+        with self._lock:
+            existing = self._templates.get(name)
+            if existing is not None and (existing.system_text, existing.user_template) == (template.system_text, user):
+                return existing
+            self._templates[name] = template
+        return template
+
+    def get(self, name):
+        return self._templates[name]
+
+    def stats(self):
+        with self._lock:
+            templates = list(self._templates.values())
+        return {template.name: template.stats() for template in templates}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry():
+    """Zwraca wspólny rejestr promptów"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry()
+        return _registry
@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Ogranicza liczbę wywołań na minutę - bezpieczny dla wielu wątków"""
+
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        """Blokuje wątek do momentu, w którym można wykonać kolejne wywołanie"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class TokenBucket:
+    """Kubełek tokenów: budżet na minutę uzupełniany w sposób ciągły, z dopuszczalnym zrywem
+
+    Służy zarówno do limitu zapytań (amount=1), jak i tokenów LLM (amount=szacowana liczba tokenów).
+    Brak limitu (per_minute=None) oznacza, że acquire nigdy nie czeka.
+    """
+
+    def __init__(self, per_minute=None, capacity=None):
+        self.rate = per_minute / 60.0 if per_minute else 0.0
+        self.capacity = capacity or per_minute or 0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount=1):
+        """Rezerwuje amount tokenów i zwraca, ile sekund trzeba poczekać na ich dostępność"""
+        if not self.rate:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, amount=1):
+        """Blokuje wątek, aż w kubełku będzie amount tokenów; zwraca czas oczekiwania"""
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
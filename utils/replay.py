@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+import requests
+from openai import OpenAI
+from requests.structures import CaseInsensitiveDict
+
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def _request_body(kwargs):
+    """Ciało zapytania w postaci nadającej się do klucza kasety"""
+    if 'json' in kwargs:
+        return kwargs['json']
+    data = kwargs.get('data')
+    if isinstance(data, bytes):
+        return data.decode('utf-8', errors='replace')
+    if isinstance(data, (str, dict, list)) or data is None:
+        return data
+    return '<stream>'
+
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+class CassetteMissError(LookupError):
+    """W trybie replay nie ma nagrania pasującego do zapytania"""
+
+
+class Cassette:
+    """Nagrania wymian HTTP i LLM w pliku JSON-lines
+
+    W trybie 'record' każda wymiana jest dopisywana do pliku, w trybie 'replay' odpowiedzi
+    są zwracane z nagrania bez dostępu do sieci. Te same zapytania (np. kolejne GET strony
+    captcha) odtwarzane są w kolejności nagrania.
+    """
+
+    def __init__(self, path, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Nieznany tryb kasety: {mode}")
+        self.path = path
+        self.mode = mode
+        self._entries = defaultdict(deque)
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry['key']].append(entry['response'])
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            open(path, 'w', encoding='utf-8').close()
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def _append(self, kind, key, request, response):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'kind': kind, 'key': key, 'request': request, 'response': response},
+                                   ensure_ascii=False) + '\n')
+
+    def _take(self, key, description):
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissError(f"Brak nagrania dla {description}")
+            # Ostatnie nagranie zostaje - kolejne takie same zapytania dostaną tę samą odpowiedź
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    # --- HTTP ---
+
+    @staticmethod
+    def http_key(method, url, kwargs):
+        return _hash(['http', method.upper(), url, kwargs.get('params'), _request_body(kwargs)])
+
+    def record_http(self, method, url, kwargs, response):
+        request = {'method': method.upper(), 'url': url, 'body': _request_body(kwargs)}
+        self._append('http', self.http_key(method, url, kwargs), request, {
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'body': response.content.decode('utf-8', errors='replace'),
+        })
+
+    def replay_http(self, method, url, kwargs):
+        recorded = self._take(self.http_key(method, url, kwargs), f"{method.upper()} {url}")
+        response = requests.Response()
+        response.status_code = recorded['status_code']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response.headers.pop('Content-Encoding', None)
+        response._content = recorded['body'].encode('utf-8')
+        response._content_consumed = True
+        response.encoding = 'utf-8'
+        response.url = url
+        response.request = requests.Request(method.upper(), url).prepare()
+        return response
+
+    # --- LLM ---
+
+    @staticmethod
+    def llm_key(params):
+        return _hash(['llm', {key: value for key, value in params.items() if key not in ('stream', 'stream_options')}])
+
+    def record_llm(self, params, response):
+        data = response.model_dump() if hasattr(response, 'model_dump') else response
+        self._append('llm', self.llm_key(params), params, data)
+
+    def replay_llm(self, params):
+        return _to_namespace(self._take(self.llm_key(params), f"LLM {params.get('model')}"))
+
+
+class _RecordingStream:
+    """Przepuszcza strumień odpowiedzi i po jego zamknięciu nagrywa odebrany tekst"""
+
+    def __init__(self, stream, cassette, params):
+        self._stream = stream
+        self._cassette = cassette
+        self._params = params
+        self._parts = []
+        self._recorded = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                self._parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        self.close()
+
+    def close(self):
+        if hasattr(self._stream, 'close'):
+            self._stream.close()
+        if not self._recorded:
+            self._recorded = True
+            self._cassette.record_llm(self._params, {
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(self._parts)}}],
+                'usage': None,
+            })
+
+
+def _replay_stream(response):
+    """Odtwarza nagraną odpowiedź jako strumień z jednym fragmentem"""
+    content = response.choices[0].message.content
+    yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=content))], usage=None)
+
+
+class _CassetteCompletions:
+    def __init__(self, client, cassette):
+        self._client = client
+        self._cassette = cassette
+
+    def create(self, **params):
+        if self._cassette.replaying:
+            response = self._cassette.replay_llm(params)
+            return _replay_stream(response) if params.get('stream') else response
+        response = self._client.chat.completions.create(**params)
+        if params.get('stream'):
+            return _RecordingStream(response, self._cassette, params)
+        self._cassette.record_llm(params, response)
+        return response
+
+
+class CassetteOpenAI:
+    """Nakładka na klienta OpenAI nagrywająca lub odtwarzająca chat.completions.create"""
+
+    def __init__(self, client, cassette):
+        self.chat = SimpleNamespace(completions=_CassetteCompletions(client, cassette))
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """Zwraca kasetę wskazaną zmiennymi CASSETTE_PATH i CASSETTE_MODE (record/replay) lub None"""
+    global _cassette
+    path = os.getenv('CASSETTE_PATH')
+    if not path:
+        return None
+    with _cassette_lock:
+        if _cassette is None or _cassette.path != path:
+            _cassette = Cassette(path, mode=os.getenv('CASSETTE_MODE', 'replay'))
+        return _cassette
+
+
+def openai_client(**kwargs):
+    """Tworzy klienta OpenAI - przy aktywnej kasecie nagrywającego lub odtwarzającego odpowiedzi"""
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        return CassetteOpenAI(None, cassette)
+    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), **kwargs)
+    return client if cassette is None else CassetteOpenAI(client, cassette)
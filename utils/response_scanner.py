@@ -0,0 +1,131 @@
+import os
+import re
+
+FLAG_PATTERN = r'\{\{FLG:(?P<flag>[^}]{0,256})\}\}'
+
+
+class ScanResult:
+    """Wynik skanowania: flagi, linki, znalezione znaczniki, rozmiar treści i ewentualny zapis"""
+
+    __slots__ = ('flags', 'links', 'markers', 'size', 'saved_to')
+
+    def __init__(self):
+        self.flags = []
+        self.links = []
+        self.markers = set()
+        self.size = 0
+        self.saved_to = None
+
+    @property
+    def flag(self):
+        return self.flags[0] if self.flags else None
+
+    @property
+    def matched(self):
+        return bool(self.flags or self.links or self.markers)
+
+
+class ResponseScanner:
+    """Wyszukiwanie flag, linków i znaczników w surowej treści odpowiedzi - bez dekodowania do str
+
+    Każdy wzorzec jest kompilowany raz (wersja bytes dla odpowiedzi HTTP i str dla tekstu z JSON).
+    Wzorce nie są łączone w jedną alternatywę: re szuka wtedy dopasowania na każdej pozycji
+    (kilkanaście razy wolniej niż osobne wzorce ze stałym prefiksem, przeskakujące treść jak bytes.find).
+    Treść jest czytana raz - duże odpowiedzi (stream=True) fragmentami z iter_content, a każdy
+    fragment przeglądają wszystkie wzorce, póki jest w pamięci podręcznej procesora. Dopasowanie
+    na granicy fragmentów obsługuje zakładka `overlap` (dłuższa od najdłuższego dopasowania).
+
+    links   - wzorce regex linków, np. [r'/files/[\\w.-]+'],
+    markers - słownik nazwa -> dosłowny tekst, np. {'wrong': 'Wrong answer'}.
+    """
+
+    def __init__(self, links=(), markers=None, flags=True, overlap=512):
+        patterns = [('flag', FLAG_PATTERN)] if flags else []
+        patterns += [('link', f'(?P<link>{pattern})') for pattern in links]
+        patterns += [(name, re.escape(literal)) for name, literal in (markers or {}).items()]
+        if not patterns:
+            raise ValueError("Skaner nie ma żadnych wzorców")
+        self._text_patterns = [(kind, re.compile(pattern)) for kind, pattern in patterns]
+        self._bytes_patterns = [(kind, re.compile(pattern.encode('utf-8'))) for kind, pattern in patterns]
+        self.overlap = overlap
+
+    def _collect(self, data, result, limit=None):
+        """Zapisuje dopasowania z data; zwraca, do którego miejsca dane są już przetworzone
+
+        Dopasowanie kończące się za `limit` może być niepełne - ono i wszystko od jego początku
+        zostaje do następnego fragmentu (wtedy zostanie znalezione ponownie, w całości).
+        """
+        patterns = self._bytes_patterns if isinstance(data, (bytes, bytearray)) else self._text_patterns
+        consumed = len(data) if limit is None else max(limit, 0)
+        found = []
+        for kind, regex in patterns:
+            for match in regex.finditer(data):
+                if match.end() > consumed:
+                    consumed = min(consumed, match.start())
+                    break
+                found.append((kind, match))
+        for kind, match in found:
+            if match.start() >= consumed:
+                continue
+            if kind == 'flag' or kind == 'link':
+                value = match.group(kind)
+                if isinstance(value, (bytes, bytearray)):
+                    value = value.decode('utf-8', errors='replace')
+                (result.flags if kind == 'flag' else result.links).append(value)
+            else:
+                result.markers.add(kind)
+        return consumed
+
+    def scan(self, data):
+        """Skanuje całą treść (bytes albo str) bez kopiowania i dekodowania"""
+        result = ScanResult()
+        result.size = len(data)
+        self._collect(data, result)
+        return result
+
+    def scan_chunks(self, chunks, sink=None):
+        """Skanuje treść podawaną fragmentami (bytes); opcjonalnie przepisuje ją do pliku sink"""
+        result = ScanResult()
+        buffer = b''
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if sink is not None:
+                sink.write(chunk)
+            result.size += len(chunk)
+            buffer = buffer + chunk if buffer else chunk
+            consumed = self._collect(buffer, result, limit=len(buffer) - self.overlap)
+            if consumed:
+                buffer = buffer[consumed:]
+        if buffer:
+            self._collect(buffer, result)
+        return result
+
+    def scan_response(self, response, save_to=None, save='on_match', chunk_size=64 * 1024):
+        """Skanuje odpowiedź requests, zapisując treść do save_to tylko gdy trzeba
+
+        save: 'on_match' (domyślnie - tylko gdy coś znaleziono), 'always' albo 'never'.
+        Dla odpowiedzi pobranych z stream=True treść nie jest trzymana w pamięci: przy zapisie
+        trafia do pliku tymczasowego, który jest zostawiany lub usuwany po skanowaniu.
+        """
+        if save_to is None:
+            save = 'never'
+        if response._content_consumed or response._content is not False:
+            result = self.scan(response.content)
+            if save == 'always' or (save == 'on_match' and result.matched):
+                with open(save_to, 'wb') as f:
+                    f.write(response.content)
+                result.saved_to = save_to
+            return result
+
+        if save == 'never':
+            return self.scan_chunks(response.iter_content(chunk_size))
+        partial = f"{save_to}.part"
+        with open(partial, 'wb') as f:
+            result = self.scan_chunks(response.iter_content(chunk_size), sink=f)
+        if save == 'always' or result.matched:
+            os.replace(partial, save_to)
+            result.saved_to = save_to
+        else:
+            os.remove(partial)
+        return result
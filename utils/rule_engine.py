@@ -0,0 +1,57 @@
+import re
+
+from utils.arithmetic import eval_in_text
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def _solve_arithmetic(question):
+    value = eval_in_text(question)
+    return None if value is None else _format_number(value)
+
+
+SOLVERS = {
+    'arithmetic': _solve_arithmetic,
+}
+
+
+class RuleEngine:
+    """Lokalne odpowiedzi na pytania pasujące do reguł - LLM tylko jako ostateczność
+
+    Każda reguła to słownik z danych, z których budowany jest też system prompt:
+      name        - nazwa reguły,
+      patterns    - wyrażenia regularne (bez rozróżniania wielkości liter),
+      answer      - stała odpowiedź dla pasujących pytań,
+      solver      - nazwa funkcji z SOLVERS liczącej odpowiedź (np. 'arithmetic').
+    Reguły bez patterns/solver (np. 'language') są tylko opisem dla LLM i są pomijane.
+    """
+
+    def __init__(self, rules):
+        self._answers = {}
+        alternatives = []
+        self._solvers = []
+        for index, rule in enumerate(rules):
+            if rule.get('patterns'):
+                group = f"r{index}"
+                self._answers[group] = (rule['name'], rule['answer'])
+                alternatives.append(f"(?P<{group}>{'|'.join(rule['patterns'])})")
+            elif rule.get('solver'):
+                self._solvers.append((rule['name'], SOLVERS[rule['solver']]))
+        # Wszystkie wzorce w jednym wyrażeniu - jedno przejście po tekście pytania
+        self._pattern = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def answer(self, question):
+        """Zwraca (nazwa reguły, odpowiedź) lub None, gdy żadna reguła nie pasuje"""
+        if self._pattern is not None:
+            match = self._pattern.search(question)
+            if match:
+                return self._answers[match.lastgroup]
+        for name, solver in self._solvers:
+            answer = solver(question)
+            if answer is not None:
+                return name, answer
+        return None
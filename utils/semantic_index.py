@@ -0,0 +1,136 @@
+import re
+import threading
+import time
+import zlib
+from difflib import SequenceMatcher
+
+import numpy as np
+
+# Operatory zostają w tekście - "2-2" i "2*2" to inne pytania niż "2+2"
+_NORMALIZE_RE = re.compile(r'[^\w\s+\-*/]')
+_OPERATOR_RE = re.compile(r'\s*([+\-*/])\s*')
+_SIGNATURE_RE = re.compile(r'\d+(?:[.,]\d+)?|[+\-*/]')
+# Słowa, które nie zmieniają sensu pytania - pozostałe słowa (encje, przedmiot pytania) muszą się zgadzać
+_STOPWORDS = frozenset('''
+    a an the of in on at to for is are was were be do does did what which who whom whose how
+    s me please tell you your it its this that there
+    co jaki jaka jakie jest są to w we z na do o czy
+    le la les de du des est quelle quel qui que
+'''.split())
+# Minimalne podobieństwo słów uznawanych za to samo słowo (literówki, odmiana)
+TOKEN_SIMILARITY = 0.85
+
+
+def _normalize(text):
+    text = ' '.join(_NORMALIZE_RE.sub(' ', text.lower()).split())
+    return _OPERATOR_RE.sub(r'\1', text)
+
+
+def _content_tokens(normalized):
+    return frozenset(token for token in normalized.split() if token not in _STOPWORDS)
+
+
+def _covered(tokens, other):
+    return all(
+        token in other or any(SequenceMatcher(None, token, candidate).ratio() >= TOKEN_SIMILARITY for candidate in other)
+        for token in tokens
+    )
+
+
+def _same_content(tokens, other):
+    """Czy oba pytania mają te same słowa treści (z dokładnością do literówek)"""
+    return _covered(tokens - other, other) and _covered(other - tokens, tokens)
+
+
+class SemanticIndex:
+    """Lokalny indeks podobieństwa pytań na n-gramach znakowych (działa offline, na CPU)
+
+    Każde pytanie to wektor zahaszowanych n-gramów znakowych znormalizowany do długości 1,
+    więc podobieństwo kosinusowe do wszystkich pytań to jedno mnożenie macierzy przez wektor.
+    Pytania różniące się liczbami lub działaniami (np. "2+2", "3+3", "2-2") nigdy nie są uznawane
+    za duplikaty. Wysokie podobieństwo n-gramów to za mało: pytania z tego samego szablonu
+    o inną encję ("capital of Poland" / "capital of Holland") mają podobieństwo ok. 0.86, więc
+    dodatkowo wszystkie słowa treści (poza _STOPWORDS) muszą mieć odpowiednik w drugim pytaniu.
+    Odpowiedź może mieć termin ważności (expires) - po nim nie jest już zwracana.
+    """
+
+    def __init__(self, dim=1024, ngram=3, threshold=0.85, initial_capacity=256):
+        self.dim = dim
+        self.ngram = ngram
+        self.threshold = threshold
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._questions = []
+        self._answers = []
+        self._numbers = []
+        self._tokens = []
+        self._expires = []
+        self._positions = {}  # znormalizowane pytanie -> wiersz macierzy
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._questions)
+
+    def _vectorize(self, normalized):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        padded = f" {normalized} "
+        for i in range(max(1, len(padded) - self.ngram + 1)):
+            gram = padded[i:i + self.ngram]
+            vector[zlib.crc32(gram.encode('utf-8')) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, question, answer, expires=None):
+        """Dodaje pytanie z odpowiedzią; ponowne dodanie tego samego pytania nadpisuje odpowiedź
+
+        expires - czas (time.time()), po którym odpowiedź wygasa; None - nie wygasa.
+        """
+        expires = float('inf') if expires is None else expires
+        normalized = _normalize(question)
+        vector = self._vectorize(normalized)
+        with self._lock:
+            position = self._positions.get(normalized)
+            if position is not None:
+                self._answers[position] = answer
+                self._expires[position] = expires
+                return
+            if len(self._questions) == len(self._matrix):
+                grown = np.zeros((len(self._matrix) * 2, self.dim), dtype=np.float32)
+                grown[:len(self._matrix)] = self._matrix
+                self._matrix = grown
+            position = len(self._questions)
+            self._matrix[position] = vector
+            self._positions[normalized] = position
+            self._questions.append(question)
+            self._answers.append(answer)
+            self._numbers.append(tuple(_SIGNATURE_RE.findall(normalized)))
+            self._tokens.append(_content_tokens(normalized))
+            self._expires.append(expires)
+
+    def search(self, question, k=5):
+        """Zwraca do k najbardziej podobnych pytań jako listę (podobieństwo, pytanie, odpowiedź)"""
+        normalized = _normalize(question)
+        vector = self._vectorize(normalized)
+        numbers = tuple(_SIGNATURE_RE.findall(normalized))
+        tokens = _content_tokens(normalized)
+        now = time.time()
+        with self._lock:
+            count = len(self._questions)
+            if not count:
+                return []
+            scores = self._matrix[:count] @ vector
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (float(scores[i]), self._questions[i], self._answers[i])
+                for i in top
+                if self._numbers[i] == numbers and self._expires[i] > now
+                and _same_content(tokens, self._tokens[i])
+            ]
+
+    def lookup(self, question):
+        """Zwraca odpowiedź najbliższego pytania, jeśli podobieństwo przekracza próg, w przeciwnym razie None"""
+        matches = self.search(question, k=5)
+        if matches and matches[0][0] >= self.threshold:
+            return matches[0]
+        return None